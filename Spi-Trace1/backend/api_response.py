@@ -0,0 +1,145 @@
+"""
+JSON responses for list endpoints: fast encoding, compression and ETags.
+
+Scan rows store their keyword/URL/match lists as JSON text already; wrapping
+that text in RawJSON writes it into the response as is instead of decoding
+it with json.loads only for jsonify to encode it again. orjson is used when
+installed, the standard library otherwise.
+
+json_response() negotiates gzip (or br, when the `brotli` package is
+installed) from Accept-Encoding and answers If-None-Match with 304 when the
+body hasn't changed.
+"""
+import gzip
+import hashlib
+import json
+from typing import Any, Optional
+
+from flask import Response, request
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed
+MIN_COMPRESS_BYTES = 1024
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 5
+
+
+class RawJSON(str):
+    """Text that is already valid JSON; written into responses verbatim"""
+
+
+def raw_json(text: Optional[str], default: str = 'null') -> RawJSON:
+    """Wrap a stored JSON column, substituting default when it is empty"""
+    return RawJSON(text if text else default)
+
+
+_std_encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+
+
+def _encode_leaf(value: Any) -> str:
+    if orjson is not None:
+        return orjson.dumps(value).decode('utf-8')
+    return _std_encode(value)
+
+
+def _encode(value: Any) -> str:
+    if isinstance(value, RawJSON):
+        return value
+    if isinstance(value, dict):
+        return '{' + ','.join(f'{_encode_leaf(str(k))}:{_encode(v)}' for k, v in value.items()) + '}'
+    if isinstance(value, (list, tuple)):
+        return '[' + ','.join(_encode(v) for v in value) + ']'
+    return _encode_leaf(value)
+
+
+def _orjson_default(value: Any):
+    if isinstance(value, RawJSON):
+        return orjson.Fragment(value.encode('utf-8'))
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(payload: Any) -> bytes:
+    """Encode payload as UTF-8 JSON, splicing RawJSON values in unparsed"""
+    if orjson is not None and hasattr(orjson, 'Fragment'):
+        # orjson >= 3.9 splices fragments itself in a single native call
+        return orjson.dumps(payload, default=_orjson_default, option=orjson.OPT_PASSTHROUGH_SUBCLASS)
+    return _encode(payload).encode('utf-8')
+
+
+def _accepted_encodings(header: str) -> dict:
+    accepted = {}
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding:
+            accepted[coding.strip().lower()] = q
+    return accepted
+
+
+def _negotiate_encoding() -> Optional[str]:
+    accepted = _accepted_encodings(request.headers.get('Accept-Encoding', ''))
+    candidates = (['br'] if brotli is not None else []) + ['gzip']
+    best = None
+    for coding in candidates:
+        q = accepted.get(coding, accepted.get('*', 0.0))
+        if q > 0 and (best is None or q > best[1]):
+            best = (coding, q)
+    return best[0] if best else None
+
+
+def _etag_matches(etag: str) -> bool:
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    # Weak comparison, as If-None-Match requires
+    opaque = etag[2:] if etag.startswith('W/') else etag
+    return any(tag.strip().removeprefix('W/') == opaque for tag in header.split(','))
+
+
+def json_response(payload: Any, status: int = 200, etag: bool = True) -> Response:
+    """
+    Build a JSON response.
+
+    Args:
+        payload: Data to encode; RawJSON values are passed through as is
+        status: HTTP status code
+        etag: Attach an ETag (a weak one, valid across content codings) and
+            answer a matching If-None-Match with 304 Not Modified
+    """
+    body = dumps(payload)
+    headers = {'Vary': 'Accept-Encoding'}
+
+    if etag:
+        headers['ETag'] = f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        # Clients may reuse a cached copy but must revalidate it every time
+        headers['Cache-Control'] = 'private, no-cache'
+        if status == 200 and _etag_matches(headers['ETag']):
+            return Response(status=304, headers=headers)
+
+    if len(body) >= MIN_COMPRESS_BYTES:
+        coding = _negotiate_encoding()
+        if coding == 'br':
+            body = brotli.compress(body, quality=BROTLI_QUALITY)
+        elif coding == 'gzip':
+            body = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+        if coding:
+            headers['Content-Encoding'] = coding
+
+    return Response(body, status=status, headers=headers, mimetype='application/json')
@@ -1,41 +1,171 @@
-from flask import Flask, request, jsonify
+"""
+Flask API for the keyword monitor.
+
+Build the app with create_app(); `flask --app app init-db` creates or
+updates the database schema, which the app no longer does on import so
+workers starting together don't race on it.
+
+`flask --app app compact-history` runs a scan history retention pass
+(worker.py also runs them when idle).
+
+The scanner (requests, bs4) is only imported once a scan or scanner
+endpoint first runs.
+"""
+from flask import Blueprint, Flask, Response, current_app, request, jsonify, send_file, stream_with_context
+from flask.cli import with_appcontext
 from flask_cors import CORS
-from flask_sqlalchemy import SQLAlchemy
+import click
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 import json
+import threading
+import time
 import uuid
 
-from models import db, User, URL, ScanHistory
+from models import db, User, URL, ScanHistory, ScanDelta, ScanJob, TenantQuota, ScanRollup, RetentionPolicy, ScanProfile
 from auth import auth_bp
-from simple_scanner import scan_url_for_keywords
+from page_archive import PageArchive
+from search_index import SearchIndex, SearchQueryError
+from scan_diff import keyword_signature, compute_delta
+from scan_events import ScanEventBroker, format_sse
+from host_health import HostHealthTracker, host_of
+from keyword_patterns import validate_keywords
+from api_response import json_response
+import job_queue
+import retention
+import scan_export
+import text_normalize
 from flask_jwt_extended import JWTManager, jwt_required, get_jwt_identity
 
-app = Flask(__name__)
-
-# Database Configuration
 basedir = os.path.abspath(os.path.dirname(__file__))
-app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{os.path.join(basedir, "database.db")}'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY', 'super-secret-key-change-this')
 
-# Initialize extensions
-db.init_app(app)
-jwt = JWTManager(app)
 
-# CORS
-CORS(app, resources={r"/*": {"origins": ["http://localhost:8080", "http://localhost:8081", "http://localhost:5173", "http://localhost:3000", "http://127.0.0.1:8080", "http://127.0.0.1:8081", "http://127.0.0.1:5173", "http://127.0.0.1:3000"]}}, supports_credentials=True)
+def default_config():
+    return {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.join(basedir, "database.db")}',
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        'JWT_SECRET_KEY': os.environ.get('JWT_SECRET_KEY', 'super-secret-key-change-this'),
+        'PAGE_ARCHIVE_DIR': os.environ.get('PAGE_ARCHIVE_DIR', os.path.join(basedir, 'page_archive')),
+        'SEARCH_INDEX_PATH': os.environ.get('SEARCH_INDEX_PATH', os.path.join(basedir, 'search_index.db')),
+        'HOST_HEALTH_PATH': os.environ.get('HOST_HEALTH_PATH', os.path.join(basedir, 'host_health.db')),
+        # Defaults for a scan's total wall-clock limit and each URL's total fetch time
+        'SCAN_DEADLINE_SECONDS': float(os.environ.get('SCAN_DEADLINE_SECONDS', 900)),
+        'SCAN_URL_BUDGET_SECONDS': float(os.environ.get('SCAN_URL_BUDGET_SECONDS', 20)),
+        # Send async scans to the scan_jobs queue for worker.py processes instead of a web thread
+        'SCAN_QUEUE': os.environ.get('SCAN_QUEUE', '0') == '1',
+        # Queued scans of one user run on at most this many workers at once, unless their quota says otherwise
+        'SCAN_TENANT_MAX_CONCURRENT': int(os.environ.get('SCAN_TENANT_MAX_CONCURRENT', 2)),
+        # Days finished scans keep full detail before being compacted into daily rollups,
+        # and days rollups are kept (0 keeps forever); retention_policies rows override per user
+        'SCAN_RETENTION_DETAIL_DAYS': int(os.environ.get('SCAN_RETENTION_DETAIL_DAYS', retention.DEFAULT_DETAIL_DAYS)),
+        'SCAN_RETENTION_ROLLUP_DAYS': int(os.environ.get('SCAN_RETENTION_ROLLUP_DAYS', retention.DEFAULT_ROLLUP_DAYS)),
+        'SCAN_RETENTION_BATCH_SIZE': int(os.environ.get('SCAN_RETENTION_BATCH_SIZE', retention.DEFAULT_BATCH_SIZE)),
+        # Artifacts of scans run with profiling on (admin-only "profile" flag on POST /api/scan)
+        'SCAN_PROFILE_DIR': os.environ.get('SCAN_PROFILE_DIR', os.path.join(basedir, 'scan_profiles')),
+    }
+
+
+api_bp = Blueprint('api', __name__)
+jwt = JWTManager()
+
+# Scan progress events and cancellation flags of scans running in this process, by scan id
+scan_events = ScanEventBroker()
+SCAN_CANCEL_EVENTS = {}
+
+# Side stores (page archive, search index, host health) of each app, opened on first use
+_stores_lock = threading.Lock()
+STORE_FACTORIES = {
+    'page_archive': lambda config: PageArchive(config['PAGE_ARCHIVE_DIR']),
+    'search_index': lambda config: SearchIndex(config['SEARCH_INDEX_PATH']),
+    'host_health': lambda config: HostHealthTracker(config['HOST_HEALTH_PATH']),
+}
+
+
+def get_store(name):
+    stores = current_app.extensions['spitrace_stores']
+    store = stores.get(name)
+    if store is None:
+        with _stores_lock:
+            store = stores.get(name)
+            if store is None:
+                store = stores[name] = STORE_FACTORIES[name](current_app.config)
+    return store
 
-# Register authentication blueprint
-app.register_blueprint(auth_bp)
 
-# Create tables
-with app.app_context():
+def create_app(config=None):
+    """
+    Build the Flask app.
+
+    Args:
+        config: Mapping of settings overriding default_config()
+    """
+    app = Flask(__name__)
+    app.config.update(default_config())
+    if config:
+        app.config.update(config)
+    if app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        # Web and worker processes share the file; wait for each other's write locks
+        app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {'connect_args': {'timeout': 30}})
+
+    # Initialize extensions
+    db.init_app(app)
+    jwt.init_app(app)
+    app.extensions['spitrace_stores'] = {}
+
+    # CORS
+    CORS(app, resources={r"/*": {"origins": ["http://localhost:8080", "http://localhost:8081", "http://localhost:5173", "http://localhost:3000", "http://127.0.0.1:8080", "http://127.0.0.1:8081", "http://127.0.0.1:5173", "http://127.0.0.1:3000"]}}, supports_credentials=True)
+
+    # Register blueprints
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(api_bp)
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(compact_history_command)
+    return app
+
+
+def init_db():
+    """Create missing tables and indexes in the app database and the side stores (safe to re-run)"""
     db.create_all()
+    # create_all skips tables that already exist, indexes added to them later included
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+    for name in STORE_FACTORIES:
+        get_store(name)
+
+
+def run_retention_pass(max_batches=None, should_stop=None):
+    """A retention pass with the app's SCAN_RETENTION_* settings"""
+    config = current_app.config
+    return retention.run_retention(
+        config['SCAN_RETENTION_DETAIL_DAYS'],
+        config['SCAN_RETENTION_ROLLUP_DAYS'],
+        batch_size=config['SCAN_RETENTION_BATCH_SIZE'],
+        max_batches=max_batches,
+        should_stop=should_stop
+    )
+
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create or update the database schema."""
+    init_db()
+    click.echo('Database schema is up to date.')
+
+
+@click.command('compact-history')
+@click.option('--max-batches', type=int, default=None, help='Stop after this many batches')
+@with_appcontext
+def compact_history_command(max_batches):
+    """Compact scans past their retention period into daily rollups."""
+    stats = run_retention_pass(max_batches)
+    click.echo(f"Compacted {stats['compacted']} scan(s) in {stats['batches']} batch(es), "
+               f"expired {stats['rollups_expired']} rollup row(s).")
 
 # ==================== URL MANAGEMENT ====================
 
-@app.route('/api/urls', methods=['GET'])
+@api_bp.route('/api/urls', methods=['GET'])
 @jwt_required()
 def get_urls():
     try:
@@ -47,14 +177,14 @@ def get_urls():
         else:
             urls = URL.query.filter_by(user_id=current_user_id).all()
              
-        return jsonify([url.to_dict() for url in urls]), 200
+        return json_response([url.to_dict() for url in urls])
     except Exception as e:
         print(f"ERROR in get_urls: {str(e)}")
         import traceback
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/urls', methods=['POST'])
+@api_bp.route('/api/urls', methods=['POST'])
 @jwt_required()
 def create_url():
     try:
@@ -82,7 +212,7 @@ def create_url():
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/urls/<url_id>', methods=['PUT'])
+@api_bp.route('/api/urls/<url_id>', methods=['PUT'])
 @jwt_required()
 def update_url(url_id):
     try:
@@ -114,7 +244,7 @@ def update_url(url_id):
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/urls/<url_id>', methods=['DELETE'])
+@api_bp.route('/api/urls/<url_id>', methods=['DELETE'])
 @jwt_required()
 def delete_url(url_id):
     try:
@@ -141,7 +271,261 @@ def delete_url(url_id):
 
 # ==================== SCANNING ====================
 
-@app.route('/api/scan', methods=['POST'])
+def record_scan_delta(scan_history, keywords, visited_urls, matches_found, normalize=None):
+    """Attach the per-URL delta against the user's previous scan of the same keyword set"""
+    keyword_sig = keyword_signature(keywords, normalize)
+    previous = ScanDelta.query.filter_by(
+        user_id=scan_history.user_id, keyword_sig=keyword_sig
+    ).order_by(ScanDelta.created_at.desc()).first()
+    previous_scan = previous.scan if previous else None
+
+    delta = compute_delta(
+        matches_found,
+        visited_urls,
+        json.loads(previous_scan.matches) if previous_scan else None,
+        json.loads(previous_scan.urls_scanned) if previous_scan else None
+    )
+    scan_history.delta = ScanDelta(
+        user_id=scan_history.user_id,
+        keyword_sig=keyword_sig,
+        previous_scan_id=previous_scan.id if previous_scan else None,
+        new_count=sum(len(v) for v in delta['new'].values()),
+        gone_count=sum(len(v) for v in delta['gone'].values()),
+        delta=json.dumps(delta, separators=(',', ':'))
+    )
+
+def select_scan_urls(user, current_user_id, data):
+    """
+    Enabled URLs a scan request covers and the user the scan belongs to.
+
+    Clients scan their own URLs. Admins scan every user's URLs, or one
+    user's with `user_id` (the scan then belongs to that user). `url_ids`
+    narrows either to a subset.
+
+    Raises:
+        PermissionError: A client asked for another user's URLs
+        ValueError: Some url_ids are unknown, disabled or out of scope
+    """
+    is_admin = user is not None and user.role == 'admin'
+    owner_id = current_user_id
+    query = URL.query.filter_by(status='enabled')
+
+    target_user_id = data.get('user_id')
+    if target_user_id is not None:
+        if not is_admin and int(target_user_id) != current_user_id:
+            raise PermissionError("Only admins can scan another user's URLs")
+        owner_id = int(target_user_id)
+        query = query.filter_by(user_id=owner_id)
+    elif not is_admin:
+        query = query.filter_by(user_id=current_user_id)
+
+    url_ids = data.get('url_ids')
+    if url_ids:
+        query = query.filter(URL.id.in_(url_ids))
+    urls = query.all()
+    if url_ids and len(urls) != len(set(url_ids)):
+        missing = set(url_ids) - {u.id for u in urls}
+        raise ValueError(f"Unknown or disabled URL ids: {sorted(missing)}")
+    return owner_id, urls
+
+def run_scan(scan_history, keywords, target_urls, deadline_seconds=None, url_budget_seconds=None, profile=None,
+             normalize=None):
+    """
+    Scan target_urls for keywords, publishing a progress event per URL, and
+    save the results to scan_history (which must already be committed).
+
+    The scan stops early when cancelled or when deadline_seconds pass; what
+    was gathered so far is saved with status 'cancelled' or 'partial'.
+
+    With a profile mode ('sampling' or 'cprofile') the scan runs under the
+    profiler and its artifact is saved as a ScanProfile (see scan_profiler.py).
+    A normalize mode turns on obfuscation-tolerant matching (see text_normalize.py).
+    """
+    if not profile:
+        _run_scan(scan_history, keywords, target_urls, deadline_seconds, url_budget_seconds, normalize)
+        return
+
+    import scan_profiler
+    try:
+        with scan_profiler.profile_scan(scan_history.id, profile, current_app.config['SCAN_PROFILE_DIR']) as capture:
+            _run_scan(scan_history, keywords, target_urls, deadline_seconds, url_budget_seconds, normalize)
+    except scan_profiler.ProfilerBusy as e:
+        print(f"Scan {scan_history.id} runs without profiling: {str(e)}")
+        _run_scan(scan_history, keywords, target_urls, deadline_seconds, url_budget_seconds, normalize)
+        return
+    db.session.merge(ScanProfile(
+        scan_id=scan_history.id,
+        user_id=scan_history.user_id,
+        mode=profile,
+        path=capture.path,
+        size_bytes=capture.size_bytes,
+        wall_ms=capture.summary['wall_ms'],
+        peak_memory_bytes=capture.summary['traced_memory_bytes']['peak'],
+        summary=json.dumps(capture.summary),
+        created_at=datetime.utcnow()
+    ))
+    db.session.commit()
+    print(f"Profile of scan {scan_history.id} saved to {capture.path}")
+
+
+def _run_scan(scan_history, keywords, target_urls, deadline_seconds=None, url_budget_seconds=None, normalize=None):
+    scan_id = scan_history.id
+    visited_urls = []
+    matches_found = []
+    errors = []
+    results = {}
+    total = len(set(target_urls))
+    last_progress_save = time.time()
+
+    from simple_scanner import enable_dns_cache, scan_urls_for_keywords
+    enable_dns_cache()
+
+    cancel_event = SCAN_CANCEL_EVENTS.setdefault(scan_id, threading.Event())
+    last_cancel_check = [time.time()]
+
+    def should_stop():
+        if cancel_event.is_set():
+            return True
+        # Cancellation requested through another process shows up in the row
+        if time.time() - last_cancel_check[0] >= 1:
+            last_cancel_check[0] = time.time()
+            db.session.expire(scan_history, ['status'])
+            if scan_history.status == 'cancelling':
+                cancel_event.set()
+        return cancel_event.is_set()
+
+    try:
+        deadline_seconds = deadline_seconds or current_app.config['SCAN_DEADLINE_SECONDS']
+        url_budget_seconds = url_budget_seconds or current_app.config['SCAN_URL_BUDGET_SECONDS']
+        page_archive = get_store('page_archive')
+        search_index = get_store('search_index')
+        deadline = time.monotonic() + deadline_seconds
+
+        # Fetch on threads, parse in the scanner's process pool
+        try:
+            for result in scan_urls_for_keywords(
+                target_urls,
+                keywords=keywords,
+                timeout=10,
+                url_budget=url_budget_seconds,
+                deadline=deadline,
+                should_stop=should_stop,
+                host_health=get_store('host_health'),
+                normalize=normalize
+            ):
+                analysis = result.analysis
+                results[result.url] = analysis
+                if analysis is not None:
+                    # Keep the text so later keyword sets can be retro-scanned offline
+                    page_archive.append(result.url, analysis.text)
+                    search_index.index_page(result.url, analysis.text)
+
+                scan_events.publish(scan_id, 'url', {
+                    'url': result.url,
+                    'status': 'error' if analysis is None else ('matched' if analysis.matched else 'clean'),
+                    'keywords': analysis.matched if analysis else [],
+                    'error': result.error,
+                    'fetch_ms': round(result.fetch_ms, 1),
+                    'parse_ms': round(result.parse_ms, 1),
+                    'completed': len(results),
+                    'total': total
+                })
+
+                # Progress for event streams served by other processes, at most once a second
+                if time.time() - last_progress_save >= 1:
+                    scan_history.progress = json.dumps({'current': len(results), 'total': total, 'url': result.url})
+                    db.session.commit()
+                    last_progress_save = time.time()
+        except Exception as scan_error:
+            error_msg = f"Error scanning: {str(scan_error)}"
+            print(error_msg)
+            errors.append(error_msg)
+            import traceback
+            traceback.print_exc()
+
+        # Report in URL table order, not completion order
+        for url in target_urls:
+            if url not in results or url in visited_urls:
+                continue
+            analysis = results[url]
+            if analysis and analysis.patterns_timed_out:
+                errors.append(f"Keyword patterns ran out of time on {url}; its matches may be incomplete")
+            if analysis and analysis.matched:
+                print(f"✓ Found keywords on {url}: {analysis.matched}")
+                matches_found.append({
+                    'url': url,
+                    'keywords': analysis.matched,
+                    'hits': analysis.hits
+                })
+            else:
+                print(f"✗ No keywords found on {url}")
+
+            visited_urls.append(url)
+
+        status = 'complete'
+        unscanned = total - len(results)
+        if cancel_event.is_set():
+            status = 'cancelled'
+            errors.append(f"Scan cancelled before {unscanned} URL(s) were scanned")
+        elif unscanned:
+            status = 'partial'
+            errors.append(f"Scan deadline of {deadline_seconds}s reached before {unscanned} URL(s) were scanned")
+
+        # Save to database
+        print(f"Saving scan history ({status}): {len(visited_urls)} URLs scanned, {len(matches_found)} matches")
+        scan_history.urls_scanned = json.dumps(visited_urls)
+        scan_history.matches = json.dumps(matches_found)
+        scan_history.errors = json.dumps(errors)
+        scan_history.status = status
+        scan_history.completed_at = datetime.utcnow()
+        scan_history.progress = json.dumps({'current': len(results), 'total': total, 'url': None})
+
+        record_scan_delta(scan_history, keywords, visited_urls, matches_found, normalize)
+        db.session.commit()
+        print(f"Scan {scan_id} completed and saved!")
+    except Exception as e:
+        print(f"FATAL ERROR in scan {scan_id}: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        db.session.rollback()
+        scan_history.status = 'failed'
+        scan_history.errors = json.dumps(errors + [f"Scan failed: {str(e)}"])
+        scan_history.completed_at = datetime.utcnow()
+        db.session.commit()
+    finally:
+        scan_events.publish(scan_id, 'complete', {
+            'status': scan_history.status,
+            'urls_scanned': len(visited_urls),
+            'matches': len(matches_found),
+            'errors': len(errors)
+        })
+        scan_events.close(scan_id)
+        SCAN_CANCEL_EVENTS.pop(scan_id, None)
+
+
+def parse_seconds(value, field):
+    """A request's optional time limit as positive seconds (None when not given); raises ValueError"""
+    if value is None:
+        return None
+    try:
+        if isinstance(value, bool):
+            raise ValueError
+        seconds = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} must be a number of seconds")
+    if not 0 < seconds < float('inf'):
+        raise ValueError(f"{field} must be a positive number of seconds")
+    return seconds
+
+
+def run_scan_in_background(app, scan_id, keywords, target_urls, deadline_seconds=None, url_budget_seconds=None,
+                           profile=None, normalize=None):
+    with app.app_context():
+        scan_history = ScanHistory.query.get(scan_id)
+        run_scan(scan_history, keywords, target_urls, deadline_seconds, url_budget_seconds, profile, normalize)
+
+
+@api_bp.route('/api/scan', methods=['POST'])
 @jwt_required()
 def trigger_scan():
     try:
@@ -151,104 +535,728 @@ def trigger_scan():
         data = request.get_json()
         print(f"DEBUG: Scan params: {data}")
         keywords = data.get('keywords', [])
+        run_async = bool(data.get('async', False))
         
         if not keywords:
             return jsonify({'error': 'No keywords provided'}), 400
+        try:
+            # Optional limits: whole-scan wall clock, and total time per URL
+            deadline_seconds = parse_seconds(data.get('deadline_seconds'), 'deadline_seconds')
+            url_budget_seconds = parse_seconds(data.get('url_budget_seconds'), 'url_budget_seconds')
+            # Obfuscation-tolerant matching: true / 'standard' / 'leet' (see text_normalize.py)
+            normalize = text_normalize.normalize_mode(data.get('normalize'))
+            validate_keywords(keywords, normalize)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        # Opt-in profiling of this one scan (admin only): true / 'sampling' / 'cprofile'
+        profile = None
+        if data.get('profile'):
+            user = User.query.get(current_user_id)
+            if not user or user.role != 'admin':
+                return jsonify({'error': 'Only admins can profile scans'}), 403
+            try:
+                from scan_profiler import is_busy, normalize_mode
+                profile = normalize_mode(data['profile'])
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            if not current_app.config['SCAN_QUEUE'] and is_busy():
+                return jsonify({'error': 'Another scan is being profiled; try again when it finishes'}), 409
         
-        # Get enabled URLs from database
-        enabled_urls = URL.query.filter_by(status='enabled').all()
+        # Get the enabled URLs this request covers
+        try:
+            owner_id, enabled_urls = select_scan_urls(User.query.get(current_user_id), current_user_id, data)
+        except PermissionError as e:
+            return jsonify({'error': str(e)}), 403
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         if not enabled_urls:
             return jsonify({'error': 'No enabled URLs to scan'}), 400
         
         print(f"Starting scan with {len(keywords)} keywords and {len(enabled_urls)} URLs")
         
-        scan_id = str(uuid.uuid4())
+        scan_history = ScanHistory(
+            id=str(uuid.uuid4()),
+            user_id=owner_id,
+            keywords=json.dumps(keywords),
+            urls_scanned=json.dumps([]),
+            matches=json.dumps([]),
+            errors=json.dumps([]),
+            status='scanning',
+            started_at=datetime.utcnow()
+        )
+        db.session.add(scan_history)
+        target_urls = [db_url.url for db_url in enabled_urls]
+
+        if run_async and current_app.config['SCAN_QUEUE']:
+            # A worker.py process picks it up; follow it on GET /api/scans/<id>/events
+            job_queue.enqueue_scan(scan_history, keywords, target_urls, deadline_seconds, url_budget_seconds,
+                                   profile=profile, normalize=normalize)
+            db.session.commit()
+            return jsonify(scan_history.to_dict()), 202
+
+        db.session.commit()
+        scan_events.open(scan_history.id)
+        SCAN_CANCEL_EVENTS[scan_history.id] = threading.Event()
+
+        if run_async:
+            # Follow progress on GET /api/scans/<id>/events
+            worker = threading.Thread(
+                target=run_scan_in_background,
+                args=(current_app._get_current_object(), scan_history.id, keywords, target_urls,
+                      deadline_seconds, url_budget_seconds, profile, normalize),
+                daemon=True
+            )
+            worker.start()
+            return jsonify(scan_history.to_dict()), 202
+
+        run_scan(scan_history, keywords, target_urls, deadline_seconds, url_budget_seconds, profile, normalize)
+        if scan_history.status == 'failed':
+            return jsonify({'error': f"Scan failed: {json.loads(scan_history.errors)[-1]}"}), 500
+        return jsonify(scan_history.to_dict()), 201
+        
+    except Exception as e:
+        print(f"FATAL ERROR in scan: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        db.session.rollback()
+        return jsonify({'error': f"Scan failed: {str(e)}"}), 500
+
+@api_bp.route('/api/scans/<scan_id>/cancel', methods=['POST'])
+@jwt_required()
+def cancel_scan(scan_id):
+    """Stop a running scan; results gathered so far are kept with status 'cancelled'"""
+    try:
+        current_user_id = int(get_jwt_identity())
+        user = User.query.get(current_user_id)
+        scan = ScanHistory.query.get(scan_id)
+
+        if not scan:
+            return jsonify({'error': 'Scan not found'}), 404
+        if scan.user_id != current_user_id and (not user or user.role != 'admin'):
+            return jsonify({'error': 'Unauthorized'}), 403
+
+        # A queued scan no worker has claimed is simply withdrawn
+        withdrawn = ScanHistory.query.filter_by(id=scan_id, status='queued').update(
+            {'status': 'cancelled', 'completed_at': datetime.utcnow()}, synchronize_session=False
+        )
+        if withdrawn:
+            job_queue.cancel_queued(scan_id)
+            db.session.commit()
+            db.session.refresh(scan)
+            return jsonify(scan.to_dict()), 202
+
+        # Conditional update so a scan that just finished is never marked cancelling
+        updated = ScanHistory.query.filter_by(id=scan_id, status='scanning').update(
+            {'status': 'cancelling'}, synchronize_session=False
+        )
+        db.session.commit()
+        if not updated:
+            return jsonify({'error': f"Scan is not running (status: {scan.status})"}), 409
+
+        cancel_event = SCAN_CANCEL_EVENTS.get(scan_id)
+        if cancel_event:
+            cancel_event.set()
+
+        db.session.refresh(scan)
+        return jsonify(scan.to_dict()), 202
+    except Exception as e:
+        db.session.rollback()
+        print(f"ERROR in cancel_scan: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/api/scans/<scan_id>/events', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+def scan_event_stream(scan_id):
+    """
+    Server-sent events for a scan: one 'url' event per finished URL, then
+    'complete' (with status 'deleted' if the scan is deleted while followed).
+    EventSource clients can pass the token as ?jwt=<token>.
+    """
+    current_user_id = int(get_jwt_identity())
+    user = User.query.get(current_user_id)
+    scan = ScanHistory.query.get(scan_id)
+
+    if not scan:
+        return jsonify({'error': 'Scan not found'}), 404
+    if scan.user_id != current_user_id and (not user or user.role != 'admin'):
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    last_event_id = request.headers.get('Last-Event-ID', 0, type=int)
+
+    def live_stream():
+        for message in scan_events.subscribe(scan_id, last_event_id):
+            yield ': keepalive\n\n' if message is None else format_sse(message)
+
+    def polled_stream():
+        # Scan runs in another process (or finished before this one started):
+        # fall back to the progress column, checked every couple of seconds.
+        event_id = 0
+        last_progress = None
+        while True:
+            db.session.expire_all()
+            row = ScanHistory.query.get(scan_id)
+            if row is None:
+                # Deleted meanwhile (by the user or by retention); nothing more will come
+                event_id += 1
+                yield format_sse({'id': event_id, 'event': 'complete', 'data': {'status': 'deleted'}})
+                return
+            running = row.status in ('queued', 'scanning', 'cancelling')
+            if row.progress != last_progress and running:
+                last_progress = row.progress
+                event_id += 1
+                yield format_sse({'id': event_id, 'event': 'progress', 'data': json.loads(row.progress or 'null')})
+            if not running:
+                event_id += 1
+                yield format_sse({'id': event_id, 'event': 'complete', 'data': {
+                    'status': row.status,
+                    'urls_scanned': len(json.loads(row.urls_scanned or '[]')),
+                    'matches': len(json.loads(row.matches or '[]')),
+                    'errors': len(json.loads(row.errors or '[]'))
+                }})
+                return
+            db.session.rollback()
+            time.sleep(2)
+
+    stream = live_stream() if scan_events.has(scan_id) else polled_stream()
+    return Response(stream_with_context(stream), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@api_bp.route('/api/retro-scan', methods=['POST'])
+@jwt_required()
+def trigger_retro_scan():
+    """Run a keyword set against the latest archived text of the scan's URLs, without fetching"""
+    try:
+        current_user_id = int(get_jwt_identity())
+        data = request.get_json()
+        keywords = data.get('keywords', [])
+
+        if not keywords:
+            return jsonify({'error': 'No keywords provided'}), 400
+        try:
+            normalize = text_normalize.normalize_mode(data.get('normalize'))
+            validate_keywords(keywords, normalize)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        try:
+            owner_id, enabled_urls = select_scan_urls(User.query.get(current_user_id), current_user_id, data)
+        except PermissionError as e:
+            return jsonify({'error': str(e)}), 403
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        if not enabled_urls:
+            return jsonify({'error': 'No enabled URLs to scan'}), 400
+
+        started_at = datetime.utcnow()
+        from simple_scanner import keyword_hits
+
+        snapshots = get_store('page_archive').latest_many(db_url.url for db_url in enabled_urls)
+
         visited_urls = []
         matches_found = []
         errors = []
-        
-        # Scan each URL
+
         for db_url in enabled_urls:
-            try:
-                print(f"Scanning {db_url.url}...")
-                found, matched_keywords = scan_url_for_keywords(
-                    url=db_url.url,
-                    keywords=keywords,
-                    timeout=10
-                )
-                
-                if found:
-                    print(f"✓ Found keywords on {db_url.url}: {matched_keywords}")
-                    matches_found.append({
-                        'url': db_url.url,
-                        'keywords': matched_keywords
-                    })
-                else:
-                    print(f"✗ No keywords found on {db_url.url}")
-                    
-                visited_urls.append(db_url.url)
-                
-            except Exception as url_error:
-                error_msg = f"Error scanning {db_url.url}: {str(url_error)}"
-                print(error_msg)
-                errors.append(error_msg)
-                import traceback
-                traceback.print_exc()
-        
-        # Save to database
-        print(f"Creating scan history: {len(visited_urls)} URLs scanned, {len(matches_found)} matches")
+            page_text = snapshots.get(db_url.url)
+            if page_text is None:
+                errors.append(f"No archived snapshot for {db_url.url}")
+                continue
+
+            matched_keywords, hits, timed_out = keyword_hits(page_text, keywords, normalize=normalize)
+            if timed_out:
+                errors.append(f"Keyword patterns ran out of time on {db_url.url}; its matches may be incomplete")
+            if matched_keywords:
+                matches_found.append({
+                    'url': db_url.url,
+                    'keywords': matched_keywords,
+                    'hits': hits
+                })
+            visited_urls.append(db_url.url)
+
         scan_history = ScanHistory(
-            id=scan_id,
-            user_id=current_user_id,
+            id=str(uuid.uuid4()),
+            user_id=owner_id,
             keywords=json.dumps(keywords),
             urls_scanned=json.dumps(visited_urls),
             matches=json.dumps(matches_found),
             errors=json.dumps(errors),
             status='complete',
-            started_at=datetime.utcnow(),
+            started_at=started_at,
             completed_at=datetime.utcnow()
         )
-        
+
+        record_scan_delta(scan_history, keywords, visited_urls, matches_found, normalize)
         db.session.add(scan_history)
         db.session.commit()
-        print(f"Scan {scan_id} completed and saved!")
-        
+        print(f"Retro-scan {scan_history.id}: {len(visited_urls)} snapshots, {len(matches_found)} matches")
+
         return jsonify(scan_history.to_dict()), 201
-        
+
     except Exception as e:
-        print(f"FATAL ERROR in scan: {str(e)}")
+        print(f"ERROR in retro scan: {str(e)}")
         import traceback
         traceback.print_exc()
         db.session.rollback()
-        return jsonify({'error': f"Scan failed: {str(e)}"}), 500
+        return jsonify({'error': f"Retro-scan failed: {str(e)}"}), 500
+
+@api_bp.route('/api/search', methods=['GET'])
+@jwt_required()
+def search_pages():
+    """
+    Full-text search over scanned pages.
+
+    Query params: q (FTS5 syntax: "phrase", prefix*, NEAR(a b, 10)),
+    days (only pages scanned in the last N days), limit, offset
+    """
+    try:
+        current_user_id = int(get_jwt_identity())
+        user = User.query.get(current_user_id)
+
+        query = (request.args.get('q') or '').strip()
+        if not query:
+            return jsonify({'error': 'Query parameter q is required'}), 400
+
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        days = request.args.get('days', type=float)
+        since = time.time() - days * 86400 if days else None
+
+        # Clients only see pages of their own URLs
+        urls = None
+        if not user or user.role != 'admin':
+            urls = [u.url for u in URL.query.filter_by(user_id=current_user_id).all()]
 
-@app.route('/api/scans', methods=['GET'])
+        try:
+            results = get_store('search_index').search(query, since=since, urls=urls, limit=limit, offset=offset)
+        except SearchQueryError as e:
+            return jsonify({'error': f"Invalid search query: {str(e)}"}), 400
+
+        for result in results:
+            result['scanned_at'] = datetime.utcfromtimestamp(result['scanned_at']).isoformat()
+
+        return json_response({'query': query, 'results': results, 'limit': limit, 'offset': offset})
+    except Exception as e:
+        print(f"ERROR in search_pages: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/api/scans', methods=['GET'])
 @jwt_required()
 def get_scans():
     try:
         current_user_id = int(get_jwt_identity())
         user = User.query.get(current_user_id)
         
-        if user and user.role == 'admin':
-            scans = ScanHistory.query.order_by(ScanHistory.started_at.desc()).all()
-        else:
-            scans = ScanHistory.query.filter_by(user_id=current_user_id).order_by(ScanHistory.started_at.desc()).all()
-             
-        return jsonify([scan.to_dict() for scan in scans]), 200
+        query = ScanHistory.query
+        if not user or user.role != 'admin':
+            query = query.filter_by(user_id=current_user_id)
+
+        # ?view=delta returns only what changed since the previous scan of the same keywords
+        if request.args.get('view') == 'delta':
+            query = query.options(db.joinedload(ScanHistory.delta))
+            if request.args.get('changed_only') in ('1', 'true'):
+                query = query.join(ScanHistory.delta).filter((ScanDelta.new_count > 0) | (ScanDelta.gone_count > 0))
+            scans = query.order_by(ScanHistory.started_at.desc()).all()
+            return json_response([scan.to_delta_dict(raw=True) for scan in scans])
+
+        scans = query.order_by(ScanHistory.started_at.desc()).all()
+        # Stored JSON columns go into the body as is, without a decode/encode round trip
+        return json_response([scan.to_dict(raw=True) for scan in scans])
     except Exception as e:
         print(f"ERROR in get_scans: {str(e)}")
         import traceback
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
+@api_bp.route('/api/scans/export', methods=['GET'])
+@jwt_required()
+def export_scans():
+    """
+    Stream every match of the user's scans, oldest first, as ?format=ndjson
+    (default) or csv; ?gzip=1 compresses it. Filters: from/to (YYYY-MM-DD,
+    by start date), status (comma-separated), and user_id for admins.
+    """
+    try:
+        current_user_id = int(get_jwt_identity())
+        user = User.query.get(current_user_id)
+
+        fmt = request.args.get('format', 'ndjson')
+        if fmt not in scan_export.FORMATS:
+            return jsonify({'error': f"format must be one of {', '.join(scan_export.FORMATS)}"}), 400
+        compress = request.args.get('gzip') in ('1', 'true')
+
+        user_ids = [current_user_id]
+        if user and user.role == 'admin':
+            user_ids = [request.args.get('user_id', type=int)] if request.args.get('user_id') else None
+        try:
+            started_from = datetime.strptime(request.args['from'], '%Y-%m-%d') if request.args.get('from') else None
+            started_to = None
+            if request.args.get('to'):
+                started_to = datetime.strptime(request.args['to'], '%Y-%m-%d') + timedelta(days=1)
+        except ValueError:
+            return jsonify({'error': 'from/to must be YYYY-MM-DD'}), 400
+        statuses = [s for s in request.args.get('status', '').split(',') if s]
+
+        query = scan_export.export_query(user_ids, statuses, started_from, started_to)
+        filename = f"scans.{fmt}" + ('.gz' if compress else '')
+        return Response(stream_with_context(scan_export.export_stream(query, fmt, compress)),
+                        mimetype='application/gzip' if compress else scan_export.FORMATS[fmt], headers={
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            'Cache-Control': 'no-store',
+            'X-Accel-Buffering': 'no'
+        })
+    except Exception as e:
+        print(f"ERROR in export_scans: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+def _profile_for(scan_id):
+    """(profile, error response) for the current user's view of a scan's profile"""
+    current_user_id = int(get_jwt_identity())
+    user = User.query.get(current_user_id)
+    profile = ScanProfile.query.get(scan_id)
+    if profile is None:
+        return None, (jsonify({'error': 'No profile for this scan'}), 404)
+    if profile.user_id != current_user_id and (not user or user.role != 'admin'):
+        return None, (jsonify({'error': 'Unauthorized'}), 403)
+    return profile, None
+
+@api_bp.route('/api/scans/<scan_id>/profile', methods=['GET'])
+@jwt_required()
+def get_scan_profile(scan_id):
+    """Summary of a profiled scan: wall time, top functions, top allocation sites"""
+    try:
+        profile, error = _profile_for(scan_id)
+        if error:
+            return error
+        return json_response(profile.to_dict(raw=True))
+    except Exception as e:
+        print(f"ERROR in get_scan_profile: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/api/scans/<scan_id>/profile/download', methods=['GET'])
+@jwt_required()
+def download_scan_profile(scan_id):
+    """The profile artifact zip: summary.json, stacks.collapsed or profile.pstats, allocations.txt"""
+    try:
+        profile, error = _profile_for(scan_id)
+        if error:
+            return error
+        if not os.path.exists(profile.path):
+            return jsonify({'error': 'Profile artifact is no longer on disk'}), 410
+        return send_file(profile.path, mimetype='application/zip', as_attachment=True,
+                         download_name=f"scan-{scan_id}-{profile.mode}-profile.zip")
+    except Exception as e:
+        print(f"ERROR in download_scan_profile: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+# ==================== JOB QUEUE ====================
+
+@api_bp.route('/api/jobs', methods=['GET'])
+@jwt_required()
+def get_jobs():
+    """Scan jobs, newest first, optionally ?status=dead for the dead-letter list (admin only)"""
+    try:
+        user = User.query.get(int(get_jwt_identity()))
+        if not user or user.role != 'admin':
+            return jsonify({'error': 'Unauthorized'}), 403
+
+        query = ScanJob.query
+        if request.args.get('status'):
+            query = query.filter_by(status=request.args['status'])
+        limit = min(request.args.get('limit', 100, type=int), 500)
+        jobs = query.order_by(ScanJob.created_at.desc()).limit(limit).all()
+        return json_response({'stats': job_queue.queue_stats(), 'jobs': [job.to_dict() for job in jobs]})
+    except Exception as e:
+        print(f"ERROR in get_jobs: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/api/jobs/<job_id>/retry', methods=['POST'])
+@jwt_required()
+def retry_job(job_id):
+    """Requeue a dead-lettered job (admin only)"""
+    try:
+        user = User.query.get(int(get_jwt_identity()))
+        if not user or user.role != 'admin':
+            return jsonify({'error': 'Unauthorized'}), 403
+        if not job_queue.retry_job(job_id):
+            return jsonify({'error': 'No dead-lettered job with that id'}), 404
+        db.session.commit()
+        return jsonify(ScanJob.query.get(job_id).to_dict()), 200
+    except Exception as e:
+        db.session.rollback()
+        print(f"ERROR in retry_job: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/api/tenants', methods=['GET'])
+@jwt_required()
+def get_tenants():
+    """Per-user scan quotas, queue depth and the current fair-share order (admin only)"""
+    try:
+        user = User.query.get(int(get_jwt_identity()))
+        if not user or user.role != 'admin':
+            return jsonify({'error': 'Unauthorized'}), 403
+
+        default_cap = current_app.config['SCAN_TENANT_MAX_CONCURRENT']
+        counts = {}
+        for user_id, status, count in db.session.query(ScanJob.user_id, ScanJob.status, db.func.count(ScanJob.id)) \
+                .filter(ScanJob.status.in_(('queued', 'running'))).group_by(ScanJob.user_id, ScanJob.status):
+            counts.setdefault(user_id, {})[status] = count
+        quotas = {q.user_id: q for q in TenantQuota.query.all()}
+
+        tenants = []
+        for user_id in sorted(set(counts) | set(quotas)):
+            quota = quotas.get(user_id)
+            tenants.append({
+                'user_id': user_id,
+                'weight': quota.weight if quota else 1,
+                'max_concurrent': quota.max_concurrent if quota and quota.max_concurrent is not None else default_cap,
+                'queued': counts.get(user_id, {}).get('queued', 0),
+                'running': counts.get(user_id, {}).get('running', 0)
+            })
+        order = [t['user_id'] for t in job_queue.tenant_schedule(default_max_concurrent=default_cap)]
+        return json_response({'tenants': tenants, 'next_up': order})
+    except Exception as e:
+        print(f"ERROR in get_tenants: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/api/tenants/<int:user_id>', methods=['PUT'])
+@jwt_required()
+def update_tenant(user_id):
+    """Set a user's scheduling weight and/or concurrency cap (admin only)"""
+    try:
+        user = User.query.get(int(get_jwt_identity()))
+        if not user or user.role != 'admin':
+            return jsonify({'error': 'Unauthorized'}), 403
+        if not User.query.get(user_id):
+            return jsonify({'error': 'User not found'}), 404
+
+        data = request.get_json()
+        quota = TenantQuota.query.get(user_id)
+        if quota is None:
+            quota = TenantQuota(user_id=user_id, weight=1, pass_value=0.0)
+            db.session.add(quota)
+        if 'weight' in data:
+            if int(data['weight']) < 1:
+                return jsonify({'error': 'weight must be at least 1'}), 400
+            quota.weight = int(data['weight'])
+        if 'max_concurrent' in data:
+            if data['max_concurrent'] is not None and int(data['max_concurrent']) < 1:
+                return jsonify({'error': 'max_concurrent must be at least 1'}), 400
+            quota.max_concurrent = None if data['max_concurrent'] is None else int(data['max_concurrent'])
+        db.session.commit()
+        return jsonify(quota.to_dict()), 200
+    except Exception as e:
+        db.session.rollback()
+        print(f"ERROR in update_tenant: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+# ==================== RETENTION ====================
+
+@api_bp.route('/api/retention', methods=['GET'])
+@jwt_required()
+def get_retention():
+    """Retention defaults, per-user policies and how much history is stored (admin only)"""
+    try:
+        user = User.query.get(int(get_jwt_identity()))
+        if not user or user.role != 'admin':
+            return jsonify({'error': 'Unauthorized'}), 403
+        config = current_app.config
+        return jsonify({
+            'defaults': {
+                'detail_days': config['SCAN_RETENTION_DETAIL_DAYS'],
+                'rollup_days': config['SCAN_RETENTION_ROLLUP_DAYS'],
+                'batch_size': config['SCAN_RETENTION_BATCH_SIZE']
+            },
+            'policies': [p.to_dict() for p in RetentionPolicy.query.order_by(RetentionPolicy.user_id)],
+            'stats': retention.retention_stats(config['SCAN_RETENTION_DETAIL_DAYS'],
+                                               config['SCAN_RETENTION_ROLLUP_DAYS'])
+        }), 200
+    except Exception as e:
+        print(f"ERROR in get_retention: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/api/retention/<int:user_id>', methods=['PUT'])
+@jwt_required()
+def update_retention(user_id):
+    """Set a user's detail_days / rollup_days (null falls back to the default; admin only)"""
+    try:
+        user = User.query.get(int(get_jwt_identity()))
+        if not user or user.role != 'admin':
+            return jsonify({'error': 'Unauthorized'}), 403
+        if not User.query.get(user_id):
+            return jsonify({'error': 'User not found'}), 404
+
+        data = request.get_json()
+        policy = RetentionPolicy.query.get(user_id)
+        if policy is None:
+            policy = RetentionPolicy(user_id=user_id)
+            db.session.add(policy)
+        for field in ('detail_days', 'rollup_days'):
+            if field in data:
+                if data[field] is not None and int(data[field]) < 0:
+                    return jsonify({'error': f'{field} must be 0 or more'}), 400
+                setattr(policy, field, None if data[field] is None else int(data[field]))
+        db.session.commit()
+        return jsonify(policy.to_dict()), 200
+    except Exception as e:
+        db.session.rollback()
+        print(f"ERROR in update_retention: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/api/retention/run', methods=['POST'])
+@jwt_required()
+def run_retention():
+    """Run a retention pass now, optionally limited to ?max_batches=N (admin only)"""
+    try:
+        user = User.query.get(int(get_jwt_identity()))
+        if not user or user.role != 'admin':
+            return jsonify({'error': 'Unauthorized'}), 403
+        return jsonify(run_retention_pass(request.args.get('max_batches', type=int))), 200
+    except Exception as e:
+        db.session.rollback()
+        print(f"ERROR in run_retention: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/api/scans/rollups', methods=['GET'])
+@jwt_required()
+def get_scan_rollups():
+    """Daily match counts of compacted scans, filtered by ?from=&to= (YYYY-MM-DD), url, keyword"""
+    try:
+        current_user_id = int(get_jwt_identity())
+        user = User.query.get(current_user_id)
+
+        query = ScanRollup.query
+        if not user or user.role != 'admin':
+            query = query.filter_by(user_id=current_user_id)
+        elif request.args.get('user_id'):
+            query = query.filter_by(user_id=request.args.get('user_id', type=int))
+        try:
+            if request.args.get('from'):
+                query = query.filter(ScanRollup.day >= datetime.strptime(request.args['from'], '%Y-%m-%d').date())
+            if request.args.get('to'):
+                query = query.filter(ScanRollup.day <= datetime.strptime(request.args['to'], '%Y-%m-%d').date())
+        except ValueError:
+            return jsonify({'error': 'from/to must be YYYY-MM-DD'}), 400
+        if request.args.get('url'):
+            query = query.filter_by(url=request.args['url'])
+        if request.args.get('keyword'):
+            query = query.filter_by(keyword=request.args['keyword'])
+        limit = min(request.args.get('limit', 1000, type=int), 10000)
+        rows = query.order_by(ScanRollup.day.desc(), ScanRollup.url, ScanRollup.keyword).limit(limit).all()
+        return json_response([row.to_dict() for row in rows])
+    except Exception as e:
+        print(f"ERROR in get_scan_rollups: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+# ==================== HOST HEALTH ====================
+
+@api_bp.route('/api/hosts/health', methods=['GET'])
+@jwt_required()
+def get_host_health():
+    """Latency, failure history and circuit state of the hosts behind the URL table"""
+    try:
+        current_user_id = int(get_jwt_identity())
+        user = User.query.get(current_user_id)
+
+        url_query = URL.query
+        if not user or user.role != 'admin':
+            url_query = url_query.filter_by(user_id=current_user_id)
+        url_counts = {}
+        for url in url_query.all():
+            host = host_of(url.url)
+            url_counts[host] = url_counts.get(host, 0) + 1
+
+        hosts = get_store('host_health').snapshot(url_counts.keys())
+        state = request.args.get('state')
+        if state:
+            hosts = [h for h in hosts if h['state'] == state]
+        for h in hosts:
+            h['url_count'] = url_counts.get(h['host'], 0)
+        return json_response(hosts)
+    except Exception as e:
+        print(f"ERROR in get_host_health: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/api/hosts/<host>/reset', methods=['POST'])
+@jwt_required()
+def reset_host_health(host):
+    """Close a host's circuit and clear its history (admin only)"""
+    try:
+        user = User.query.get(int(get_jwt_identity()))
+        if not user or user.role != 'admin':
+            return jsonify({'error': 'Unauthorized'}), 403
+        if not get_store('host_health').reset(host):
+            return jsonify({'error': 'Host not found'}), 404
+        return jsonify({'message': f'Health history for {host} cleared'}), 200
+    except Exception as e:
+        print(f"ERROR in reset_host_health: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/api/hosts/dns-cache', methods=['GET'])
+@jwt_required()
+def get_dns_cache_stats():
+    """
+    Hit/miss counters of the scan DNS cache (admin only).
+
+    The cache lives in each process, so these cover only scans run by the
+    process answering the request; worker.py processes keep their own.
+    """
+    try:
+        user = User.query.get(int(get_jwt_identity()))
+        if not user or user.role != 'admin':
+            return jsonify({'error': 'Unauthorized'}), 403
+        from simple_scanner import dns_cache
+        return jsonify(dns_cache.snapshot()), 200
+    except Exception as e:
+        print(f"ERROR in get_dns_cache_stats: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
 # ==================== HEALTH CHECK ====================
 
-@app.route('/api/health', methods=['GET'])
+@api_bp.route('/api/health', methods=['GET'])
 def health_check():
     return jsonify({'status': 'Backend is running'}), 200
 
 # ==================== RUN ====================
 
 if __name__ == '__main__':
+    app = create_app()
+    with app.app_context():
+        init_db()
     app.run(debug=True, host='0.0.0.0', port=5000)
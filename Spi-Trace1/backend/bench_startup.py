@@ -0,0 +1,45 @@
+"""
+Cold-start benchmark for a web worker: time to import the app module and
+build the Flask app, measured in fresh interpreters (median of N runs).
+
+Also reports whether the scanner's HTTP/HTML stack (requests, bs4) was
+imported, since that is only needed once a scan actually runs.
+
+Usage: python bench_startup.py [runs] [backend_dir]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+CHILD = """
+import sys, time, json
+started = time.perf_counter()
+import app
+if hasattr(app, 'create_app'):
+    app.create_app()
+elapsed = time.perf_counter() - started
+print(json.dumps({'ms': elapsed * 1000, 'modules': len(sys.modules),
+                  'scanner_loaded': 'requests' in sys.modules or 'bs4' in sys.modules}))
+"""
+
+
+def run_once(backend_dir):
+    out = subprocess.run(
+        [sys.executable, '-c', CHILD], cwd=backend_dir, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+if __name__ == '__main__':
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    backend_dir = sys.argv[2] if len(sys.argv) > 2 else os.path.dirname(os.path.abspath(__file__))
+
+    run_once(backend_dir)  # warm the OS file cache and .pyc files
+    samples = [run_once(backend_dir) for _ in range(runs)]
+    times = sorted(s['ms'] for s in samples)
+    print(f"{backend_dir}")
+    print(f"import + app setup: median {statistics.median(times):.0f} ms, "
+          f"min {times[0]:.0f} ms, max {times[-1]:.0f} ms over {runs} runs")
+    print(f"modules loaded: {samples[-1]['modules']}, scanner stack imported: {samples[-1]['scanner_loaded']}")
@@ -0,0 +1,37 @@
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app import create_app, init_db
+from models import db, User, URL
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path}/test.db',
+        'PAGE_ARCHIVE_DIR': str(tmp_path / 'page_archive'),
+        'SEARCH_INDEX_PATH': str(tmp_path / 'search_index.db'),
+        'HOST_HEALTH_PATH': str(tmp_path / 'host_health.db'),
+        'SCAN_PROFILE_DIR': str(tmp_path / 'scan_profiles'),
+    })
+    with app.app_context():
+        init_db()
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def user(app):
+    """A client user with one enabled URL; (user id, auth headers)"""
+    with app.app_context():
+        user = User(email='client@example.test', password_hash='x', name='client', role='client')
+        db.session.add(user)
+        db.session.commit()
+        db.session.add(URL(id='url-1', user_id=user.id, url='http://127.0.0.1:9/page', name='page'))
+        db.session.commit()
+        token = create_access_token(identity=str(user.id))
+        return user.id, {'Authorization': f'Bearer {token}'}
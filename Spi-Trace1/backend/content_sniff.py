@@ -0,0 +1,189 @@
+"""
+Content-type prefiltering and charset resolution for fetched pages.
+
+fetch_page checks a response's Content-Type and first bytes before reading
+the rest, so PDFs, images, archives and other binaries are dropped without
+being downloaded in full. Bodies that are kept are decoded with the first
+charset found, cheapest first:
+
+    byte order mark > declared charset (Content-Type) > <meta charset> or
+    XML declaration in the first SNIFF_BYTES > UTF-8 validity of the first
+    DETECT_BYTES > charset_normalizer on the first DETECT_BYTES > windows-1252
+
+so a statistical detector only ever sees a bounded prefix, and only when
+the page gave no hint at all.
+"""
+import codecs
+import re
+from typing import Optional, Tuple
+
+# Bytes searched for a <meta> / XML charset declaration
+SNIFF_BYTES = 4096
+# Bytes given to the UTF-8 check and the statistical detector
+DETECT_BYTES = 64 * 1024
+
+HTML, TEXT = 'html', 'text'
+
+# Content types parsed as HTML, and ones whose body is matched as plain text
+HTML_TYPES = {'text/html', 'application/xhtml+xml'}
+TEXT_TYPES = {'text/plain', 'text/xml', 'application/xml', 'application/json', 'application/rss+xml',
+              'application/atom+xml', 'text/csv', 'text/markdown'}
+# Types that may be mislabeled pages; the first bytes decide
+GENERIC_TYPES = {'', 'application/octet-stream', 'binary/octet-stream', 'application/unknown'}
+
+BOMS = (
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+MAGIC = (
+    (b'%PDF-', 'application/pdf'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'RIFF', 'audio/video (RIFF)'),
+    (b'OggS', 'audio/ogg'),
+    (b'ID3', 'audio/mpeg'),
+    (b'\x1a\x45\xdf\xa3', 'video/webm'),
+    (b'PK\x03\x04', 'application/zip'),
+    (b'\x1f\x8b', 'application/gzip'),
+    (b'7z\xbc\xaf\x27\x1c', 'application/x-7z-compressed'),
+    (b'Rar!\x1a\x07', 'application/vnd.rar'),
+    (b'MZ', 'application/x-msdownload'),
+    (b'\x7fELF', 'application/x-executable'),
+    (b'wOFF', 'font/woff'),
+    (b'wOF2', 'font/woff2'),
+)
+
+_META_CHARSET = re.compile(
+    rb'<meta[^>]+?charset\s*=\s*["\']?\s*([a-zA-Z0-9_.:-]+)', re.IGNORECASE
+)
+_XML_ENCODING = re.compile(rb'^<\?xml[^>]+encoding\s*=\s*["\']([a-zA-Z0-9_.:-]+)')
+# Control characters that don't occur in text (tab, newlines, form feed and escape do)
+_CONTROL_BYTES = re.compile(rb'[\x00-\x08\x0b\x0e-\x1a\x1c-\x1f]')
+_HTML_START = re.compile(rb'^\s*<(?:!doctype|html|head|body|meta|title|!--|div|p\b)', re.IGNORECASE)
+
+
+class UnsupportedContent(Exception):
+    """The response is not a page the scanner can match keywords in; its body was not downloaded"""
+
+
+def media_type(content_type: Optional[str]) -> str:
+    return (content_type or '').split(';', 1)[0].strip().lower()
+
+
+def declared_charset(content_type: Optional[str]) -> Optional[str]:
+    """The charset parameter of a Content-Type header, if any"""
+    for param in (content_type or '').split(';')[1:]:
+        name, _, value = param.partition('=')
+        if name.strip().lower() == 'charset':
+            return value.strip().strip('"\'') or None
+    return None
+
+
+def _codec(name: Optional[str]) -> Optional[str]:
+    # A label Python knows, with the substitutions browsers make
+    if not name:
+        return None
+    try:
+        codec = codecs.lookup(name.strip()).name
+    except LookupError:
+        return None
+    if codec in ('latin-1', 'iso8859-1', 'ascii'):
+        return 'cp1252'
+    return codec
+
+
+def magic_type(head: bytes) -> Optional[str]:
+    """Media type of a binary format recognised from its first bytes"""
+    for signature, kind in MAGIC:
+        if head.startswith(signature):
+            return kind
+    if head[4:8] == b'ftyp':
+        return 'video/mp4'
+    return None
+
+
+def classify(content_type: Optional[str], head: bytes) -> str:
+    """
+    Decide how to handle a response from its Content-Type and first bytes.
+
+    Returns:
+        HTML or TEXT
+
+    Raises:
+        UnsupportedContent: for binary and other non-text responses
+    """
+    declared = media_type(content_type)
+    sample = head[:SNIFF_BYTES]
+    has_bom = sample.startswith(tuple(bom for bom, _ in BOMS))
+    is_html = declared in HTML_TYPES
+    if is_html or declared in TEXT_TYPES or (
+        declared.startswith('text/') and declared not in ('text/css', 'text/javascript')
+    ):
+        # Binaries served as text/html or text/plain are common, but short signatures such as
+        # MZ or ID3 are also plain words: believe one only if the bytes look binary too
+        binary = magic_type(head)
+        if binary and not has_bom and _CONTROL_BYTES.search(sample):
+            raise UnsupportedContent(f"Skipped non-HTML content ({binary} served as {declared})")
+        return HTML if is_html else TEXT
+    if declared in GENERIC_TYPES:
+        binary = magic_type(head)
+        if binary and not has_bom:
+            raise UnsupportedContent(f"Skipped non-HTML content ({binary})")
+        if b'\x00' in sample and not has_bom:
+            raise UnsupportedContent(f"Skipped non-HTML content ({declared or 'binary, no content type'})")
+        return HTML if _HTML_START.match(sample.lstrip(codecs.BOM_UTF8)) else TEXT
+    raise UnsupportedContent(f"Skipped non-HTML content ({declared})")
+
+
+def sniff_charset(head: bytes) -> Optional[str]:
+    """Charset from a byte order mark, <meta> tag or XML declaration in the first bytes"""
+    for bom, codec in BOMS:
+        if head.startswith(bom):
+            return codec
+    sample = head[:SNIFF_BYTES]
+    match = _XML_ENCODING.match(sample) or _META_CHARSET.search(sample)
+    if match:
+        codec = _codec(match.group(1).decode('ascii', 'ignore'))
+        # A declaration readable as ASCII means the page is not really UTF-16/32
+        if codec and not codec.startswith(('utf-16', 'utf-32')):
+            return codec
+    return None
+
+
+def detect_charset(body: bytes) -> str:
+    """Best guess for an undeclared charset, looking at no more than DETECT_BYTES"""
+    sample = body[:DETECT_BYTES]
+    try:
+        # Final=False tolerates a multi-byte character cut off by the slice
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=len(body) <= DETECT_BYTES)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+    try:
+        from charset_normalizer import from_bytes
+    except ImportError:
+        return 'cp1252'
+    best = from_bytes(sample).best()
+    return (_codec(best.encoding) if best is not None else None) or 'cp1252'
+
+
+def resolve_charset(body: bytes, content_type: Optional[str]) -> str:
+    for bom, codec in BOMS:
+        if body.startswith(bom):
+            return codec
+    return _codec(declared_charset(content_type)) or sniff_charset(body) or detect_charset(body)
+
+
+def decode_body(body: bytes, content_type: Optional[str]) -> Tuple[str, str]:
+    """
+    Returns:
+        (text, charset) for a fetched body
+    """
+    charset = resolve_charset(body, content_type)
+    return body.decode(charset, errors='replace'), charset
@@ -0,0 +1,230 @@
+"""
+In-process DNS cache for scan fetches.
+
+Scans resolve the same few dozen hostnames for hundreds of URLs; this keeps
+answers for their TTL so each host is looked up once per TTL rather than
+once per request, and smooths over resolver hiccups:
+
+- concurrent lookups of the same host share one resolver call
+- "no such host" answers are cached for NEGATIVE_TTL_SECONDS
+- on a temporary resolver failure an expired answer is reused for up to
+  STALE_TTL_SECONDS instead of failing the fetch
+
+TTLs come from the DNS answer when the optional `dnspython` package is
+installed; otherwise the system resolver is used with DEFAULT_TTL_SECONDS.
+install() routes urllib3's (and so requests') connection setup through a
+cache.
+"""
+import ipaddress
+import os
+import socket
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import dns.exception
+    import dns.resolver
+except ImportError:  # optional dependency
+    dns = None
+
+DEFAULT_TTL_SECONDS = 300
+MIN_TTL_SECONDS = 5
+MAX_TTL_SECONDS = 3600
+NEGATIVE_TTL_SECONDS = 60
+STALE_TTL_SECONDS = 3600
+
+# A resolver returns (addresses, ttl_seconds or None) and raises
+# socket.gaierror; EAI_NONAME/EAI_NODATA mean the host does not exist
+Resolver = Callable[[str], Tuple[List[str], Optional[float]]]
+
+
+def system_resolver(host: str) -> Tuple[List[str], Optional[float]]:
+    """Resolve through getaddrinfo (no TTL available)"""
+    infos = socket.getaddrinfo(host, None, socket.AF_UNSPEC, socket.SOCK_STREAM)
+    return list(dict.fromkeys(info[4][0] for info in infos)), None
+
+
+def dnspython_resolver(nameservers: Optional[List[str]] = None) -> Resolver:
+    """
+    Resolver reporting record TTLs, using dnspython.
+
+    Args:
+        nameservers: IPv4 "ip" or "ip:port" entries sharing one port (e.g. a
+            local stub resolver); the system configuration when None, in
+            which case names DNS doesn't know (/etc/hosts entries such as
+            localhost) are passed on to the system resolver
+    """
+    resolver = dns.resolver.Resolver(configure=nameservers is None)
+    if nameservers is not None:
+        resolver.nameservers = [ns.partition(':')[0] for ns in nameservers]
+        ports = [ns.partition(':')[2] for ns in nameservers if ':' in ns]
+        if ports:
+            resolver.port = int(ports[0])
+
+    def resolve(host: str) -> Tuple[List[str], Optional[float]]:
+        addresses, ttls = [], []
+        for rdtype in ('A', 'AAAA'):
+            try:
+                answer = resolver.resolve(host, rdtype)
+            except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
+                continue
+            except dns.exception.DNSException as e:
+                raise socket.gaierror(socket.EAI_AGAIN, f"DNS lookup of {host} failed: {e}")
+            addresses.extend(rdata.address for rdata in answer)
+            ttls.append(answer.rrset.ttl)
+        if not addresses:
+            if nameservers is None:
+                return system_resolver(host)
+            raise socket.gaierror(socket.EAI_NONAME, f"No address for {host}")
+        return addresses, min(ttls)
+
+    return resolve
+
+
+def default_resolver() -> Resolver:
+    if dns is None:
+        return system_resolver
+    nameservers = os.environ.get('SCAN_DNS_NAMESERVERS')
+    return dnspython_resolver(nameservers.split(',') if nameservers else None)
+
+
+class _Entry:
+    __slots__ = ('addresses', 'error', 'expires_at', 'stale_until')
+
+    def __init__(self, addresses: List[str], error: Optional[socket.gaierror], expires_at: float, stale_until: float):
+        self.addresses = addresses
+        self.error = error
+        self.expires_at = expires_at
+        self.stale_until = stale_until
+
+
+class _Lookup:
+    """A resolver call in progress; threads wanting the same host wait on it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.addresses: Optional[List[str]] = None
+        self.error: Optional[socket.gaierror] = None
+
+
+class DnsCache:
+    def __init__(self, resolver: Optional[Resolver] = None):
+        self.resolver = resolver or default_resolver()
+        self._lock = threading.Lock()
+        self._entries: Dict[str, _Entry] = {}
+        self._inflight: Dict[str, _Lookup] = {}
+        self.stats = {
+            'hits': 0, 'misses': 0, 'negative_hits': 0, 'coalesced': 0,
+            'stale_served': 0, 'lookups': 0, 'lookup_errors': 0,
+        }
+
+    def resolve(self, host: str) -> List[str]:
+        """
+        Addresses for host, from the cache when fresh.
+
+        Raises:
+            socket.gaierror: The host does not exist or could not be resolved
+        """
+        host = host.lower().rstrip('.')
+        with self._lock:
+            entry = self._entries.get(host)
+            if entry is not None and time.monotonic() < entry.expires_at:
+                if entry.error is not None:
+                    self.stats['negative_hits'] += 1
+                    raise entry.error
+                self.stats['hits'] += 1
+                return entry.addresses
+            lookup = self._inflight.get(host)
+            owner = lookup is None
+            if owner:
+                lookup = self._inflight[host] = _Lookup()
+                self.stats['misses'] += 1
+            else:
+                self.stats['coalesced'] += 1
+
+        if not owner:
+            # Another thread is already resolving this host; share its outcome
+            lookup.done.wait()
+            if lookup.error is not None:
+                raise lookup.error
+            return lookup.addresses
+
+        try:
+            lookup.addresses = self._lookup(host, entry)
+            return lookup.addresses
+        except socket.gaierror as e:
+            lookup.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[host]
+            lookup.done.set()
+
+    def _lookup(self, host: str, previous: Optional[_Entry]) -> List[str]:
+        now = time.monotonic()
+        try:
+            with self._lock:
+                self.stats['lookups'] += 1
+            addresses, ttl = self.resolver(host)
+        except socket.gaierror as e:
+            with self._lock:
+                self.stats['lookup_errors'] += 1
+                if e.errno in (socket.EAI_NONAME, getattr(socket, 'EAI_NODATA', socket.EAI_NONAME)):
+                    self._entries[host] = _Entry([], e, now + NEGATIVE_TTL_SECONDS, now + NEGATIVE_TTL_SECONDS)
+                elif previous is not None and previous.error is None and now < previous.stale_until:
+                    # Resolver hiccup: keep using the last good answer for a while
+                    self.stats['stale_served'] += 1
+                    return previous.addresses
+            raise
+
+        ttl = DEFAULT_TTL_SECONDS if ttl is None else min(max(ttl, MIN_TTL_SECONDS), MAX_TTL_SECONDS)
+        with self._lock:
+            self._entries[host] = _Entry(addresses, None, now + ttl, now + ttl + STALE_TTL_SECONDS)
+        return addresses
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return dict(self.stats, entries=len(self._entries))
+
+
+def _is_ip(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host.strip('[]'))
+        return True
+    except ValueError:
+        return False
+
+
+_installed_cache: Optional[DnsCache] = None
+
+
+def install(cache: DnsCache) -> None:
+    """Resolve hostnames for urllib3 (and so requests) connections through cache"""
+    global _installed_cache
+    import urllib3.util.connection as urllib3_connection
+
+    if _installed_cache is None:
+        original = urllib3_connection.create_connection
+
+        def create_connection(address, *args, **kwargs):
+            host, port = address
+            if _installed_cache is None or _is_ip(host):
+                return original(address, *args, **kwargs)
+            addresses = _installed_cache.resolve(host)
+            if urllib3_connection.allowed_gai_family() == socket.AF_INET:
+                addresses = [a for a in addresses if ':' not in a] or addresses
+            error = None
+            for ip in addresses:
+                try:
+                    return original((ip, port), *args, **kwargs)
+                except OSError as e:
+                    error = e
+            raise error or OSError(f"No addresses for {host}")
+
+        urllib3_connection.create_connection = create_connection
+    _installed_cache = cache
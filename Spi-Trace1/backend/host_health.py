@@ -0,0 +1,243 @@
+"""
+Per-host health tracking: latency history, failure counts and a circuit breaker.
+
+A host whose fetches fail FAILURE_THRESHOLD times in a row has its circuit
+opened and is skipped by scans. Once its backoff has elapsed a single probe
+fetch is let through (half-open): success closes the circuit, failure opens
+it again with the backoff doubled. Fetch timeouts follow each host's p95
+latency, so a fast host that stops answering is given up on quickly.
+
+State lives in a small SQLite database shared by the web and worker
+processes, so it survives restarts, every process sees the same circuits
+and it can be listed and reset through the API.
+"""
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+# Consecutive failures that open a host's circuit
+FAILURE_THRESHOLD = 5
+# Backoff before the first probe of an open circuit, doubled per failed probe
+BASE_BACKOFF_SECONDS = 60
+MAX_BACKOFF_SECONDS = 6 * 60 * 60
+# Successful fetch latencies kept per host for the p95 estimate
+LATENCY_SAMPLES = 50
+MIN_SAMPLES_FOR_ADAPTIVE_TIMEOUT = 5
+TIMEOUT_P95_MULTIPLIER = 3
+MIN_TIMEOUT_SECONDS = 2.0
+MAX_TIMEOUT_SECONDS = 30.0
+# A half-open probe that hasn't reported back by then (its process died) lets another through
+PROBE_TIMEOUT_SECONDS = 2 * MAX_TIMEOUT_SECONDS
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS host_health (
+    host TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    consecutive_failures INTEGER NOT NULL,
+    open_count INTEGER NOT NULL,
+    requests INTEGER NOT NULL,
+    failures INTEGER NOT NULL,
+    latencies TEXT NOT NULL,
+    last_error TEXT,
+    last_success_at REAL,
+    last_failure_at REAL,
+    next_probe_at REAL
+);
+"""
+
+
+class HostCircuitOpen(Exception):
+    """The URL's host is failing and its circuit is open; the fetch was skipped"""
+
+
+def host_of(url: str) -> str:
+    """Health key of a URL: its hostname, plus the port if one is given"""
+    if '://' not in url:
+        url = 'http://' + url
+    parts = urlsplit(url)
+    host = (parts.hostname or '').lower()
+    return f"{host}:{parts.port}" if parts.port else host
+
+
+def _p95(samples: List[float]) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[max(0, -(-len(ordered) * 95 // 100) - 1)]
+
+
+class _HostState:
+    __slots__ = ('host', 'state', 'consecutive_failures', 'open_count', 'requests', 'failures',
+                 'latencies', 'last_error', 'last_success_at', 'last_failure_at', 'next_probe_at')
+
+    def __init__(self, host: str):
+        self.host = host
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.open_count = 0  # times opened since the last success; drives the backoff
+        self.requests = 0
+        self.failures = 0
+        self.latencies: List[float] = []
+        self.last_error: Optional[str] = None
+        self.last_success_at: Optional[float] = None
+        self.last_failure_at: Optional[float] = None
+        self.next_probe_at: Optional[float] = None
+
+    def to_dict(self) -> Dict:
+        p95 = _p95(self.latencies)
+        return {
+            'host': self.host,
+            'state': self.state,
+            'consecutive_failures': self.consecutive_failures,
+            'requests': self.requests,
+            'failures': self.failures,
+            'failure_rate': round(self.failures / self.requests, 3) if self.requests else 0.0,
+            'p50_ms': round(sorted(self.latencies)[len(self.latencies) // 2] * 1000, 1) if self.latencies else None,
+            'p95_ms': round(p95 * 1000, 1) if p95 is not None else None,
+            'last_error': self.last_error,
+            'last_success_at': self.last_success_at,
+            'last_failure_at': self.last_failure_at,
+            'next_probe_at': self.next_probe_at,
+        }
+
+
+class HostHealthTracker:
+    """
+    Circuit breakers of every process sharing the database file.
+
+    Nothing is cached in memory: each call reads the host's row, and every
+    change is made inside one IMMEDIATE transaction with counters bumped in
+    SQL, so scans running in web and worker processes count into the same
+    rows and a reset through the API applies everywhere.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _write(self, host: str):
+        """Transaction holding SQLite's write lock, with the host's row created if missing"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO host_health (host, state, consecutive_failures, open_count, requests, "
+                    "failures, latencies) VALUES (?, ?, 0, 0, 0, 0, '[]')",
+                    (host, CLOSED)
+                )
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _states(self) -> List[_HostState]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT host, state, consecutive_failures, open_count, requests, failures, latencies, "
+                "last_error, last_success_at, last_failure_at, next_probe_at FROM host_health"
+            ).fetchall()
+        states = []
+        for row in rows:
+            state = _HostState(row[0])
+            (state.state, state.consecutive_failures, state.open_count, state.requests, state.failures) = row[1:6]
+            state.latencies = json.loads(row[6])
+            state.last_error, state.last_success_at, state.last_failure_at, state.next_probe_at = row[7:]
+            states.append(state)
+        return states
+
+    def allow(self, url: str) -> bool:
+        """
+        Whether a fetch of url may go ahead.
+
+        An open circuit past its backoff lets exactly one caller (in any
+        process) through as the probe; everyone else is refused until the
+        probe reports back. A probe that never reports back, because its
+        process died, is given up on after PROBE_TIMEOUT_SECONDS.
+        """
+        host = host_of(url)
+        with self._lock:
+            row = self._conn.execute("SELECT state FROM host_health WHERE host = ?", (host,)).fetchone()
+            if row is None or row[0] == CLOSED:
+                return True
+            now = time.time()
+            claimed = self._conn.execute(
+                "UPDATE host_health SET state = ?, next_probe_at = ? "
+                "WHERE host = ? AND state != ? AND COALESCE(next_probe_at, 0) <= ?",
+                (HALF_OPEN, now + PROBE_TIMEOUT_SECONDS, host, CLOSED, now)
+            ).rowcount
+            return claimed == 1
+
+    def timeout_for(self, url: str, default: float) -> float:
+        """Fetch timeout for url: TIMEOUT_P95_MULTIPLIER x the host's p95 latency, within bounds"""
+        with self._lock:
+            row = self._conn.execute("SELECT latencies FROM host_health WHERE host = ?", (host_of(url),)).fetchone()
+        latencies = json.loads(row[0]) if row else []
+        if len(latencies) < MIN_SAMPLES_FOR_ADAPTIVE_TIMEOUT:
+            return default
+        return min(max(_p95(latencies) * TIMEOUT_P95_MULTIPLIER, MIN_TIMEOUT_SECONDS), MAX_TIMEOUT_SECONDS)
+
+    def record_success(self, url: str, latency_seconds: Optional[float] = None) -> None:
+        """Record an answered request; latency_seconds is None when it doesn't reflect fetch time"""
+        host = host_of(url)
+        with self._write(host) as conn:
+            conn.execute(
+                "UPDATE host_health SET requests = requests + 1, consecutive_failures = 0, open_count = 0, "
+                "state = ?, next_probe_at = NULL, last_success_at = ? WHERE host = ?",
+                (CLOSED, time.time(), host)
+            )
+            if latency_seconds is not None:
+                latencies = json.loads(conn.execute(
+                    "SELECT latencies FROM host_health WHERE host = ?", (host,)
+                ).fetchone()[0])
+                latencies.append(round(latency_seconds, 4))
+                conn.execute("UPDATE host_health SET latencies = ? WHERE host = ?",
+                             (json.dumps(latencies[-LATENCY_SAMPLES:]), host))
+
+    def record_failure(self, url: str, error: str) -> None:
+        host = host_of(url)
+        now = time.time()
+        with self._write(host) as conn:
+            conn.execute(
+                "UPDATE host_health SET requests = requests + 1, failures = failures + 1, "
+                "consecutive_failures = consecutive_failures + 1, last_error = ?, last_failure_at = ? WHERE host = ?",
+                (error[:500], now, host)
+            )
+            state, consecutive_failures, open_count = conn.execute(
+                "SELECT state, consecutive_failures, open_count FROM host_health WHERE host = ?", (host,)
+            ).fetchone()
+            if state == OPEN or (state != HALF_OPEN and consecutive_failures < FAILURE_THRESHOLD):
+                return
+            open_count += 1
+            backoff = min(BASE_BACKOFF_SECONDS * 2 ** (open_count - 1), MAX_BACKOFF_SECONDS)
+            conn.execute(
+                "UPDATE host_health SET state = ?, open_count = ?, next_probe_at = ? WHERE host = ?",
+                (OPEN, open_count, now + backoff, host)
+            )
+        print(f"Circuit open for {host} after {consecutive_failures} failures; next probe in {backoff}s")
+
+    def reset(self, host: str) -> bool:
+        """Forget a host's history (closing its circuit); False if it was unknown"""
+        with self._lock:
+            return self._conn.execute("DELETE FROM host_health WHERE host = ?", (host.lower(),)).rowcount > 0
+
+    def snapshot(self, hosts: Optional[Iterable[str]] = None) -> List[Dict]:
+        """Health of the given hosts (all known hosts if None), least healthy first"""
+        states = self._states()
+        if hosts is not None:
+            wanted = set(hosts)
+            states = [state for state in states if state.host in wanted]
+        rows = [state.to_dict() for state in states]
+        order = {OPEN: 0, HALF_OPEN: 1, CLOSED: 2}
+        rows.sort(key=lambda r: (order[r['state']], -r['failure_rate'], r['host']))
+        return rows
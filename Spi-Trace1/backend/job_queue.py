@@ -0,0 +1,272 @@
+"""
+Durable scan job queue in the application database (the scan_jobs table).
+
+Workers claim jobs with a conditional UPDATE, so any number of worker
+processes, on any number of hosts sharing the database, can poll the same
+table without handing a job to two of them. A claimed job carries a lease
+the worker extends with heartbeats; if the worker dies the lease runs out
+and another worker picks the job up. Failed jobs are retried with
+exponential backoff and dead-lettered (status 'dead') after max_attempts.
+
+Jobs are handed out fairly across tenants (the users whose URLs are being
+scanned) by stride scheduling, a deterministic weighted round-robin: each
+tenant has a pass value that advances by STRIDE / weight per claimed job,
+and the next job goes to the tenant with the lowest pass that is below its
+concurrency cap. A tenant with weight 2 gets twice the turns of weight 1,
+and one tenant's backlog of scans cannot hold back everyone else's.
+"""
+import json
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import and_, case, insert, or_
+from sqlalchemy.orm import aliased
+
+from models import db, ScanHistory, ScanJob, TenantQuota
+
+DEFAULT_LEASE_SECONDS = 60
+DEFAULT_MAX_ATTEMPTS = 3
+RETRY_BASE_SECONDS = 30
+# Candidates looked at per claim attempt; another worker may win any of them
+CLAIM_BATCH = 5
+DEFAULT_TENANT_MAX_CONCURRENT = 2
+STRIDE = 1000.0
+
+
+def enqueue_scan(scan_history: ScanHistory, keywords: List[str], target_urls: List[str],
+                 deadline_seconds: Optional[float] = None, url_budget_seconds: Optional[float] = None,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS, profile: Optional[str] = None,
+                 normalize: Optional[str] = None) -> ScanJob:
+    """Queue a scan for the workers; the caller commits"""
+    job = ScanJob(
+        id=str(uuid.uuid4()),
+        scan_id=scan_history.id,
+        user_id=scan_history.user_id,
+        payload=json.dumps({
+            'keywords': keywords,
+            'target_urls': target_urls,
+            'deadline_seconds': deadline_seconds,
+            'url_budget_seconds': url_budget_seconds,
+            'profile': profile,
+            'normalize': normalize
+        }),
+        status='queued',
+        max_attempts=max_attempts,
+        available_at=datetime.utcnow()
+    )
+    scan_history.status = 'queued'
+    db.session.add(job)
+    return job
+
+
+def _claimable(now: datetime):
+    # Queued and due, or running under a lease its worker stopped renewing
+    return or_(
+        and_(ScanJob.status == 'queued', ScanJob.available_at <= now),
+        and_(ScanJob.status == 'running', ScanJob.lease_expires_at < now, ScanJob.attempts < ScanJob.max_attempts)
+    )
+
+
+def reap_expired_leases() -> int:
+    """Dead-letter jobs whose worker vanished on their last allowed attempt"""
+    now = datetime.utcnow()
+    jobs = ScanJob.query.filter(
+        ScanJob.status == 'running', ScanJob.lease_expires_at < now, ScanJob.attempts >= ScanJob.max_attempts
+    ).all()
+    for job in jobs:
+        job.status = 'dead'
+        job.last_error = f"Lease held by {job.lease_owner} expired without a heartbeat"
+        job.lease_owner = None
+        job.finished_at = now
+        scan = ScanHistory.query.get(job.scan_id)
+        if scan is not None:
+            scan.status = 'failed'
+            scan.completed_at = now
+    if jobs:
+        db.session.commit()
+    return len(jobs)
+
+
+def _running_counts(now: datetime) -> Dict[int, int]:
+    rows = db.session.query(ScanJob.user_id, db.func.count(ScanJob.id)).filter(
+        ScanJob.status == 'running', ScanJob.lease_expires_at >= now
+    ).group_by(ScanJob.user_id).all()
+    return {user_id: count for user_id, count in rows}
+
+
+def tenant_schedule(now: Optional[datetime] = None,
+                    default_max_concurrent: int = DEFAULT_TENANT_MAX_CONCURRENT) -> List[Dict]:
+    """
+    Tenants with claimable jobs in the order they will be served.
+
+    Returns:
+        [{user_id, pass_value, weight, cap, running}], lowest pass first;
+        tenants at their concurrency cap are left out
+    """
+    now = now or datetime.utcnow()
+    waiting = [row[0] for row in db.session.query(ScanJob.user_id).filter(_claimable(now)).distinct()]
+    if not waiting:
+        return []
+
+    running = _running_counts(now)
+    quotas = {q.user_id: q for q in TenantQuota.query.filter(TenantQuota.user_id.in_(set(waiting) | set(running)))}
+    # A tenant that sat idle must not bank credit: start it level with the
+    # busiest tenants rather than at its old, low pass value
+    active_passes = [quotas[u].pass_value for u in running if u in quotas]
+    floor = min(active_passes) if active_passes else 0.0
+
+    schedule = []
+    for user_id in waiting:
+        quota = quotas.get(user_id)
+        weight = max(quota.weight or 1, 1) if quota else 1
+        cap = quota.max_concurrent if quota and quota.max_concurrent is not None else default_max_concurrent
+        if running.get(user_id, 0) >= cap:
+            continue
+        pass_value = quota.pass_value if quota else 0.0
+        if user_id not in running:
+            pass_value = max(pass_value, floor)
+        schedule.append({'user_id': user_id, 'pass_value': pass_value, 'weight': weight,
+                         'cap': cap, 'running': running.get(user_id, 0)})
+    schedule.sort(key=lambda t: (t['pass_value'], t['user_id']))
+    return schedule
+
+
+def _advance_pass(tenant: Dict) -> None:
+    # Atomic, so claims for one tenant by concurrent workers each advance it: the
+    # schedule's pass value is only a floor (an idle tenant starts level with the rest)
+    if db.session.get(TenantQuota, tenant['user_id']) is None:
+        # OR IGNORE: another worker may insert the row first
+        db.session.execute(
+            insert(TenantQuota).prefix_with('OR IGNORE', dialect='sqlite')
+            .values(user_id=tenant['user_id'], weight=1, pass_value=0.0)
+        )
+    start = tenant['pass_value']
+    current = db.func.coalesce(TenantQuota.pass_value, 0.0)
+    TenantQuota.query.filter_by(user_id=tenant['user_id']).update({
+        'pass_value': case((current < start, start), else_=current)
+        + STRIDE / case((TenantQuota.weight > 1, TenantQuota.weight), else_=1)
+    }, synchronize_session=False)
+
+
+def claim_job(worker_id: str, lease_seconds: int = DEFAULT_LEASE_SECONDS,
+              default_max_concurrent: int = DEFAULT_TENANT_MAX_CONCURRENT) -> Optional[ScanJob]:
+    """
+    Take the next job for worker_id: the oldest claimable job of the tenant
+    whose turn it is (see tenant_schedule).
+
+    Returns:
+        The claimed job (status 'running', attempts incremented), or None if
+        nothing is due or every waiting tenant is at its concurrency cap
+    """
+    now = datetime.utcnow()
+    for tenant in tenant_schedule(now, default_max_concurrent):
+        candidates = [row.id for row in db.session.query(ScanJob.id).filter(
+            ScanJob.user_id == tenant['user_id'], _claimable(now)
+        ).order_by(ScanJob.available_at, ScanJob.created_at).limit(CLAIM_BATCH)]
+
+        other = aliased(ScanJob)
+        running = db.session.query(db.func.count(other.id)).filter(
+            other.user_id == tenant['user_id'], other.status == 'running', other.lease_expires_at >= now
+        ).scalar_subquery()
+        for job_id in candidates:
+            # Only one worker's UPDATE can still match the claimable condition,
+            # and the cap is re-checked in the same statement
+            claimed = ScanJob.query.filter(ScanJob.id == job_id, _claimable(now), running < tenant['cap']).update({
+                'status': 'running',
+                'lease_owner': worker_id,
+                'lease_expires_at': now + timedelta(seconds=lease_seconds),
+                'heartbeat_at': now,
+                'attempts': ScanJob.attempts + 1
+            }, synchronize_session=False)
+            if claimed:
+                _advance_pass(tenant)
+                db.session.commit()
+                return ScanJob.query.get(job_id)
+            db.session.commit()
+    return None
+
+
+def heartbeat(job_id: str, worker_id: str, lease_seconds: int = DEFAULT_LEASE_SECONDS) -> bool:
+    """Extend worker_id's lease on a job; False if the lease was lost to another worker"""
+    now = datetime.utcnow()
+    renewed = ScanJob.query.filter_by(id=job_id, lease_owner=worker_id, status='running').update({
+        'lease_expires_at': now + timedelta(seconds=lease_seconds),
+        'heartbeat_at': now
+    }, synchronize_session=False)
+    db.session.commit()
+    return bool(renewed)
+
+
+def complete_job(job_id: str, worker_id: str) -> bool:
+    """Mark a job done; False if worker_id no longer held it"""
+    finished = ScanJob.query.filter_by(id=job_id, lease_owner=worker_id, status='running').update({
+        'status': 'done',
+        'lease_owner': None,
+        'lease_expires_at': None,
+        'finished_at': datetime.utcnow()
+    }, synchronize_session=False)
+    db.session.commit()
+    return bool(finished)
+
+
+def fail_job(job_id: str, worker_id: str, error: str) -> Optional[str]:
+    """
+    Record a failed attempt: requeue with backoff, or dead-letter the job
+    (and fail its scan) once it has used max_attempts.
+
+    Returns:
+        The job's new status, or None if worker_id no longer held it
+    """
+    job = ScanJob.query.get(job_id)
+    if job is None or job.lease_owner != worker_id or job.status != 'running':
+        return None
+
+    job.last_error = error[:2000]
+    job.lease_owner = None
+    job.lease_expires_at = None
+    if job.attempts >= job.max_attempts:
+        job.status = 'dead'
+        job.finished_at = datetime.utcnow()
+        scan = ScanHistory.query.get(job.scan_id)
+        if scan is not None:
+            scan.status = 'failed'
+            scan.completed_at = job.finished_at
+    else:
+        job.status = 'queued'
+        job.available_at = datetime.utcnow() + timedelta(seconds=RETRY_BASE_SECONDS * 2 ** (job.attempts - 1))
+        scan = ScanHistory.query.get(job.scan_id)
+        if scan is not None and scan.status not in ('cancelling', 'cancelled'):
+            scan.status = 'queued'
+    db.session.commit()
+    return job.status
+
+
+def cancel_queued(scan_id: str) -> bool:
+    """Withdraw a scan's job that no worker has claimed yet"""
+    cancelled = ScanJob.query.filter_by(scan_id=scan_id, status='queued').update({
+        'status': 'cancelled',
+        'finished_at': datetime.utcnow()
+    }, synchronize_session=False)
+    return bool(cancelled)
+
+
+def retry_job(job_id: str) -> bool:
+    """Requeue a dead-lettered job with a fresh set of attempts; the caller commits"""
+    job = ScanJob.query.get(job_id)
+    if job is None or job.status != 'dead':
+        return False
+    job.status = 'queued'
+    job.attempts = 0
+    job.available_at = datetime.utcnow()
+    job.finished_at = None
+    scan = ScanHistory.query.get(job.scan_id)
+    if scan is not None:
+        scan.status = 'queued'
+        scan.completed_at = None
+    return True
+
+
+def queue_stats() -> Dict[str, int]:
+    rows = db.session.query(ScanJob.status, db.func.count(ScanJob.id)).group_by(ScanJob.status).all()
+    return {status: count for status, count in rows}
@@ -0,0 +1,302 @@
+"""
+Keyword entries: literal text, wildcards and regular expressions.
+
+    leak                   literal, matched as a case-insensitive substring
+    pass*word              wildcard: * is up to WILDCARD_SPAN non-space characters,
+                           ? exactly one (only in entries that contain a *)
+    re:p[a@]ss(wd|word)    regular expression, case-insensitive
+
+Entries are validated when a scan is requested (validate_keywords), so a
+bad pattern is a 400 rather than a failed scan. Regexes are held to a
+subset that keeps matching cheap with the standard library engine: no
+backreferences, lookarounds or named groups, no quantifier nested inside
+another unless both are bounded, at most MAX_UNBOUNDED_REPEATS unbounded
+quantifiers, and nothing that matches empty text.
+
+compile_keywords() turns an entry list into a KeywordSet once per keyword
+list (cached): literals are left to simple_scanner's combined substring
+pattern, wildcards and regexes are joined into one alternation of named
+groups, so a page is searched in one pass however many patterns there are.
+That pass has a per-page time budget: the text is searched in windows of
+WINDOW_CHARS with the clock checked between them, and where the search runs
+on a main thread (the scanner's parser processes) a SIGALRM interrupts a
+search stuck inside a window. A pattern hit is at most MAX_MATCH_CHARS long.
+
+In scans with normalization (see text_normalize), literals and wildcards are
+normalized once here and matched against the page's normalized text.
+"""
+import os
+import re
+import signal
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from text_normalize import normalize_text
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+REGEX_PREFIX = 're:'
+WILDCARD_SPAN = 32
+MAX_PATTERN_CHARS = 200
+MAX_UNBOUNDED_REPEATS = 3
+MAX_KEYWORDS = 200
+
+# Regex/wildcard matching time per page; a page that runs out keeps the hits found so far
+PATTERN_BUDGET_SECONDS = float(os.environ.get('SCAN_PATTERN_BUDGET_SECONDS', 2.0))
+WINDOW_CHARS = 16 * 1024
+MAX_MATCH_CHARS = 256
+
+_FORBIDDEN = {
+    sre_parse.GROUPREF: 'backreferences',
+    sre_parse.GROUPREF_EXISTS: 'conditional groups',
+    sre_parse.ASSERT: 'lookarounds',
+    sre_parse.ASSERT_NOT: 'lookarounds',
+}
+_REPEATS = {sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT, getattr(sre_parse, 'POSSESSIVE_REPEAT', None)} - {None}
+
+
+class KeywordError(ValueError):
+    """A keyword entry that can't be used; the message names the entry"""
+
+
+class PatternTimeout(Exception):
+    """Pattern matching on a page ran past its time budget"""
+
+
+def is_regex(entry: str) -> bool:
+    return entry.startswith(REGEX_PREFIX)
+
+
+def is_wildcard(entry: str) -> bool:
+    return not is_regex(entry) and '*' in entry
+
+
+def is_pattern(entry: str) -> bool:
+    return is_regex(entry) or is_wildcard(entry)
+
+
+def wildcard_source(entry: str) -> str:
+    parts = []
+    for ch in entry.lower():
+        if ch == '*':
+            if not parts or parts[-1] != rf'\S{{0,{WILDCARD_SPAN}}}':
+                parts.append(rf'\S{{0,{WILDCARD_SPAN}}}')
+        elif ch == '?':
+            parts.append(r'\S')
+        else:
+            parts.append(re.escape(ch))
+    return ''.join(parts)
+
+
+def _check_tree(items, entry: str, inside_repeat: Optional[bool], unbounded: List[int]) -> None:
+    # inside_repeat: None outside any quantifier, else whether the enclosing one is unbounded
+    for op, av in items:
+        if op in _FORBIDDEN:
+            raise KeywordError(f"{entry}: {_FORBIDDEN[op]} are not supported")
+        if op in _REPEATS:
+            low, high, body = av
+            is_unbounded = high == sre_parse.MAXREPEAT
+            if inside_repeat is not None and (inside_repeat or is_unbounded):
+                raise KeywordError(f"{entry}: nested quantifiers such as (a+)+ are not supported")
+            if is_unbounded:
+                unbounded[0] += 1
+            _check_tree(body, entry, is_unbounded, unbounded)
+        elif op == sre_parse.SUBPATTERN:
+            _check_tree(av[-1], entry, inside_repeat, unbounded)
+        elif op == sre_parse.BRANCH:
+            for branch in av[1]:
+                _check_tree(branch, entry, inside_repeat, unbounded)
+        elif op == getattr(sre_parse, 'ATOMIC_GROUP', None):
+            _check_tree(av, entry, inside_repeat, unbounded)
+
+
+def validate_keyword(entry, normalize: Optional[str] = None) -> None:
+    """Raises KeywordError if entry can't be used as a keyword (in a scan with the given normalize mode)"""
+    if not isinstance(entry, str) or not entry.strip():
+        raise KeywordError(f"{entry!r}: keywords must be non-empty strings")
+    if normalize and not is_regex(entry) and not normalize_text(entry, normalize).strip('*?'):
+        raise KeywordError(f"{entry!r}: nothing is left of this keyword once normalized")
+    if not is_pattern(entry):
+        return
+    if len(entry) > MAX_PATTERN_CHARS:
+        raise KeywordError(f"{entry[:40]}...: patterns are limited to {MAX_PATTERN_CHARS} characters")
+    if is_wildcard(entry):
+        if not entry.strip('*?'):
+            raise KeywordError(f"{entry}: a wildcard needs some literal text")
+        return
+
+    source = entry[len(REGEX_PREFIX):]
+    try:
+        # Wrapped as it will be in the combined pattern, so global flags and group names are caught too
+        compiled = re.compile(f'(?:{source})', re.IGNORECASE)
+        tree = sre_parse.parse(source, re.IGNORECASE)
+    except re.error as e:
+        raise KeywordError(f"{entry}: invalid regular expression ({e})")
+    if compiled.groupindex:
+        raise KeywordError(f"{entry}: named groups are not supported, use (?:...)")
+    unbounded = [0]
+    _check_tree(list(tree), entry, None, unbounded)
+    if unbounded[0] > MAX_UNBOUNDED_REPEATS:
+        raise KeywordError(f"{entry}: at most {MAX_UNBOUNDED_REPEATS} unbounded quantifiers (*, +, {{n,}}) allowed")
+    if compiled.fullmatch(''):
+        raise KeywordError(f"{entry}: pattern matches empty text")
+
+
+def validate_keywords(keywords, normalize: Optional[str] = None) -> None:
+    """Raises KeywordError for the first unusable entry of a scan's keyword list"""
+    if not isinstance(keywords, list):
+        raise KeywordError("keywords must be a list")
+    if len(keywords) > MAX_KEYWORDS:
+        raise KeywordError(f"At most {MAX_KEYWORDS} keywords per scan")
+    for entry in keywords:
+        validate_keyword(entry, normalize)
+
+
+@contextmanager
+def _alarm(seconds: float):
+    # sre checks for signals while it backtracks, so SIGALRM can stop a runaway
+    # search; signals can only be handled on the main thread
+    if seconds <= 0 or not hasattr(signal, 'setitimer') or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def on_alarm(signum, frame):
+        raise PatternTimeout()
+
+    previous = signal.signal(signal.SIGALRM, on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        if previous is not None:
+            signal.signal(signal.SIGALRM, previous)
+
+
+class PatternHits(NamedTuple):
+    spans: Dict[str, List[Tuple[int, int]]]  # entry -> (start, end) of recorded hits, matched entries only
+    timed_out: bool
+
+
+def _windowed(pattern, text: str, start: int, deadline: float):
+    """finditer over text from start, a window at a time, checking the deadline between windows"""
+    pos = start
+    while pos < len(text):
+        if time.monotonic() > deadline:
+            raise PatternTimeout()
+        window_end = (pos // WINDOW_CHARS + 1) * WINDOW_CHARS
+        last_end = pos
+        for m in pattern.finditer(text, pos, min(len(text), window_end + MAX_MATCH_CHARS)):
+            if m.start() >= window_end:
+                break
+            yield m
+            last_end = max(m.end(), m.start() + 1)
+        pos = max(window_end, last_end)
+
+
+class PatternGroup:
+    """Wildcard/regex entries searched together in one alternation over one text"""
+
+    def __init__(self, text: str, entries: List[str], sources: List[str]):
+        self.text = text
+        self.entries = entries
+        self._sources = sources
+        self.combined = re.compile(
+            '|'.join(f'(?P<k{i}>{source})' for i, source in enumerate(sources)), re.IGNORECASE
+        )
+        self._single: Dict[str, re.Pattern] = {}
+
+    def single(self, entry: str):
+        if entry not in self._single:
+            self._single[entry] = re.compile(self._sources[self.entries.index(entry)], re.IGNORECASE)
+        return self._single[entry]
+
+
+class KeywordSet:
+    """
+    A scan's keyword entries split into literals and combined pattern sets.
+
+    Without normalization every pattern is in one group over the page text.
+    With it, literals and wildcards are matched in their normalized form
+    against the normalized text and regexes against the text as extracted,
+    so there is one group per text.
+    """
+
+    def __init__(self, keywords: Tuple[str, ...], normalize: Optional[str] = None):
+        self.keywords = keywords
+        self.normalize = normalize
+        self.literals = [k for k in keywords if not is_pattern(k)]
+        self.literal_forms = tuple(self._form(k) for k in self.literals)
+        self.patterns = list(dict.fromkeys(k for k in keywords if is_pattern(k)))
+        self.groups: List[PatternGroup] = []
+        raw = [k for k in self.patterns if is_regex(k) or not normalize]
+        normalized = [k for k in self.patterns if k not in raw]
+        for text, entries in (('text', raw), ('normalized', normalized)):
+            if entries:
+                self.groups.append(PatternGroup(text, entries, [self._source(k) for k in entries]))
+
+    def _form(self, entry: str) -> str:
+        return normalize_text(entry, self.normalize) if self.normalize else entry.lower()
+
+    def _source(self, entry: str) -> str:
+        return entry[len(REGEX_PREFIX):] if is_regex(entry) else wildcard_source(self._form(entry))
+
+    def find_pattern_hits(self, texts: Dict[str, str], max_hits_per_keyword: int, max_hits_per_page: int,
+                          budget: float = PATTERN_BUDGET_SECONDS) -> PatternHits:
+        """
+        Matches of the wildcard and regex entries, one pass per group.
+
+        Args:
+            texts: {'text': page text, 'normalized': its normalized form (when normalizing)}
+        """
+        spans: Dict[str, List[Tuple[int, int]]] = {}
+        if not self.groups:
+            return PatternHits(spans, False)
+        deadline = time.monotonic() + budget
+        recorded = 0
+        try:
+            with _alarm(budget):
+                for group in self.groups:
+                    text = texts[group.text]
+                    first_start = None
+                    for m in _windowed(group.combined, text, 0, deadline):
+                        entry = group.entries[int(m.lastgroup[1:])]
+                        first_start = m.start() if first_start is None else first_start
+                        found = spans.setdefault(entry, [])
+                        if len(found) < max_hits_per_keyword and recorded < max_hits_per_page:
+                            found.append(m.span())
+                            recorded += 1
+                        if all(e in spans for e in group.entries) and (
+                            recorded >= max_hits_per_page
+                            or all(len(spans[e]) >= max_hits_per_keyword for e in group.entries)
+                        ):
+                            break
+
+                    # An entry can be hidden behind another one's match at the same
+                    # place; nothing can be hidden before the group's first match
+                    if first_start is None:
+                        continue
+                    for entry in group.entries:
+                        if entry in spans:
+                            continue
+                        for m in _windowed(group.single(entry), text, first_start, deadline):
+                            found = spans.setdefault(entry, [])
+                            if len(found) >= max_hits_per_keyword or recorded >= max_hits_per_page:
+                                break
+                            found.append(m.span())
+                            recorded += 1
+        except PatternTimeout:
+            return PatternHits(spans, True)
+        return PatternHits(spans, False)
+
+
+@lru_cache(maxsize=64)
+def compile_keywords(keywords: Tuple[str, ...], normalize: Optional[str] = None) -> KeywordSet:
+    """KeywordSet for a keyword tuple, built once and reused for every page of a scan"""
+    return KeywordSet(keywords, normalize)
@@ -0,0 +1,263 @@
+"""
+Offline load test for the API.
+
+Starts the app on a temporary database in a child process (seeded with
+--users users sharing --urls URLs that point at a local fake site), logs
+every user in through /auth/login, then has --concurrency clients drive a
+weighted mix of GET /api/urls, GET /api/scans and POST /api/scan for
+--duration seconds. Nothing leaves 127.0.0.1.
+
+Prints a JSON report (also written to --out): throughput, latency
+percentiles and error rate per endpoint and overall.
+
+Usage: python loadtest.py [--users 20] [--urls 200] [--concurrency 16] [--duration 30]
+                          [--mix urls=60,scans=35,scan=5] [--scan-urls 3] [--out report.json]
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+PASSWORD = 'loadtest-password'
+KEYWORDS = ['leak', 'password', 'dump']
+# --mix names and the endpoints they report under
+ENDPOINTS = {'urls': 'GET /api/urls', 'scans': 'GET /api/scans', 'scan': 'POST /api/scan'}
+
+SERVER = """
+import json, os
+from werkzeug.serving import make_server
+from app import create_app, init_db
+from auth import hash_password
+from models import db, User, URL
+
+settings = json.loads(os.environ['LOADTEST_SETTINGS'])
+app = create_app(settings['config'])
+with app.app_context():
+    init_db()
+    password_hash = hash_password(settings['password'])  # bcrypt is slow; one hash for everyone
+    users = [User(email=f'loadtest{i}@example.com', password_hash=password_hash, name=f'loadtest{i}', role='client')
+             for i in range(settings['users'])]
+    db.session.add_all(users)
+    db.session.flush()
+    for j, url in enumerate(settings['urls']):
+        db.session.add(URL(id=f'lt-{j}', user_id=users[j % len(users)].id, url=url, name=f'page {j}'))
+    db.session.commit()
+server = make_server('127.0.0.1', settings['port'], app, threaded=True)
+print('ready', flush=True)
+server.serve_forever()
+"""
+
+
+class FakeSite(BaseHTTPRequestHandler):
+    """Pages for the scans to fetch; every third one mentions a keyword"""
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    delay = 0.0
+
+    def do_GET(self):
+        time.sleep(self.delay)
+        n = sum(map(ord, self.path))
+        words = ' '.join(random.Random(n).choice(('forum', 'thread', 'market', 'user', 'reply')) for _ in range(300))
+        extra = f' {KEYWORDS[n % len(KEYWORDS)]} found here' if n % 3 == 0 else ''
+        body = f'<html><head><title>{self.path}</title></head><body><p>{words}{extra}</p></body></html>'.encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in ENDPOINTS:
+            raise SystemExit(f"Unknown endpoint in --mix: {name!r} (use urls, scans, scan)")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def percentile(ordered, pct):
+    if not ordered:
+        return None
+    return ordered[max(0, -(-len(ordered) * pct // 100) - 1)]
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {}
+
+    def add(self, endpoint, latency_ms, status):
+        with self.lock:
+            self.samples.setdefault(endpoint, []).append((latency_ms, status))
+
+    def summary(self, name, samples, elapsed):
+        latencies = sorted(ms for ms, _status in samples)
+        errors = sum(1 for _ms, status in samples if status is None or status >= 400)
+        statuses = {}
+        for _ms, status in samples:
+            key = str(status) if status is not None else 'exception'
+            statuses[key] = statuses.get(key, 0) + 1
+        return {
+            'endpoint': name,
+            'requests': len(samples),
+            'errors': errors,
+            'error_rate': round(errors / len(samples), 4) if samples else 0.0,
+            'throughput_rps': round(len(samples) / elapsed, 2) if elapsed else 0.0,
+            'latency_ms': {
+                'p50': percentile(latencies, 50), 'p90': percentile(latencies, 90),
+                'p95': percentile(latencies, 95), 'p99': percentile(latencies, 99),
+                'max': latencies[-1] if latencies else None,
+                'mean': round(sum(latencies) / len(latencies), 2) if latencies else None
+            },
+            'statuses': statuses
+        }
+
+    def report(self, elapsed):
+        endpoints = [self.summary(name, samples, elapsed) for name, samples in sorted(self.samples.items())]
+        everything = [s for samples in self.samples.values() for s in samples]
+        return {'endpoints': endpoints, 'total': self.summary('total', everything, elapsed)}
+
+
+def login_all(base, users):
+    sessions = []
+    for i in range(users):
+        session = requests.Session()
+        resp = session.post(f'{base}/auth/login', json={'email': f'loadtest{i}@example.com', 'password': PASSWORD})
+        resp.raise_for_status()
+        session.headers['Authorization'] = f"Bearer {resp.json()['access_token']}"
+        url_ids = [u['id'] for u in session.get(f'{base}/api/urls').json()]
+        sessions.append((session, url_ids))
+    return sessions
+
+
+def client(base, sessions, mix, scan_urls, run_async, stop_at, recorder, seed):
+    rng = random.Random(seed)
+    names, weights = list(mix), list(mix.values())
+    while time.monotonic() < stop_at:
+        session, url_ids = rng.choice(sessions)
+        endpoint = rng.choices(names, weights)[0]
+        started = time.perf_counter()
+        status = None
+        try:
+            if endpoint == 'urls':
+                status = session.get(f'{base}/api/urls', timeout=60).status_code
+            elif endpoint == 'scans':
+                status = session.get(f'{base}/api/scans', timeout=60).status_code
+            else:
+                status = session.post(f'{base}/api/scan', timeout=120, json={
+                    'keywords': rng.sample(KEYWORDS, 2),
+                    'url_ids': rng.sample(url_ids, min(scan_urls, len(url_ids))),
+                    'async': run_async
+                }).status_code
+        except requests.RequestException:
+            pass
+        recorder.add(ENDPOINTS[endpoint], round((time.perf_counter() - started) * 1000, 2), status)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the API against a temporary database")
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--urls', type=int, default=200, help="URLs in total, spread over the users")
+    parser.add_argument('--concurrency', type=int, default=16, help="Concurrent clients")
+    parser.add_argument('--duration', type=float, default=30.0, help="Seconds of load")
+    parser.add_argument('--mix', default='urls=60,scans=35,scan=5', help="Relative weight per endpoint")
+    parser.add_argument('--scan-urls', type=int, default=3, help="URLs per triggered scan")
+    parser.add_argument('--async-scans', action='store_true', help="Trigger scans with async=true")
+    parser.add_argument('--site-delay-ms', type=float, default=0.0, help="Fake site response delay")
+    parser.add_argument('--out', help="Also write the JSON report here")
+    args = parser.parse_args()
+    if args.users < 1 or args.urls < 1:
+        raise SystemExit("--users and --urls must be at least 1")
+    mix = parse_mix(args.mix)
+
+    FakeSite.delay = args.site_delay_ms / 1000
+    site = ThreadingHTTPServer(('127.0.0.1', 0), FakeSite)
+    site.daemon_threads = True
+    threading.Thread(target=site.serve_forever, daemon=True).start()
+
+    workdir = tempfile.mkdtemp(prefix='spitrace-loadtest-')
+    port = free_port()
+    settings = {
+        'port': port,
+        'users': args.users,
+        'password': PASSWORD,
+        'urls': [f'http://127.0.0.1:{site.server_port}/page/{j}' for j in range(args.urls)],
+        'config': {
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(workdir, 'loadtest.db')}",
+            'PAGE_ARCHIVE_DIR': os.path.join(workdir, 'page_archive'),
+            'SEARCH_INDEX_PATH': os.path.join(workdir, 'search_index.db'),
+            'HOST_HEALTH_PATH': os.path.join(workdir, 'host_health.db'),
+        }
+    }
+    server = subprocess.Popen(
+        [sys.executable, '-c', SERVER], cwd=os.path.dirname(os.path.abspath(__file__)),
+        env={**os.environ, 'LOADTEST_SETTINGS': json.dumps(settings)},
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+    )
+    try:
+        for line in server.stdout:
+            if line.strip() == 'ready':
+                break
+        else:
+            raise SystemExit("API server failed to start")
+        # The app logs to stdout; keep the pipe drained so it never blocks
+        threading.Thread(target=lambda: server.stdout.read(), daemon=True).start()
+        base = f'http://127.0.0.1:{port}'
+        print(f"Seeded {args.users} users / {args.urls} URLs in {workdir}; logging in...", file=sys.stderr)
+        sessions = login_all(base, args.users)
+
+        recorder = Recorder()
+        print(f"Running {args.concurrency} clients for {args.duration:.0f}s, mix {mix}", file=sys.stderr)
+        started = time.monotonic()
+        stop_at = started + args.duration
+        clients = [threading.Thread(target=client, args=(base, sessions, mix, args.scan_urls, args.async_scans,
+                                                         stop_at, recorder, n))
+                   for n in range(args.concurrency)]
+        for thread in clients:
+            thread.start()
+        for thread in clients:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        report = {
+            'config': {k: getattr(args, k) for k in ('users', 'urls', 'concurrency', 'duration', 'scan_urls',
+                                                     'async_scans', 'site_delay_ms')},
+            'mix': mix,
+            'elapsed_seconds': round(elapsed, 2),
+            **recorder.report(elapsed)
+        }
+        output = json.dumps(report, indent=2)
+        print(output)
+        if args.out:
+            with open(args.out, 'w', encoding='utf-8') as f:
+                f.write(output)
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+        site.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
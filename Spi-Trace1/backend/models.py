@@ -2,6 +2,8 @@ from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 import json
 
+from api_response import raw_json
+
 db = SQLAlchemy()
 
 class User(db.Model):
@@ -60,21 +62,204 @@ class ScanHistory(db.Model):
     urls_scanned = db.Column(db.Text, nullable=False)  # JSON string
     matches = db.Column(db.Text, nullable=False)  # JSON string
     errors = db.Column(db.Text, nullable=False)  # JSON string
-    status = db.Column(db.String(20), default='scanning')  # 'scanning', 'complete', 'failed'
+    status = db.Column(db.String(20), default='scanning')  # 'queued', 'scanning', 'cancelling', 'complete', 'partial', 'cancelled', 'failed'
     started_at = db.Column(db.DateTime, default=datetime.utcnow)
     completed_at = db.Column(db.DateTime, nullable=True)
     progress = db.Column(db.Text, nullable=True)  # JSON string
 
-    def to_dict(self):
+    delta = db.relationship('ScanDelta', uselist=False, backref='scan', cascade='all, delete-orphan',
+                            foreign_keys='ScanDelta.scan_id')
+
+    # Scan lists and retention sweeps go by user and age (added to existing databases by init-db)
+    __table_args__ = (db.Index('ix_scan_history_user_started', 'user_id', 'started_at'),)
+
+    def to_dict(self, raw=False):
+        """raw=True leaves the JSON columns as RawJSON text for api_response.json_response"""
+        if raw:
+            keywords, urls_scanned = raw_json(self.keywords, '[]'), raw_json(self.urls_scanned, '[]')
+            matches, errors = raw_json(self.matches, '[]'), raw_json(self.errors, '[]')
+            progress = raw_json(self.progress)
+        else:
+            keywords = json.loads(self.keywords) if self.keywords else []
+            urls_scanned = json.loads(self.urls_scanned) if self.urls_scanned else []
+            matches = json.loads(self.matches) if self.matches else []
+            errors = json.loads(self.errors) if self.errors else []
+            progress = json.loads(self.progress) if self.progress else None
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'keywords': keywords,
+            'urls_scanned': urls_scanned,
+            'matches': matches,
+            'errors': errors,
+            'status': self.status,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+            'progress': progress
+        }
+
+    def to_delta_dict(self, raw=False):
+        """Scan summary with only what changed since the previous scan of the same keywords"""
+        if raw:
+            keywords = raw_json(self.keywords, '[]')
+            delta = raw_json(self.delta.delta) if self.delta else None
+        else:
+            keywords = json.loads(self.keywords) if self.keywords else []
+            delta = json.loads(self.delta.delta) if self.delta else None
         return {
             'id': self.id,
             'user_id': self.user_id,
-            'keywords': json.loads(self.keywords) if self.keywords else [],
-            'urls_scanned': json.loads(self.urls_scanned) if self.urls_scanned else [],
-            'matches': json.loads(self.matches) if self.matches else [],
-            'errors': json.loads(self.errors) if self.errors else [],
+            'keywords': keywords,
             'status': self.status,
             'started_at': self.started_at.isoformat() if self.started_at else None,
             'completed_at': self.completed_at.isoformat() if self.completed_at else None,
-            'progress': json.loads(self.progress) if self.progress else None
+            'previous_scan_id': self.delta.previous_scan_id if self.delta else None,
+            'delta': delta
+        }
+
+class ScanDelta(db.Model):
+    __tablename__ = 'scan_deltas'
+
+    scan_id = db.Column(db.String(50), db.ForeignKey('scan_history.id'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    keyword_sig = db.Column(db.String(40), nullable=False)
+    previous_scan_id = db.Column(db.String(50), nullable=True)
+    new_count = db.Column(db.Integer, default=0)
+    gone_count = db.Column(db.Integer, default=0)
+    delta = db.Column(db.Text, nullable=False)  # JSON string
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (db.Index('ix_scan_deltas_user_sig', 'user_id', 'keyword_sig', 'created_at'),)
+
+    def to_dict(self):
+        return {
+            'scan_id': self.scan_id,
+            'previous_scan_id': self.previous_scan_id,
+            'new_count': self.new_count,
+            'gone_count': self.gone_count,
+            'delta': json.loads(self.delta) if self.delta else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+class ScanJob(db.Model):
+    """A scan waiting for, or being run by, a worker process (see job_queue.py)"""
+    __tablename__ = 'scan_jobs'
+
+    id = db.Column(db.String(50), primary_key=True)
+    scan_id = db.Column(db.String(50), db.ForeignKey('scan_history.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # JSON string: keywords, target_urls, limits
+    status = db.Column(db.String(20), default='queued')  # 'queued', 'running', 'done', 'dead', 'cancelled'
+    attempts = db.Column(db.Integer, default=0)
+    max_attempts = db.Column(db.Integer, default=3)
+    available_at = db.Column(db.DateTime, default=datetime.utcnow)
+    lease_owner = db.Column(db.String(100), nullable=True)
+    lease_expires_at = db.Column(db.DateTime, nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (db.Index('ix_scan_jobs_status_available', 'status', 'available_at'),)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'scan_id': self.scan_id,
+            'user_id': self.user_id,
+            'status': self.status,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'available_at': self.available_at.isoformat() if self.available_at else None,
+            'lease_owner': self.lease_owner,
+            'lease_expires_at': self.lease_expires_at.isoformat() if self.lease_expires_at else None,
+            'heartbeat_at': self.heartbeat_at.isoformat() if self.heartbeat_at else None,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class TenantQuota(db.Model):
+    """A user's share of the scan workers: stride-scheduling weight, concurrency cap and pass value"""
+    __tablename__ = 'tenant_quotas'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    weight = db.Column(db.Integer, default=1)
+    max_concurrent = db.Column(db.Integer, nullable=True)  # None uses SCAN_TENANT_MAX_CONCURRENT
+    pass_value = db.Column(db.Float, default=0.0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'user_id': self.user_id,
+            'weight': self.weight,
+            'max_concurrent': self.max_concurrent,
+            'pass_value': self.pass_value,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class ScanRollup(db.Model):
+    """Per-day match counts of one URL and keyword, kept after the scans behind them are compacted (see retention.py)"""
+    __tablename__ = 'scan_rollups'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    url = db.Column(db.String(500), primary_key=True)
+    keyword = db.Column(db.String(200), primary_key=True)
+    scan_count = db.Column(db.Integer, default=0)  # scans that day that visited url looking for keyword
+    match_count = db.Column(db.Integer, default=0)  # ... and found it
+
+    __table_args__ = (db.Index('ix_scan_rollups_day', 'day'),)
+
+    def to_dict(self):
+        return {
+            'user_id': self.user_id,
+            'day': self.day.isoformat(),
+            'url': self.url,
+            'keyword': self.keyword,
+            'scan_count': self.scan_count,
+            'match_count': self.match_count
+        }
+
+class RetentionPolicy(db.Model):
+    """A user's override of the SCAN_RETENTION_* defaults"""
+    __tablename__ = 'retention_policies'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    detail_days = db.Column(db.Integer, nullable=True)  # None uses SCAN_RETENTION_DETAIL_DAYS; 0 keeps detail forever
+    rollup_days = db.Column(db.Integer, nullable=True)  # None uses SCAN_RETENTION_ROLLUP_DAYS; 0 keeps rollups forever
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'user_id': self.user_id,
+            'detail_days': self.detail_days,
+            'rollup_days': self.rollup_days,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class ScanProfile(db.Model):
+    """Profiler artifact of a scan run with profiling on (see scan_profiler.py)"""
+    __tablename__ = 'scan_profiles'
+
+    scan_id = db.Column(db.String(50), db.ForeignKey('scan_history.id'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    mode = db.Column(db.String(20), nullable=False)  # 'sampling' or 'cprofile'
+    path = db.Column(db.String(500), nullable=False)  # zip with summary.json, the profile and allocations.txt
+    size_bytes = db.Column(db.Integer, default=0)
+    wall_ms = db.Column(db.Float, nullable=True)
+    peak_memory_bytes = db.Column(db.Integer, nullable=True)
+    summary = db.Column(db.Text, nullable=False)  # JSON string: top functions and allocation sites
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self, raw=False):
+        return {
+            'scan_id': self.scan_id,
+            'user_id': self.user_id,
+            'mode': self.mode,
+            'size_bytes': self.size_bytes,
+            'wall_ms': self.wall_ms,
+            'peak_memory_bytes': self.peak_memory_bytes,
+            'summary': raw_json(self.summary) if raw else json.loads(self.summary),
+            'created_at': self.created_at.isoformat() if self.created_at else None
         }
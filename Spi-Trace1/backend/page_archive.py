@@ -0,0 +1,170 @@
+"""
+Compressed, append-only archive of extracted page text.
+
+Every scanned page's text is compressed (zstd when the `zstandard` package is
+installed, zlib otherwise) and appended to a segment file. A small SQLite
+index maps each URL to the (segment, offset, length) of its snapshots, and
+segments are read back through mmap, so keyword sets can be re-run against
+the latest snapshot of every URL without touching the network.
+"""
+import hashlib
+import mmap
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, Iterable, Optional
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+DEFAULT_SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    segment TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    codec TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    archived_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_snapshots_url ON snapshots (url, id);
+"""
+
+
+def _compress(data: bytes):
+    if zstandard is not None:
+        return 'zstd', zstandard.ZstdCompressor(level=3).compress(data)
+    return 'zlib', zlib.compress(data, 6)
+
+
+def _decompress(codec: str, blob: bytes) -> bytes:
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd snapshots")
+        return zstandard.ZstdDecompressor().decompress(blob)
+    return zlib.decompress(blob)
+
+
+class PageArchive:
+    """
+    Append-only page text archive.
+
+    Each process writes to its own segment file (named by start time and pid),
+    so concurrent web/worker processes never interleave writes; the shared
+    SQLite index is the only coordination point.
+    """
+
+    def __init__(self, root: str, segment_max_bytes: int = DEFAULT_SEGMENT_MAX_BYTES):
+        self.root = root
+        self.segment_max_bytes = segment_max_bytes
+        os.makedirs(root, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._segment_name = None
+        self._segment_file = None
+        self._maps: Dict[str, mmap.mmap] = {}
+
+        conn = self._conn()
+        conn.executescript(INDEX_SCHEMA)
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.root, 'index.db'), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _writable_segment(self):
+        if self._segment_file is None or self._segment_file.tell() >= self.segment_max_bytes:
+            if self._segment_file is not None:
+                self._segment_file.close()
+            self._segment_name = f"segment-{int(time.time() * 1000)}-{os.getpid()}.seg"
+            self._segment_file = open(os.path.join(self.root, self._segment_name), 'ab')
+        return self._segment_name, self._segment_file
+
+    def append(self, url: str, text: str) -> bool:
+        """
+        Archive a snapshot of a page's text.
+
+        Returns:
+            False if the text is identical to the URL's latest snapshot and was not stored
+        """
+        data = text.encode('utf-8')
+        digest = hashlib.sha1(data).hexdigest()
+
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT digest FROM snapshots WHERE url = ? ORDER BY id DESC LIMIT 1", (url,)
+        ).fetchone()
+        if row and row[0] == digest:
+            return False
+
+        codec, blob = _compress(data)
+        with self._lock:
+            segment, f = self._writable_segment()
+            offset = f.tell()
+            f.write(blob)
+            f.flush()
+
+        with conn:
+            conn.execute(
+                "INSERT INTO snapshots (url, segment, offset, length, codec, digest, archived_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, segment, offset, len(blob), codec, digest, time.time())
+            )
+        return True
+
+    def _read(self, segment: str, offset: int, length: int) -> bytes:
+        with self._lock:
+            mm = self._maps.get(segment)
+            if mm is None or offset + length > len(mm):
+                # Segment grew since it was mapped (or never was); remap it
+                if mm is not None:
+                    mm.close()
+                with open(os.path.join(self.root, segment), 'rb') as f:
+                    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._maps[segment] = mm
+            return mm[offset:offset + length]
+
+    def latest(self, url: str) -> Optional[str]:
+        """Text of the most recent snapshot of a URL, or None"""
+        return self.latest_many([url]).get(url)
+
+    def latest_many(self, urls: Iterable[str]) -> Dict[str, str]:
+        """Latest snapshot text for each URL that has one"""
+        urls = list(dict.fromkeys(urls))
+        rows = []
+        conn = self._conn()
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(urls), 500):
+            chunk = urls[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            rows.extend(conn.execute(
+                f"SELECT url, segment, offset, length, codec FROM snapshots "
+                f"WHERE id IN (SELECT MAX(id) FROM snapshots WHERE url IN ({placeholders}) GROUP BY url)",
+                chunk
+            ).fetchall())
+
+        texts = {}
+        for url, segment, offset, length, codec in rows:
+            texts[url] = _decompress(codec, self._read(segment, offset, length)).decode('utf-8')
+        return texts
+
+    def close(self) -> None:
+        with self._lock:
+            if self._segment_file is not None:
+                self._segment_file.close()
+                self._segment_file = None
+            for mm in self._maps.values():
+                mm.close()
+            self._maps.clear()
@@ -0,0 +1,228 @@
+"""
+Scan history retention: compact old scans into per-day rollups.
+
+A finished scan keeps its full detail (URLs visited, matches with snippets,
+errors) for detail_days. After that it is folded into scan_rollups, one row
+per user, day, URL and keyword counting the scans that looked and the ones
+that matched, and its scan_history row, delta, finished jobs and profile
+artifact are deleted.
+Rollups themselves are dropped after rollup_days (0 keeps them forever).
+SCAN_RETENTION_DETAIL_DAYS / SCAN_RETENTION_ROLLUP_DAYS set the defaults and
+retention_policies rows override them per user.
+
+Work is done in batches of a few dozen scans, each its own short
+transaction, with a pause between batches, so scans and API requests are
+never held behind a long write lock. A pass can stop after any batch and
+the next one carries on from the oldest scan left.
+
+The newest scan of each keyword set is always kept, since the next scan of
+that set computes its delta against it (see scan_diff.py).
+"""
+import json
+import os
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, tuple_
+
+from models import db, RetentionPolicy, ScanDelta, ScanHistory, ScanJob, ScanProfile, ScanRollup
+
+DEFAULT_DETAIL_DAYS = 30
+DEFAULT_ROLLUP_DAYS = 0
+DEFAULT_BATCH_SIZE = 50
+BATCH_PAUSE_SECONDS = 0.05
+
+FINISHED_STATUSES = ('complete', 'partial', 'cancelled', 'failed')
+
+RollupCounts = Dict[Tuple[int, date, str, str], List[int]]
+
+
+def _kept_for_deltas():
+    # Scan ids that are the latest delta of their user and keyword set
+    latest = db.session.query(
+        ScanDelta.user_id, ScanDelta.keyword_sig, db.func.max(ScanDelta.created_at).label('created_at')
+    ).group_by(ScanDelta.user_id, ScanDelta.keyword_sig).subquery()
+    return db.session.query(ScanDelta.scan_id).join(latest, and_(
+        ScanDelta.user_id == latest.c.user_id,
+        ScanDelta.keyword_sig == latest.c.keyword_sig,
+        ScanDelta.created_at == latest.c.created_at
+    ))
+
+
+def _compactable(cutoff: datetime, user_ids: Optional[Iterable[int]] = None,
+                 exclude_user_ids: Optional[Iterable[int]] = None):
+    active_jobs = db.session.query(ScanJob.scan_id).filter(ScanJob.status.in_(('queued', 'running')))
+    query = db.session.query(ScanHistory.id).filter(
+        ScanHistory.status.in_(FINISHED_STATUSES),
+        ScanHistory.started_at < cutoff,
+        ~ScanHistory.id.in_(_kept_for_deltas()),
+        ~ScanHistory.id.in_(active_jobs)
+    )
+    if user_ids is not None:
+        query = query.filter(ScanHistory.user_id.in_(list(user_ids)))
+    if exclude_user_ids:
+        query = query.filter(~ScanHistory.user_id.in_(list(exclude_user_ids)))
+    return query
+
+
+def rollup_counts(scan: ScanHistory, counts: Optional[RollupCounts] = None) -> RollupCounts:
+    """Add a scan's (scan_count, match_count) per (user_id, day, url, keyword) to counts"""
+    counts = {} if counts is None else counts
+    day = (scan.completed_at or scan.started_at).date()
+    keywords = list(dict.fromkeys(json.loads(scan.keywords or '[]')))
+    matched = {m['url']: set(m.get('keywords', [])) for m in json.loads(scan.matches or '[]')}
+    for url in dict.fromkeys(json.loads(scan.urls_scanned or '[]')):
+        found = matched.get(url, ())
+        for keyword in keywords:
+            entry = counts.setdefault((scan.user_id, day, url, keyword), [0, 0])
+            entry[0] += 1
+            if keyword in found:
+                entry[1] += 1
+    return counts
+
+
+def _merge_rollups(counts: RollupCounts) -> None:
+    keys = list(counts)
+    existing = {}
+    # Chunked to stay under SQLite's bound-parameter limit
+    for i in range(0, len(keys), 200):
+        chunk = keys[i:i + 200]
+        rows = ScanRollup.query.filter(
+            tuple_(ScanRollup.user_id, ScanRollup.day, ScanRollup.url, ScanRollup.keyword).in_(chunk)
+        ).all()
+        existing.update({(r.user_id, r.day, r.url, r.keyword): r for r in rows})
+    for key, (scans, matches) in counts.items():
+        row = existing.get(key)
+        if row is None:
+            user_id, day, url, keyword = key
+            db.session.add(ScanRollup(user_id=user_id, day=day, url=url, keyword=keyword,
+                                      scan_count=scans, match_count=matches))
+        else:
+            row.scan_count += scans
+            row.match_count += matches
+
+
+def compact_batch(cutoff: datetime, batch_size: int = DEFAULT_BATCH_SIZE,
+                  user_ids: Optional[Iterable[int]] = None,
+                  exclude_user_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Fold up to batch_size of the oldest finished scans started before cutoff
+    into rollups and delete their detail, in one transaction.
+
+    Returns:
+        Scans compacted
+    """
+    ids = [row.id for row in _compactable(cutoff, user_ids, exclude_user_ids)
+           .order_by(ScanHistory.started_at).limit(batch_size)]
+    if not ids:
+        return 0
+
+    counts: RollupCounts = {}
+    compacted = 0
+    for scan in ScanHistory.query.filter(ScanHistory.id.in_(ids)).all():
+        ScanJob.query.filter(ScanJob.scan_id == scan.id, ScanJob.status.in_(('done', 'dead', 'cancelled'))) \
+            .delete(synchronize_session=False)
+        ScanDelta.query.filter_by(scan_id=scan.id).delete(synchronize_session=False)
+        for profile in ScanProfile.query.filter_by(scan_id=scan.id):
+            try:
+                os.remove(profile.path)
+            except OSError:
+                pass
+            db.session.delete(profile)
+        # Conditional, so a scan another sweeper got to first is not counted twice
+        deleted = ScanHistory.query.filter(
+            ScanHistory.id == scan.id, ScanHistory.status.in_(FINISHED_STATUSES)
+        ).delete(synchronize_session=False)
+        if deleted:
+            rollup_counts(scan, counts)
+            compacted += 1
+        db.session.expunge(scan)
+    _merge_rollups(counts)
+    db.session.commit()
+    return compacted
+
+
+def expire_rollups(before: date, user_ids: Optional[Iterable[int]] = None,
+                   exclude_user_ids: Optional[Iterable[int]] = None) -> int:
+    query = ScanRollup.query.filter(ScanRollup.day < before)
+    if user_ids is not None:
+        query = query.filter(ScanRollup.user_id.in_(list(user_ids)))
+    if exclude_user_ids:
+        query = query.filter(~ScanRollup.user_id.in_(list(exclude_user_ids)))
+    expired = query.delete(synchronize_session=False)
+    db.session.commit()
+    return expired
+
+
+def policy_groups(default_detail_days: int, default_rollup_days: int) -> List[Dict]:
+    """
+    Users grouped by effective policy.
+
+    Returns:
+        [{user_ids, exclude_user_ids, detail_days, rollup_days}]; the first
+        entry is the default policy (user_ids None: everyone without an override)
+    """
+    overrides = RetentionPolicy.query.all()
+    groups = [{'user_ids': None, 'exclude_user_ids': [p.user_id for p in overrides],
+               'detail_days': default_detail_days, 'rollup_days': default_rollup_days}]
+    for policy in overrides:
+        groups.append({
+            'user_ids': [policy.user_id],
+            'exclude_user_ids': None,
+            'detail_days': default_detail_days if policy.detail_days is None else policy.detail_days,
+            'rollup_days': default_rollup_days if policy.rollup_days is None else policy.rollup_days
+        })
+    return groups
+
+
+def run_retention(default_detail_days: int = DEFAULT_DETAIL_DAYS, default_rollup_days: int = DEFAULT_ROLLUP_DAYS,
+                  batch_size: int = DEFAULT_BATCH_SIZE, max_batches: Optional[int] = None,
+                  pause_seconds: float = BATCH_PAUSE_SECONDS, should_stop=None) -> Dict[str, int]:
+    """
+    One retention pass: compact scans past their detail period, then drop
+    rollups past their rollup period.
+
+    Args:
+        max_batches: Stop after this many compaction batches (None: until done)
+        should_stop: Checked between batches; returning True ends the pass early
+
+    Returns:
+        {compacted, batches, rollups_expired}
+    """
+    now = datetime.utcnow()
+    stats = {'compacted': 0, 'batches': 0, 'rollups_expired': 0}
+    for group in policy_groups(default_detail_days, default_rollup_days):
+        if group['detail_days'] > 0:
+            cutoff = now - timedelta(days=group['detail_days'])
+            while max_batches is None or stats['batches'] < max_batches:
+                if should_stop is not None and should_stop():
+                    return stats
+                compacted = compact_batch(cutoff, batch_size, group['user_ids'], group['exclude_user_ids'])
+                stats['batches'] += 1
+                stats['compacted'] += compacted
+                if compacted < batch_size:
+                    break
+                time.sleep(pause_seconds)
+        if group['rollup_days'] > 0:
+            stats['rollups_expired'] += expire_rollups(
+                now.date() - timedelta(days=group['rollup_days']), group['user_ids'], group['exclude_user_ids'])
+    return stats
+
+
+def retention_stats(default_detail_days: int, default_rollup_days: int) -> Dict:
+    now = datetime.utcnow()
+    due = 0
+    for group in policy_groups(default_detail_days, default_rollup_days):
+        if group['detail_days'] > 0:
+            due += _compactable(now - timedelta(days=group['detail_days']),
+                                group['user_ids'], group['exclude_user_ids']).count()
+    oldest_scan = db.session.query(db.func.min(ScanHistory.started_at)).scalar()
+    oldest_rollup = db.session.query(db.func.min(ScanRollup.day)).scalar()
+    return {
+        'scans': ScanHistory.query.count(),
+        'scans_due_for_compaction': due,
+        'oldest_scan': oldest_scan.isoformat() if oldest_scan else None,
+        'rollup_rows': ScanRollup.query.count(),
+        'oldest_rollup_day': oldest_rollup.isoformat() if oldest_rollup else None
+    }
@@ -0,0 +1,61 @@
+"""
+Per-URL match deltas between consecutive scans of the same keyword set.
+"""
+import hashlib
+from typing import Dict, Iterable, List, Optional
+
+from keyword_patterns import is_regex
+
+
+def _canonical(keyword: str) -> str:
+    # Case matters in a regex (\d vs \D), not in literals and wildcards
+    keyword = keyword.strip()
+    return keyword if is_regex(keyword) else keyword.lower()
+
+
+def keyword_signature(keywords: Iterable[str], normalize: Optional[str] = None) -> str:
+    """Order- and case-insensitive id for a keyword set (and its text normalization mode, if any)"""
+    normalized = sorted({_canonical(k) for k in keywords if k and k.strip()})
+    if normalize:
+        # Tolerant scans match differently, so they get deltas of their own
+        normalized.append(f'\x00normalize={normalize}')
+    return hashlib.sha1('\n'.join(normalized).encode('utf-8')).hexdigest()
+
+
+def _keywords_by_url(matches: List[Dict]) -> Dict[str, set]:
+    return {m['url']: {_canonical(k) for k in m.get('keywords', [])} for m in matches}
+
+
+def compute_delta(
+    current_matches: List[Dict],
+    current_urls: List[str],
+    previous_matches: Optional[List[Dict]],
+    previous_urls: Optional[List[str]],
+) -> Dict:
+    """
+    Compare the matches of a scan with those of the previous scan.
+
+    A keyword only "disappears" from a URL if that URL was actually scanned
+    both times; URLs that errored or were disabled this time are left out
+    rather than reported as cleared.
+
+    Returns:
+        {'new': {url: [keywords]}, 'gone': {url: [keywords]}, 'unchanged': n}
+        where n counts (url, keyword) pairs present in both scans
+    """
+    current = _keywords_by_url(current_matches)
+    previous = _keywords_by_url(previous_matches or [])
+    previously_scanned = set(previous_urls or [])
+
+    new, gone = {}, {}
+    unchanged = 0
+    for url in current_urls:
+        now = current.get(url, set())
+        before = previous.get(url, set()) if url in previously_scanned else set()
+        if now - before:
+            new[url] = sorted(now - before)
+        if before - now:
+            gone[url] = sorted(before - now)
+        unchanged += len(now & before)
+
+    return {'new': new, 'gone': gone, 'unchanged': unchanged}
@@ -0,0 +1,106 @@
+"""
+In-process pub/sub fan-out of scan progress events.
+
+A scan publishes one event per finished URL and a final 'complete' event.
+Every subscriber (one per open SSE connection) gets its own queue, and each
+channel keeps its events so a late or reconnecting subscriber is replayed
+everything after the last event id it saw.
+"""
+import json
+import queue
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+
+# How long a finished scan's events stay available for late subscribers
+CLOSED_CHANNEL_TTL_SECONDS = 300
+
+
+class _Channel:
+    def __init__(self):
+        self.events: List[Dict] = []
+        self.subscribers: List[queue.Queue] = []
+        self.closed_at: Optional[float] = None
+
+
+class ScanEventBroker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._channels: Dict[str, _Channel] = {}
+
+    def open(self, scan_id: str) -> None:
+        with self._lock:
+            self._expire()
+            self._channels.setdefault(scan_id, _Channel())
+
+    def has(self, scan_id: str) -> bool:
+        with self._lock:
+            return scan_id in self._channels
+
+    def publish(self, scan_id: str, event: str, data: Dict) -> None:
+        """Send an event to a scan's subscribers; a no-op unless the channel was opened here"""
+        with self._lock:
+            channel = self._channels.get(scan_id)
+            if channel is None:
+                return
+            message = {'id': len(channel.events) + 1, 'event': event, 'data': data}
+            channel.events.append(message)
+            for subscriber in channel.subscribers:
+                subscriber.put(message)
+
+    def close(self, scan_id: str) -> None:
+        """Mark a scan finished; subscribers drain and disconnect"""
+        with self._lock:
+            channel = self._channels.get(scan_id)
+            if channel is None:
+                return
+            channel.closed_at = time.time()
+            for subscriber in channel.subscribers:
+                subscriber.put(None)
+
+    def subscribe(self, scan_id: str, last_event_id: int = 0, keepalive_seconds: float = 15.0) -> Iterator[Optional[Dict]]:
+        """
+        Yield events after last_event_id as they are published.
+
+        Yields None every keepalive_seconds without events so the caller can
+        write a heartbeat; returns once the scan's channel is closed.
+        """
+        subscriber: queue.Queue = queue.Queue()
+        with self._lock:
+            channel = self._channels.get(scan_id)
+            if channel is None:
+                return
+            backlog = [e for e in channel.events if e['id'] > last_event_id]
+            closed = channel.closed_at is not None
+            if not closed:
+                channel.subscribers.append(subscriber)
+
+        try:
+            for message in backlog:
+                yield message
+            if closed:
+                return
+            while True:
+                try:
+                    message = subscriber.get(timeout=keepalive_seconds)
+                except queue.Empty:
+                    yield None
+                    continue
+                if message is None:
+                    return
+                if message['id'] > last_event_id:
+                    yield message
+        finally:
+            with self._lock:
+                if subscriber in channel.subscribers:
+                    channel.subscribers.remove(subscriber)
+
+    def _expire(self) -> None:
+        cutoff = time.time() - CLOSED_CHANNEL_TTL_SECONDS
+        for scan_id in [k for k, c in self._channels.items() if c.closed_at and c.closed_at < cutoff]:
+            del self._channels[scan_id]
+
+
+def format_sse(message: Dict) -> str:
+    """Encode an event for a text/event-stream response"""
+    return f"id: {message['id']}\nevent: {message['event']}\ndata: {json.dumps(message['data'])}\n\n"
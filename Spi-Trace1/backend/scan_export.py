@@ -0,0 +1,116 @@
+"""
+Streaming export of scan matches for GET /api/scans/export.
+
+Rows are read from scan_history through a server-side cursor (yield_per),
+selecting only the columns an export needs, and each one is encoded and
+handed to the response as soon as it is read. Memory stays flat however
+many scans a user has: one batch of rows plus one compression buffer.
+
+Formats:
+    ndjson  One JSON object per matched URL of a scan, one per line
+    csv     The same rows as CSV; keywords comma-joined, hits as JSON
+
+Either can be gzip-compressed on the fly.
+"""
+import csv
+import io
+import json
+import zlib
+from typing import Iterable, Iterator
+
+from sqlalchemy import select
+
+from models import db, ScanHistory
+
+FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+CSV_COLUMNS = ['scan_id', 'user_id', 'started_at', 'completed_at', 'status', 'url', 'keywords', 'hits']
+
+# Rows fetched from the cursor at a time
+FETCH_BATCH = 200
+# Encoded bytes collected before a chunk is sent (or compressed)
+CHUNK_BYTES = 64 * 1024
+GZIP_LEVEL = 5
+
+
+def export_query(user_ids=None, statuses=None, started_from=None, started_to=None):
+    """Select of the columns an export reads, oldest scan first"""
+    query = select(
+        ScanHistory.id, ScanHistory.user_id, ScanHistory.started_at, ScanHistory.completed_at,
+        ScanHistory.status, ScanHistory.matches
+    ).where(ScanHistory.matches != '[]')
+    if user_ids is not None:
+        query = query.where(ScanHistory.user_id.in_(list(user_ids)))
+    if statuses:
+        query = query.where(ScanHistory.status.in_(list(statuses)))
+    if started_from is not None:
+        query = query.where(ScanHistory.started_at >= started_from)
+    if started_to is not None:
+        query = query.where(ScanHistory.started_at < started_to)
+    return query.order_by(ScanHistory.started_at, ScanHistory.id)
+
+
+def match_rows(query) -> Iterator[dict]:
+    """One dict per matched URL of each scan the query selects"""
+    result = db.session.execute(query.execution_options(yield_per=FETCH_BATCH))
+    try:
+        for scan_id, user_id, started_at, completed_at, status, matches in result:
+            for match in json.loads(matches or '[]'):
+                yield {
+                    'scan_id': scan_id,
+                    'user_id': user_id,
+                    'started_at': started_at.isoformat() if started_at else None,
+                    'completed_at': completed_at.isoformat() if completed_at else None,
+                    'status': status,
+                    'url': match.get('url'),
+                    'keywords': match.get('keywords', []),
+                    'hits': match.get('hits', {})
+                }
+    finally:
+        result.close()
+
+
+def ndjson_lines(rows: Iterable[dict]) -> Iterator[str]:
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+def csv_lines(rows: Iterable[dict]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    for row in rows:
+        writer.writerow([
+            row['scan_id'], row['user_id'], row['started_at'], row['completed_at'], row['status'], row['url'],
+            ','.join(row['keywords']), json.dumps(row['hits'], ensure_ascii=False, separators=(',', ':'))
+        ])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def chunked(lines: Iterable[str], compress: bool = False) -> Iterator[bytes]:
+    """Group encoded lines into chunks of about CHUNK_BYTES, gzip-compressing them if asked"""
+    gzip = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31) if compress else None
+    pending, size = [], 0
+    for line in lines:
+        data = line.encode('utf-8')
+        pending.append(data)
+        size += len(data)
+        if size >= CHUNK_BYTES:
+            chunk = b''.join(pending)
+            pending, size = [], 0
+            chunk = gzip.compress(chunk) if gzip else chunk
+            if chunk:
+                yield chunk
+    chunk = b''.join(pending)
+    if gzip:
+        chunk = gzip.compress(chunk) + gzip.flush()
+    if chunk:
+        yield chunk
+
+
+def export_stream(query, fmt: str = 'ndjson', compress: bool = False) -> Iterator[bytes]:
+    rows = match_rows(query)
+    lines = csv_lines(rows) if fmt == 'csv' else ndjson_lines(rows)
+    return chunked(lines, compress)
@@ -0,0 +1,224 @@
+"""
+Opt-in profiling of a single scan.
+
+run_scan wraps a scan in profile_scan() when the scan was requested with a
+`profile` mode; otherwise this module is never imported and costs nothing.
+
+Modes:
+    sampling  Samples the stacks of every thread in the process every
+              SAMPLE_INTERVAL_SECONDS, so the fetch threads are covered as
+              well as the scan's own thread. Written as collapsed stacks
+              (flamegraph.pl / speedscope input).
+    cprofile  Deterministic cProfile of the thread running the scan
+              (pstats file; load with pstats.Stats or snakeviz).
+
+Both also record tracemalloc allocation sites. Parsing in the scanner's
+process pool is outside the profile; its time shows as parse_ms per URL.
+
+The artifact is a zip (summary.json, the profile, allocations.txt) under
+the profile directory, recorded in scan_profiles. One scan per process is
+profiled at a time, since tracemalloc is process-wide.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+import zipfile
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+MODES = ('sampling', 'cprofile')
+SAMPLE_INTERVAL_SECONDS = 0.005
+TRACEMALLOC_FRAMES = 10
+TOP_FUNCTIONS = 30
+TOP_ALLOCATIONS = 25
+
+_active = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    """Another scan in this process is being profiled"""
+
+
+def is_busy() -> bool:
+    return _active.locked()
+
+
+def normalize_mode(value) -> Optional[str]:
+    """Mode for a request's `profile` field: true means sampling, false/None means off"""
+    if value in (None, False, '', 0):
+        return None
+    if value is True or value == 1:
+        return 'sampling'
+    if value in MODES:
+        return value
+    raise ValueError(f"profile must be true or one of {', '.join(MODES)}")
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler(threading.Thread):
+    """Counts the stacks of all other threads at a fixed interval"""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL_SECONDS):
+        super().__init__(name='scan-profiler', daemon=True)
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.elapsed = 0.0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        me = threading.get_ident()
+        started = time.perf_counter()
+        while not self._stop_event.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f'thread-{ident}'))
+                self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+        self.elapsed = time.perf_counter() - started
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def collapsed(self) -> str:
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top_functions(self, limit: int = TOP_FUNCTIONS) -> List[Dict]:
+        own, total = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')[1:]
+            if not frames:
+                continue
+            own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+        # Taking a sample is not free, so the real period is longer than interval
+        seconds = self.elapsed / self.samples if self.samples else self.interval
+        return [{'function': f, 'own_samples': own[f], 'total_samples': total[f],
+                 'approx_own_ms': round(own[f] * seconds * 1000, 1)}
+                for f, _count in own.most_common(limit)]
+
+
+def _cprofile_top(profile: cProfile.Profile, limit: int = TOP_FUNCTIONS) -> List[Dict]:
+    stats = pstats.Stats(profile)
+    rows = []
+    for (filename, line, name), (_cc, calls, own, cumulative, _callers) in stats.stats.items():
+        rows.append({'function': f"{name} ({os.path.basename(filename)}:{line})", 'calls': calls,
+                     'own_ms': round(own * 1000, 2), 'cumulative_ms': round(cumulative * 1000, 2)})
+    rows.sort(key=lambda r: r['cumulative_ms'], reverse=True)
+    return rows[:limit]
+
+
+def _allocations(snapshot: tracemalloc.Snapshot, limit: int = TOP_ALLOCATIONS):
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ))
+    by_line = snapshot.statistics('lineno')[:limit]
+    top = [{'site': f"{os.path.basename(s.traceback[0].filename)}:{s.traceback[0].lineno}",
+            'size_bytes': s.size, 'count': s.count} for s in by_line]
+    report = io.StringIO()
+    report.write("Top allocation sites still live at the end of the scan\n\n")
+    for stat in snapshot.statistics('traceback')[:limit]:
+        report.write(f"{stat.size / 1024:.1f} KiB in {stat.count} blocks\n")
+        for line in stat.traceback.format():
+            report.write(f"  {line}\n")
+        report.write("\n")
+    return top, report.getvalue()
+
+
+class ProfileCapture:
+    """What profile_scan() collected; summary and path are set when the block exits"""
+
+    def __init__(self, scan_id: str, mode: str, path: str):
+        self.scan_id = scan_id
+        self.mode = mode
+        self.path = path
+        self.summary: Dict = {}
+        self.size_bytes = 0
+
+
+@contextmanager
+def profile_scan(scan_id: str, mode: str, directory: str, interval: float = SAMPLE_INTERVAL_SECONDS):
+    """
+    Profile the enclosed block and write the artifact zip.
+
+    Raises:
+        ProfilerBusy: another scan in this process is being profiled
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown profile mode: {mode}")
+    if not _active.acquire(blocking=False):
+        raise ProfilerBusy("Another scan is being profiled in this process")
+    try:
+        os.makedirs(directory, exist_ok=True)
+        capture = ProfileCapture(scan_id, mode, os.path.join(directory, f"{scan_id}.zip"))
+
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        tracemalloc.reset_peak()
+        sampler = profiler = None
+        if mode == 'sampling':
+            sampler = StackSampler(interval)
+            sampler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        started = time.perf_counter()
+        try:
+            yield capture
+        finally:
+            wall_ms = (time.perf_counter() - started) * 1000
+            if profiler is not None:
+                profiler.disable()
+            if sampler is not None:
+                sampler.stop()
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            if started_tracing:
+                tracemalloc.stop()
+
+            allocations, allocation_report = _allocations(snapshot)
+            summary = {
+                'scan_id': scan_id,
+                'mode': mode,
+                'wall_ms': round(wall_ms, 1),
+                'traced_memory_bytes': {'end': current, 'peak': peak},
+                'top_allocations': allocations,
+            }
+            with zipfile.ZipFile(capture.path, 'w', zipfile.ZIP_DEFLATED) as archive:
+                if sampler is not None:
+                    summary['samples'] = sampler.samples
+                    summary['sample_interval_ms'] = interval * 1000
+                    summary['top_functions'] = sampler.top_functions()
+                    archive.writestr('stacks.collapsed', sampler.collapsed())
+                else:
+                    summary['top_functions'] = _cprofile_top(profiler)
+                    stats_path = capture.path + '.pstats'
+                    profiler.dump_stats(stats_path)
+                    archive.write(stats_path, 'profile.pstats')
+                    os.remove(stats_path)
+                archive.writestr('allocations.txt', allocation_report)
+                archive.writestr('summary.json', json.dumps(summary, indent=2))
+            capture.summary = summary
+            capture.size_bytes = os.path.getsize(capture.path)
+    finally:
+        _active.release()
@@ -0,0 +1,130 @@
+"""
+Full-text index over scanned page text (SQLite FTS5).
+
+Lives in its own database file next to database.db so indexing never holds
+the application database's write lock. Each URL has one document holding the
+text from its most recent scan; documents are replaced as scans complete.
+"""
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS page_docs (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    digest TEXT NOT NULL,
+    scanned_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_page_docs_scanned_at ON page_docs (scanned_at);
+CREATE VIRTUAL TABLE IF NOT EXISTS page_fts USING fts5(text, tokenize = 'unicode61 remove_diacritics 2');
+"""
+
+
+class SearchQueryError(ValueError):
+    """Raised for malformed FTS5 query syntax"""
+
+
+class SearchIndex:
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript(INDEX_SCHEMA)
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def index_page(self, url: str, text: str, scanned_at: Optional[float] = None) -> bool:
+        """
+        Add or replace the document for a URL.
+
+        Returns:
+            False if the text is unchanged (only the scan time is refreshed)
+        """
+        scanned_at = scanned_at or time.time()
+        digest = hashlib.sha1(text.encode('utf-8')).hexdigest()
+        conn = self._conn()
+
+        with conn:
+            row = conn.execute("SELECT id, digest FROM page_docs WHERE url = ?", (url,)).fetchone()
+            if row and row[1] == digest:
+                conn.execute("UPDATE page_docs SET scanned_at = ? WHERE id = ?", (scanned_at, row[0]))
+                return False
+
+            if row:
+                doc_id = row[0]
+                conn.execute("UPDATE page_docs SET digest = ?, scanned_at = ? WHERE id = ?", (digest, scanned_at, doc_id))
+                conn.execute("DELETE FROM page_fts WHERE rowid = ?", (doc_id,))
+            else:
+                doc_id = conn.execute(
+                    "INSERT INTO page_docs (url, digest, scanned_at) VALUES (?, ?, ?)", (url, digest, scanned_at)
+                ).lastrowid
+            conn.execute("INSERT INTO page_fts (rowid, text) VALUES (?, ?)", (doc_id, text))
+        return True
+
+    def search(
+        self,
+        query: str,
+        since: Optional[float] = None,
+        urls: Optional[Iterable[str]] = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> List[Dict]:
+        """
+        Run an FTS5 query ("exact phrase", prefix*, NEAR(a b, 10), AND/OR/NOT).
+
+        Args:
+            query: FTS5 MATCH expression
+            since: Only pages scanned at or after this unix timestamp
+            urls: Restrict results to these URLs (None means all)
+            limit, offset: Paging over results ordered by relevance
+
+        Returns:
+            List of {url, scanned_at, score, snippet}, best match first
+        """
+        sql = (
+            "SELECT d.url, d.scanned_at, bm25(page_fts) AS score, "
+            "snippet(page_fts, 0, '[', ']', '...', 16) "
+            "FROM page_fts JOIN page_docs d ON d.id = page_fts.rowid "
+            "WHERE page_fts MATCH ?"
+        )
+        params: list = [query]
+        if since is not None:
+            sql += " AND d.scanned_at >= ?"
+            params.append(since)
+        conn = self._conn()
+        if urls is not None:
+            # A temp table rather than IN (?, ...), which would hit SQLite's bound-variable limit
+            # for large URL lists; it is private to this thread's connection
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS search_urls (url TEXT PRIMARY KEY)")
+            conn.execute("DELETE FROM search_urls")
+            conn.executemany("INSERT OR IGNORE INTO search_urls (url) VALUES (?)", ((url,) for url in urls))
+            sql += " AND d.url IN (SELECT url FROM search_urls)"
+        sql += " ORDER BY score LIMIT ? OFFSET ?"
+        params.extend([limit, offset])
+
+        try:
+            rows = conn.execute(sql, params).fetchall()
+        except sqlite3.OperationalError as e:
+            raise SearchQueryError(str(e)) from e
+        finally:
+            if conn.in_transaction:
+                # Only the temp table was written; end the transaction its writes opened
+                conn.rollback()
+
+        # bm25() is lower-is-better; flip it so clients can sort descending
+        return [
+            {'url': url, 'scanned_at': scanned_at, 'score': -score, 'snippet': snippet}
+            for url, scanned_at, score, snippet in rows
+        ]
+
@@ -1,52 +1,312 @@
 """
 Simple keyword scanner - just checks if keywords appear on a webpage
+
+Scanning is split into an I/O stage (fetch_page, run on a thread pool) and a
+CPU stage (analyze_page: decode, parse, extract text, match keywords) that
+runs in a process pool so HTML parsing is not serialized behind the GIL.
+Non-page responses are dropped by the fetch stage, see content_sniff.
 """
+import os
+import re
+import threading
+import time
 import requests
 from bs4 import BeautifulSoup
-from typing import List, Tuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from content_sniff import HTML, UnsupportedContent, classify, decode_body
+from dns_cache import DnsCache, install as install_dns_cache
+from host_health import HostCircuitOpen, HostHealthTracker
+from keyword_patterns import compile_keywords
+from text_normalize import normalize_text
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+
+# Number of parser processes; 0 parses in the calling process
+PARSE_WORKERS = int(os.environ.get('SCAN_PARSE_WORKERS', os.cpu_count() or 1))
+FETCH_WORKERS = int(os.environ.get('SCAN_FETCH_WORKERS', 8))
+
+# Caps on the match locations stored with each scan result
+MAX_HITS_PER_KEYWORD = 3
+MAX_HITS_PER_PAGE = 20
+SNIPPET_CONTEXT_CHARS = 40
+
+# How often a running scan checks for cancellation, deadlines and overdue fetches
+STOP_POLL_SECONDS = 0.25
+
+# In-process cache for fetch hostname lookups, used once enable_dns_cache() has run
+dns_cache = DnsCache()
+
+_parse_pool = None
+_parse_pool_lock = threading.Lock()
+
+
+def normalize_url(url: str) -> str:
+    """Add http:// if no scheme is present"""
+    if not url.startswith(('http://', 'https://')):
+        url = 'http://' + url
+    return url
+
+
+def enable_dns_cache() -> None:
+    """Resolve fetch hostnames through dns_cache from now on, unless SCAN_DNS_CACHE=0"""
+    if os.environ.get('SCAN_DNS_CACHE', '1') != '0':
+        install_dns_cache(dns_cache)
+
+
+class FetchBudgetExceeded(requests.exceptions.Timeout):
+    """The whole fetch (connect plus body read) ran past its wall-clock budget"""
+
+
+def fetch_page(url: str, timeout: int = 10, budget: Optional[float] = None) -> Tuple[bytes, Optional[str]]:
+    """
+    Fetch a URL (I/O stage).
+
+    Args:
+        url: The URL to fetch
+        timeout: Connect timeout and per-read timeout in seconds
+        budget: Total seconds allowed for the whole fetch; a server trickling
+            the body slowly enough to dodge the read timeout is cut off here
+
+    Returns:
+        (body, content_type): Raw response bytes and the Content-Type header, if any
+
+    Raises:
+        UnsupportedContent: the Content-Type or first bytes show a binary or
+            other non-page response; the rest of the body is not read
+    """
+    deadline = time.monotonic() + budget if budget else None
+    if budget:
+        timeout = min(timeout, budget)
+
+    response = requests.get(normalize_url(url), headers=HEADERS, timeout=timeout, allow_redirects=True, stream=True)
+    try:
+        response.raise_for_status()
+        content_type = response.headers.get('Content-Type')
+        classify(content_type, b'')
+        chunks = []
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            if not chunks:
+                classify(content_type, chunk)
+            chunks.append(chunk)
+            if deadline and time.monotonic() > deadline:
+                raise FetchBudgetExceeded(f"Fetch exceeded its {budget}s budget")
+        return b''.join(chunks), content_type
+    finally:
+        response.close()
+
+
+def extract_text(html) -> str:
+    """Parse HTML (str or bytes) and return its visible text, lowercased"""
+    soup = BeautifulSoup(html, 'html.parser')
+
+    # Remove script and style elements
+    for script in soup(["script", "style"]):
+        script.decompose()
+
+    # Get text content
+    return soup.get_text(separator=' ', strip=True).lower()
+
+
+def match_keywords(page_text: str, keywords: List[str]) -> List[str]:
+    """Return the keywords that occur in the (lowercased) page text"""
+    matched, _ = find_keyword_hits(page_text, keywords, max_hits_per_keyword=0)
+    return matched
+
+
+@lru_cache(maxsize=64)
+def _keyword_pattern(lowered_keywords: Tuple[str, ...]):
+    # Longest first so a keyword is preferred over its own prefix at one position
+    alternatives = sorted({k for k in lowered_keywords if k}, key=len, reverse=True)
+    if not alternatives:
+        return None
+    return re.compile('|'.join(re.escape(k) for k in alternatives))
+
+
+def find_keyword_hits(
+    page_text: str,
+    keywords: List[str],
+    max_hits_per_keyword: int = MAX_HITS_PER_KEYWORD,
+    max_hits_per_page: int = MAX_HITS_PER_PAGE,
+    context_chars: int = SNIPPET_CONTEXT_CHARS,
+) -> Tuple[List[str], Dict[str, List[Tuple[int, str]]]]:
+    """
+    Match all keywords in one pass over the (lowercased) page text.
+
+    Args:
+        page_text: Text from extract_text
+        keywords: Keyword entries (literals, wildcards, re: patterns; see
+            keyword_patterns), case-insensitive
+        max_hits_per_keyword: Occurrences recorded per keyword
+        max_hits_per_page: Occurrences recorded across all keywords
+        context_chars: Characters of context on each side of a snippet
+
+    Returns:
+        (matched_keywords, hits): matched keywords in input order, and for each
+        of them up to max_hits_per_keyword [offset, snippet] pairs, where offset
+        is a character position in page_text
+    """
+    matched, hits, _timed_out = keyword_hits(page_text, keywords, max_hits_per_keyword, max_hits_per_page,
+                                             context_chars)
+    return matched, hits
+
+
+def keyword_hits(
+    page_text: str,
+    keywords: List[str],
+    max_hits_per_keyword: int = MAX_HITS_PER_KEYWORD,
+    max_hits_per_page: int = MAX_HITS_PER_PAGE,
+    context_chars: int = SNIPPET_CONTEXT_CHARS,
+    normalize: Optional[str] = None,
+    normalized_text: Optional[str] = None,
+) -> Tuple[List[str], Dict[str, List[Tuple[int, str]]], bool]:
+    """
+    find_keyword_hits, plus whether wildcard/regex matching ran out of its time budget.
 
-def scan_url_for_keywords(url: str, keywords: List[str], timeout: int = 10) -> Tuple[bool, List[str]]:
+    With a normalize mode (see text_normalize), literals and wildcards are
+    matched against normalized_text (normalized here if not given) and
+    their hits point into it.
+    """
+    keyword_set = compile_keywords(tuple(keywords), normalize)
+    if keyword_set.patterns and threading.current_thread() is not threading.main_thread():
+        # A runaway regex can only be interrupted on a main thread; match in a parser process
+        pool = get_parse_pool()
+        if pool is not None:
+            return pool.submit(keyword_hits, page_text, keywords, max_hits_per_keyword, max_hits_per_page,
+                               context_chars, normalize, normalized_text).result()
+    texts = {'text': page_text}
+    if normalize:
+        texts['normalized'] = normalized_text if normalized_text is not None else normalize_text(page_text, normalize)
+    literal_text = texts['normalized'] if normalize else page_text
+    literals = keyword_set.literals
+    lowered = keyword_set.literal_forms
+    offsets: Dict[str, List[int]] = {}
+    distinct = {k for k in lowered if k}
+    recorded = 0
+    pattern = _keyword_pattern(lowered)
+
+    if pattern is not None:
+        for m in pattern.finditer(literal_text):
+            found = offsets.setdefault(m.group(), [])
+            if len(found) < max_hits_per_keyword and recorded < max_hits_per_page:
+                found.append(m.start())
+                recorded += 1
+            # Stop once every keyword is seen and no more offsets can be recorded
+            if len(offsets) == len(distinct) and (
+                recorded >= max_hits_per_page
+                or all(len(v) >= max_hits_per_keyword for v in offsets.values())
+            ):
+                break
+
+    spans: Dict[str, List[Tuple[int, int]]] = {}
+    for keyword, low in zip(literals, lowered):
+        if low not in offsets:
+            # A keyword that only occurs inside a longer keyword is shadowed
+            # in the combined pattern; fall back to a direct search for it.
+            if low not in literal_text:
+                continue
+            found = offsets[low] = []
+            pos = literal_text.find(low)
+            while low and pos != -1 and len(found) < max_hits_per_keyword and recorded < max_hits_per_page:
+                found.append(pos)
+                recorded += 1
+                pos = literal_text.find(low, pos + 1)
+        spans[keyword] = [(pos, pos + len(low)) for pos in offsets[low]]
+    # The text each matched entry's spans point into
+    span_text = dict.fromkeys(spans, literal_text)
+
+    pattern_hits = keyword_set.find_pattern_hits(texts, max_hits_per_keyword, max_hits_per_page - recorded)
+    spans.update(pattern_hits.spans)
+    for group in keyword_set.groups:
+        span_text.update(dict.fromkeys(group.entries, texts[group.text]))
+
+    matched = []
+    hits = {}
+    for keyword in keywords:
+        if keyword not in spans:
+            continue
+        matched.append(keyword)
+        if keyword not in hits:
+            text = span_text[keyword]
+            hits[keyword] = [
+                [start, text[max(0, start - context_chars):end + context_chars]]
+                for start, end in spans[keyword]
+            ]
+    return matched, {k: v for k, v in hits.items() if v}, pattern_hits.timed_out
+
+
+class PageAnalysis(NamedTuple):
+    matched: List[str]
+    hits: Dict[str, List[Tuple[int, str]]]
+    text: str
+    patterns_timed_out: bool = False  # wildcard/regex matching stopped at its time budget
+
+
+def analyze_page(body: bytes, content_type: Optional[str], keywords: List[str],
+                 normalize: Optional[str] = None) -> PageAnalysis:
+    """
+    CPU stage: decode, parse and match. Module-level so it can run in a
+    worker process; the raw body travels as a single bytes buffer.
+    Plain-text responses are matched as they are, without HTML parsing.
+    With a normalize mode the text is normalized once here for all keywords.
+    """
+    text, _charset = decode_body(body, content_type)
+    if classify(content_type, body) == HTML:
+        page_text = extract_text(text)
+    else:
+        page_text = ' '.join(text.split()).lower()
+    normalized_text = normalize_text(page_text, normalize) if normalize else None
+    matched, hits, timed_out = keyword_hits(page_text, keywords, normalize=normalize, normalized_text=normalized_text)
+    return PageAnalysis(matched, hits, page_text, timed_out)
+
+
+def get_parse_pool() -> Optional[ProcessPoolExecutor]:
+    """Shared parser process pool, created on first use"""
+    global _parse_pool
+    if PARSE_WORKERS <= 0:
+        return None
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            _parse_pool = ProcessPoolExecutor(max_workers=PARSE_WORKERS)
+        return _parse_pool
+
+
+def _reset_parse_pool() -> None:
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is not None:
+            _parse_pool.shutdown(wait=False, cancel_futures=True)
+        _parse_pool = None
+
+
+def scan_url_for_keywords(url: str, keywords: List[str], timeout: int = 10,
+                          normalize: Optional[str] = None) -> Tuple[bool, List[str]]:
     """
     Scan a single URL for keywords.
-    
+
     Args:
         url: The URL to scan
         keywords: List of keywords to search for
         timeout: Request timeout in seconds
-    
+        normalize: Obfuscation-tolerant matching mode (see text_normalize)
+
     Returns:
         (found, matched_keywords): Tuple of whether keywords were found and which ones
     """
+    url = normalize_url(url)
     try:
-        # Add http:// if not present
-        if not url.startswith(('http://', 'https://')):
-            url = 'http://' + url
-        
-        # Fetch the page
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=timeout, allow_redirects=True)
-        response.raise_for_status()
-        
-        # Parse HTML and extract text
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Remove script and style elements
-        for script in soup(["script", "style"]):
-            script.decompose()
-        
-        # Get text content
-        page_text = soup.get_text(separator=' ', strip=True).lower()
-        
-        # Search for keywords
-        matched = []
-        for keyword in keywords:
-            if keyword.lower() in page_text:
-                matched.append(keyword)
-        
+        body, content_type = fetch_page(url, timeout=timeout)
+        matched = analyze_page(body, content_type, keywords, normalize).matched
         return len(matched) > 0, matched
-        
+
+    except UnsupportedContent as e:
+        print(f"{str(e)}: {url}")
+        return False, []
     except requests.exceptions.Timeout:
         print(f"Timeout scanning {url}")
         return False, []
@@ -56,3 +316,166 @@ def scan_url_for_keywords(url: str, keywords: List[str], timeout: int = 10) -> T
     except Exception as e:
         print(f"Unexpected error scanning {url}: {str(e)}")
         return False, []
+
+
+class ScanResult(NamedTuple):
+    url: str
+    analysis: Optional[PageAnalysis]  # None when the page could not be fetched or parsed
+    error: Optional[str]
+    fetch_ms: float
+    parse_ms: float
+
+
+def _timed_fetch(url: str, timeout: int, budget: Optional[float], started_at: Dict[str, float],
+                 host_health: Optional[HostHealthTracker] = None):
+    if host_health is not None:
+        # Checked when the fetch starts, so a host that fails partway through
+        # a scan stops costing timeouts for its remaining queued URLs
+        if not host_health.allow(url):
+            raise HostCircuitOpen(f"Skipped: circuit open for {url}")
+        timeout = host_health.timeout_for(url, timeout)
+    started_at[url] = time.monotonic()
+    started = time.perf_counter()
+    try:
+        body, content_type = fetch_page(url, timeout=timeout, budget=budget)
+    except UnsupportedContent:
+        if host_health is not None:
+            host_health.record_success(url)
+        raise
+    except requests.exceptions.HTTPError as e:
+        # The host answered; a 4xx says nothing about its health
+        if host_health is not None:
+            if e.response is not None and e.response.status_code < 500:
+                host_health.record_success(url)
+            else:
+                host_health.record_failure(url, str(e))
+        raise
+    except Exception as e:
+        if host_health is not None:
+            host_health.record_failure(url, str(e) or type(e).__name__)
+        raise
+    fetch_ms = (time.perf_counter() - started) * 1000
+    if host_health is not None:
+        host_health.record_success(url, fetch_ms / 1000)
+    return body, content_type, fetch_ms
+
+
+def _timed_analyze(body: bytes, content_type: Optional[str], keywords: List[str], normalize: Optional[str] = None):
+    started = time.perf_counter()
+    analysis = analyze_page(body, content_type, keywords, normalize)
+    return analysis, (time.perf_counter() - started) * 1000
+
+
+def scan_urls_for_keywords(
+    urls: Iterable[str],
+    keywords: List[str],
+    timeout: int = 10,
+    fetch_workers: int = FETCH_WORKERS,
+    url_budget: Optional[float] = None,
+    deadline: Optional[float] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    host_health: Optional[HostHealthTracker] = None,
+    normalize: Optional[str] = None,
+) -> Iterator[ScanResult]:
+    """
+    Scan many URLs through the fetch/parse pipeline.
+
+    Fetches run on a thread pool; each fetched body is handed to the parser
+    process pool as soon as it arrives, so parsing of early pages overlaps
+    with downloading later ones.
+
+    Args:
+        urls: URLs to scan (duplicates are scanned once)
+        keywords: Keywords to search for
+        timeout: Connect/read timeout per request
+        fetch_workers: Concurrent fetches
+        url_budget: Total seconds per URL; a fetch still running past it
+            (e.g. stuck in DNS) is abandoned and reported as an error
+        deadline: time.monotonic() value after which the scan stops early
+        should_stop: Polled a few times a second; returning True stops early
+        host_health: Records each fetch's outcome; hosts with an open circuit
+            are skipped and timeouts follow each host's observed latency
+        normalize: Obfuscation-tolerant matching mode (see text_normalize)
+
+    Yields:
+        A ScanResult for each distinct URL finished before the scan stopped,
+        in completion order
+    """
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        return
+
+    parse_pool = get_parse_pool()
+    fetchers = ThreadPoolExecutor(max_workers=max(1, min(fetch_workers, len(urls))))
+    started_at: Dict[str, float] = {}
+    fetching = {fetchers.submit(_timed_fetch, url, timeout, url_budget, started_at, host_health): url for url in urls}
+    parsing = {}
+
+    try:
+        while fetching or parsing:
+            if should_stop is not None and should_stop():
+                return
+            if deadline is not None and time.monotonic() >= deadline:
+                return
+
+            done, _ = wait(list(fetching) + list(parsing), timeout=STOP_POLL_SECONDS, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in fetching:
+                    url = fetching.pop(future)
+                    try:
+                        body, content_type, fetch_ms = future.result()
+                    except HostCircuitOpen as e:
+                        print(str(e))
+                        yield ScanResult(url, None, str(e), 0.0, 0.0)
+                        continue
+                    except UnsupportedContent as e:
+                        print(f"{str(e)}: {url}")
+                        yield ScanResult(url, None, str(e), 0.0, 0.0)
+                        continue
+                    except requests.exceptions.Timeout as e:
+                        print(f"Timeout scanning {url}")
+                        yield ScanResult(url, None, str(e) or 'timeout', 0.0, 0.0)
+                        continue
+                    except requests.exceptions.RequestException as e:
+                        print(f"Error scanning {url}: {str(e)}")
+                        yield ScanResult(url, None, str(e), 0.0, 0.0)
+                        continue
+                    except Exception as e:
+                        print(f"Unexpected error scanning {url}: {str(e)}")
+                        yield ScanResult(url, None, str(e), 0.0, 0.0)
+                        continue
+
+                    executor = parse_pool or fetchers
+                    parsing[executor.submit(_timed_analyze, body, content_type, keywords, normalize)] = (
+                        url, body, content_type, fetch_ms)
+                elif future in parsing:
+                    url, body, content_type, fetch_ms = parsing.pop(future)
+                    try:
+                        analysis, parse_ms = future.result()
+                    except BrokenProcessPool:
+                        # A parser process died; finish this page inline and start a fresh pool
+                        _reset_parse_pool()
+                        parse_pool = get_parse_pool()
+                        analysis, parse_ms = _timed_analyze(body, content_type, keywords, normalize)
+                    except Exception as e:
+                        print(f"Unexpected error scanning {url}: {str(e)}")
+                        yield ScanResult(url, None, str(e), fetch_ms, 0.0)
+                        continue
+                    yield ScanResult(url, analysis, None, fetch_ms, parse_ms)
+
+            if url_budget:
+                # Give up on fetches that blew through their budget somewhere
+                # fetch_page cannot interrupt (DNS resolution, a blocking read)
+                now = time.monotonic()
+                for future, url in list(fetching.items()):
+                    started = started_at.get(url)
+                    if started is not None and now - started > url_budget + STOP_POLL_SECONDS:
+                        del fetching[future]
+                        # Its thread still reports the eventual outcome to host_health
+                        print(f"Abandoning {url}: over its {url_budget}s budget")
+                        yield ScanResult(url, None, f"Exceeded {url_budget}s budget", (now - started) * 1000, 0.0)
+    finally:
+        for future in list(fetching) + list(parsing):
+            future.cancel()
+        # Don't block on abandoned fetches; their threads exit when the socket gives up
+        fetchers.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,40 @@
+import pytest
+
+from content_sniff import HTML, TEXT, UnsupportedContent, classify
+
+PNG = b'\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x01\x00'
+EXE = b'MZ\x90\x00\x03\x00\x00\x00\x04\x00\x00\x00\xff\xff\x00\x00'
+ZIP = b'PK\x03\x04\x14\x00\x00\x00\x08\x00'
+PDF = b'%PDF-1.7\n%\xe2\xe3\xcf\xd3\n1 0 obj\n<</Filter/FlateDecode>>stream\nx\x9c\x03\x00'
+
+
+@pytest.mark.parametrize('content_type, head', [
+    ('text/html', b'MZ hosting prices'),
+    ('text/html; charset=utf-8', b'ID3 tag editor download page'),
+    ('text/html', b'RIFF audio format notes'),
+    ('application/xhtml+xml', b'MZ\n<html>'),
+])
+def test_html_starting_like_a_signature_is_kept(content_type, head):
+    assert classify(content_type, head) == HTML
+
+
+@pytest.mark.parametrize('head', [b'MZ: notes on the DOS header\n', b'ID3 tags, explained\r\n', b'RIFF\twav\n'])
+def test_text_starting_like_a_signature_is_kept(head):
+    assert classify('text/plain', head) == TEXT
+
+
+@pytest.mark.parametrize('content_type', ['text/html', 'application/xhtml+xml', 'text/plain',
+                                          'application/octet-stream', None])
+def test_binaries_are_skipped(content_type):
+    for head in (PNG, EXE, ZIP, PDF):
+        with pytest.raises(UnsupportedContent):
+            classify(content_type, head)
+
+
+def test_generic_type_sniffs_pages():
+    assert classify('application/octet-stream', b'<!DOCTYPE html><html>') == HTML
+    assert classify(None, b'user:pass combo list\n') == TEXT
+    with pytest.raises(UnsupportedContent):
+        classify(None, b'ID3 tags')
+    with pytest.raises(UnsupportedContent):
+        classify('image/png', b'<html>')
@@ -0,0 +1,162 @@
+import socket
+import subprocess
+import sys
+import threading
+
+import pytest
+
+import dns_cache
+from dns_cache import DnsCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+class FakeResolver:
+    """Stands in for a stub resolver: scripted answers per host, with a call count"""
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.calls = []
+
+    def __call__(self, host):
+        self.calls.append(host)
+        answer = self.answers[host]
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(dns_cache, 'time', clock)
+    return clock
+
+
+def test_answers_are_cached_for_their_ttl(clock):
+    resolver = FakeResolver({'a.test': (['10.0.0.1'], 30)})
+    cache = DnsCache(resolver)
+    assert cache.resolve('A.test.') == ['10.0.0.1']
+    clock.now += 29
+    assert cache.resolve('a.test') == ['10.0.0.1']
+    assert len(resolver.calls) == 1
+
+    resolver.answers['a.test'] = (['10.0.0.2'], 30)
+    clock.now += 2
+    assert cache.resolve('a.test') == ['10.0.0.2']
+    assert len(resolver.calls) == 2
+    assert cache.snapshot()['hits'] == 1
+
+
+def test_ttls_are_clamped_and_defaulted(clock):
+    resolver = FakeResolver({'short.test': (['10.0.0.1'], 0), 'none.test': (['10.0.0.2'], None)})
+    cache = DnsCache(resolver)
+    cache.resolve('short.test')
+    cache.resolve('none.test')
+    clock.now += dns_cache.MIN_TTL_SECONDS - 1
+    cache.resolve('short.test')
+    clock.now = 1000.0 + dns_cache.DEFAULT_TTL_SECONDS - 1
+    cache.resolve('none.test')
+    assert len(resolver.calls) == 2
+
+
+def test_missing_hosts_are_cached_negatively(clock):
+    resolver = FakeResolver({'gone.test': socket.gaierror(socket.EAI_NONAME, 'Name or service not known')})
+    cache = DnsCache(resolver)
+    for _ in range(3):
+        with pytest.raises(socket.gaierror):
+            cache.resolve('gone.test')
+    assert len(resolver.calls) == 1
+    assert cache.snapshot()['negative_hits'] == 2
+
+    clock.now += dns_cache.NEGATIVE_TTL_SECONDS
+    resolver.answers['gone.test'] = (['10.0.0.3'], 60)
+    assert cache.resolve('gone.test') == ['10.0.0.3']
+
+
+def test_expired_answer_is_served_on_resolver_failure(clock):
+    resolver = FakeResolver({'a.test': (['10.0.0.1'], 60)})
+    cache = DnsCache(resolver)
+    cache.resolve('a.test')
+    resolver.answers['a.test'] = socket.gaierror(socket.EAI_AGAIN, 'Temporary failure in name resolution')
+
+    clock.now += 61
+    assert cache.resolve('a.test') == ['10.0.0.1']
+    assert cache.snapshot()['stale_served'] == 1
+
+    clock.now += dns_cache.STALE_TTL_SECONDS
+    with pytest.raises(socket.gaierror):
+        cache.resolve('a.test')
+
+
+def test_temporary_failure_is_not_cached(clock):
+    resolver = FakeResolver({'a.test': socket.gaierror(socket.EAI_AGAIN, 'Temporary failure in name resolution')})
+    cache = DnsCache(resolver)
+    with pytest.raises(socket.gaierror):
+        cache.resolve('a.test')
+    resolver.answers['a.test'] = (['10.0.0.1'], 60)
+    assert cache.resolve('a.test') == ['10.0.0.1']
+
+
+def test_concurrent_lookups_share_one_resolver_call():
+    release = threading.Event()
+    calls = []
+
+    def slow_resolver(host):
+        calls.append(host)
+        release.wait(5)
+        return ['10.0.0.1'], 60
+
+    cache = DnsCache(slow_resolver)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.resolve('a.test'))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    while cache.snapshot()['coalesced'] < 7:
+        threading.Event().wait(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert calls == ['a.test']
+    assert results == [['10.0.0.1']] * 8
+
+
+def test_concurrent_lookups_share_a_failure():
+    release = threading.Event()
+
+    def failing_resolver(host):
+        release.wait(5)
+        raise socket.gaierror(socket.EAI_NONAME, 'Name or service not known')
+
+    cache = DnsCache(failing_resolver)
+    errors = []
+
+    def resolve():
+        try:
+            cache.resolve('gone.test')
+        except socket.gaierror as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=resolve) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    while cache.snapshot()['coalesced'] < 3:
+        threading.Event().wait(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert len(errors) == 4
+    assert cache.snapshot()['lookups'] == 1
+
+
+def test_importing_the_scanner_leaves_urllib3_alone():
+    check = ("import urllib3.util.connection as c; original = c.create_connection; "
+             "import simple_scanner; assert c.create_connection is original; "
+             "simple_scanner.enable_dns_cache(); assert c.create_connection is not original")
+    subprocess.run([sys.executable, '-c', check], check=True)
@@ -0,0 +1,82 @@
+import threading
+
+import host_health
+from host_health import FAILURE_THRESHOLD, HostHealthTracker
+
+URL = 'http://flaky.example.test/page'
+
+
+def _trackers(tmp_path, count=2):
+    # One tracker per process sharing the database file
+    return [HostHealthTracker(str(tmp_path / 'host_health.db')) for _ in range(count)]
+
+
+def _open_circuit(tracker):
+    for _ in range(FAILURE_THRESHOLD):
+        tracker.record_failure(URL, 'timed out')
+
+
+def test_other_processes_see_failures_and_open_circuits(tmp_path):
+    web, worker = _trackers(tmp_path)
+    _open_circuit(worker)
+    [row] = web.snapshot()
+    assert row['state'] == 'open'
+    assert row['failures'] == FAILURE_THRESHOLD
+    assert not web.allow(URL)
+
+
+def test_reset_closes_a_circuit_held_open_elsewhere(tmp_path):
+    web, worker = _trackers(tmp_path)
+    _open_circuit(worker)
+    assert web.reset('flaky.example.test')
+    assert worker.allow(URL)
+    assert not web.reset('flaky.example.test')
+
+
+def test_concurrent_writers_do_not_lose_counts(tmp_path):
+    trackers = _trackers(tmp_path, 4)
+
+    def fail_and_succeed(tracker):
+        for _ in range(25):
+            tracker.record_failure(URL, 'refused')
+            tracker.record_success(URL, 0.1)
+
+    threads = [threading.Thread(target=fail_and_succeed, args=(t,)) for t in trackers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    [row] = trackers[0].snapshot()
+    assert row['requests'] == 200
+    assert row['failures'] == 100
+
+
+def test_one_probe_across_processes(tmp_path, monkeypatch):
+    monkeypatch.setattr(host_health, 'BASE_BACKOFF_SECONDS', 0)
+    web, worker = _trackers(tmp_path)
+    _open_circuit(worker)
+    assert [web.allow(URL), worker.allow(URL), web.allow(URL)].count(True) == 1
+    worker.record_success(URL, 0.2)
+    assert web.allow(URL)
+    assert web.snapshot()[0]['state'] == 'closed'
+
+
+def test_failed_probe_doubles_backoff(tmp_path, monkeypatch):
+    monkeypatch.setattr(host_health, 'BASE_BACKOFF_SECONDS', 0)
+    tracker, = _trackers(tmp_path, 1)
+    _open_circuit(tracker)
+    monkeypatch.setattr(host_health, 'BASE_BACKOFF_SECONDS', 100)
+    assert tracker.allow(URL)
+    tracker.record_failure(URL, 'still down')
+    row = tracker.snapshot()[0]
+    assert row['state'] == 'open'
+    assert row['next_probe_at'] - row['last_failure_at'] == 200
+    assert not tracker.allow(URL)
+
+
+def test_timeout_follows_p95_latency(tmp_path):
+    tracker, = _trackers(tmp_path, 1)
+    assert tracker.timeout_for(URL, 10) == 10
+    for _ in range(10):
+        tracker.record_success(URL, 1.0)
+    assert tracker.timeout_for(URL, 10) == 3.0
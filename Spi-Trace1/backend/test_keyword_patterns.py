@@ -0,0 +1,101 @@
+import threading
+import time
+
+import pytest
+
+import keyword_patterns
+from keyword_patterns import KeywordError, compile_keywords, validate_keyword, validate_keywords
+
+
+@pytest.mark.parametrize('entry', [
+    'leak',
+    'pass*word',
+    're:p[a@]ss(wd|word)',
+    r're:\d{3}-\d{4}',
+    're:user.*pass',
+    're:(foo|bar)+',
+    're:(ab){2,3}',
+    're:(a{1,3}){2}',
+])
+def test_accepted_entries(entry):
+    validate_keyword(entry)
+
+
+@pytest.mark.parametrize('entry, reason', [
+    ('re:(a+)+$', 'nested quantifiers'),
+    ('re:(a*){2}', 'nested quantifiers'),
+    (r're:(\w)\1', 'backreferences'),
+    ('re:foo(?=bar)', 'lookarounds'),
+    ('re:(?<!x)foo', 'lookarounds'),
+    ('re:(?P<x>a)', 'named groups'),
+    ('re:a*', 'matches empty text'),
+    ('re:a.*b.*c.*d.*e', 'unbounded quantifiers'),
+    ('re:(', 'invalid regular expression'),
+    ('re:(?i)abc', 'invalid regular expression'),
+    ('***', 'needs some literal text'),
+    ('', 'non-empty strings'),
+    (5, 'non-empty strings'),
+    ('re:' + 'a' * 300, 'limited to'),
+])
+def test_rejected_entries(entry, reason):
+    with pytest.raises(KeywordError, match=reason):
+        validate_keyword(entry)
+
+
+def test_keyword_list_limits():
+    with pytest.raises(KeywordError, match='must be a list'):
+        validate_keywords('leak')
+    with pytest.raises(KeywordError, match='At most'):
+        validate_keywords(['leak'] * (keyword_patterns.MAX_KEYWORDS + 1))
+    with pytest.raises(KeywordError, match='once normalized'):
+        validate_keywords(['​​'], 'standard')
+
+
+def test_pattern_hits():
+    keywords = compile_keywords(('leak', 're:p[a@]ss(wd|word)', 'pass*word', r're:\d{3}-\d{4}'))
+    assert keywords.literals == ['leak']
+    text = 'my p@sswd and password leak, contact 555-1234; passXword here'
+    hits = keywords.find_pattern_hits({'text': text}, max_hits_per_keyword=5, max_hits_per_page=50)
+    assert not hits.timed_out
+    assert [text[s:e] for s, e in hits.spans['re:p[a@]ss(wd|word)']] == ['p@sswd', 'password']
+    # One entry is recorded per match position: 'password' went to the regex
+    assert [text[s:e] for s, e in hits.spans['pass*word']] == ['passXword']
+    assert [text[s:e] for s, e in hits.spans[r're:\d{3}-\d{4}']] == ['555-1234']
+
+
+def test_entry_hidden_behind_another_is_still_found():
+    keywords = compile_keywords(('re:pass(word)?', 're:password'))
+    hits = keywords.find_pattern_hits({'text': 'the password list'}, 5, 50)
+    assert set(hits.spans) == {'re:pass(word)?', 're:password'}
+
+
+def test_hits_across_window_boundaries():
+    text = 'x' * (keyword_patterns.WINDOW_CHARS - 3) + 'secret-key ' + 'filler ' * 5000 + 'secret-key'
+    hits = compile_keywords((r're:secret-\w+',)).find_pattern_hits({'text': text}, 5, 50)
+    assert [text[s:e] for s, e in hits.spans[r're:secret-\w+']] == ['secret-key', 'secret-key']
+
+
+def _slow_text():
+    # Quadratic backtracking for a pattern the validator accepts
+    return 'a' * 12000
+
+
+SLOW = ('re:a.*a.*b',)
+
+
+def test_budget_stops_slow_patterns_on_the_main_thread():
+    started = time.monotonic()
+    hits = compile_keywords(SLOW).find_pattern_hits({'text': _slow_text()}, 5, 50, budget=0.2)
+    assert hits.timed_out
+    assert time.monotonic() - started < 2
+
+
+def test_budget_between_windows_off_the_main_thread(monkeypatch):
+    monkeypatch.setattr(keyword_patterns, 'WINDOW_CHARS', 1024)
+    result = []
+    thread = threading.Thread(target=lambda: result.append(
+        compile_keywords(('re:a.*a.*b',)).find_pattern_hits({'text': _slow_text()}, 5, 50, budget=0.05)
+    ))
+    thread.start()
+    thread.join(30)
+    assert result and result[0].timed_out
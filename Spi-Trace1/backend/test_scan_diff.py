@@ -0,0 +1,40 @@
+from scan_diff import compute_delta, keyword_signature
+
+
+def test_first_scan_reports_everything_new():
+    delta = compute_delta([{'url': 'http://a', 'keywords': ['Leak']}], ['http://a', 'http://b'], None, None)
+    assert delta == {'new': {'http://a': ['leak']}, 'gone': {}, 'unchanged': 0}
+
+
+def test_new_gone_and_unchanged():
+    previous = [{'url': 'http://a', 'keywords': ['leak', 'dump']}, {'url': 'http://b', 'keywords': ['leak']}]
+    current = [{'url': 'http://a', 'keywords': ['LEAK', 'combo']}]
+    delta = compute_delta(current, ['http://a', 'http://b'], previous, ['http://a', 'http://b'])
+    assert delta == {
+        'new': {'http://a': ['combo']},
+        'gone': {'http://a': ['dump'], 'http://b': ['leak']},
+        'unchanged': 1,
+    }
+
+
+def test_urls_not_scanned_both_times_are_not_cleared():
+    previous = [{'url': 'http://a', 'keywords': ['leak']}, {'url': 'http://b', 'keywords': ['leak']}]
+    # http://b errored this time; http://c was not scanned last time
+    current = [{'url': 'http://c', 'keywords': ['leak']}]
+    delta = compute_delta(current, ['http://a', 'http://c'], previous, ['http://a', 'http://b'])
+    assert delta == {'new': {'http://c': ['leak']}, 'gone': {'http://a': ['leak']}, 'unchanged': 0}
+
+
+def test_regex_case_is_kept():
+    previous = [{'url': 'http://a', 'keywords': [r're:\d+']}]
+    current = [{'url': 'http://a', 'keywords': [r're:\D+']}]
+    delta = compute_delta(current, ['http://a'], previous, ['http://a'])
+    assert delta['new'] == {'http://a': [r're:\D+']}
+    assert delta['gone'] == {'http://a': [r're:\d+']}
+
+
+def test_keyword_signature():
+    assert keyword_signature(['Leak', ' dump ']) == keyword_signature(['dump', 'leak', 'leak'])
+    assert keyword_signature([r're:\d+']) != keyword_signature([r're:\D+'])
+    assert keyword_signature(['leak'], 'leet') != keyword_signature(['leak'])
+    assert keyword_signature(['leak'], 'leet') != keyword_signature(['leak'], 'standard')
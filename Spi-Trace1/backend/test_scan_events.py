@@ -0,0 +1,48 @@
+import json
+import threading
+import time
+from datetime import datetime
+
+from models import db, ScanHistory
+
+
+def _add_scan(app, user_id, status):
+    with app.app_context():
+        db.session.add(ScanHistory(id='scan-1', user_id=user_id, keywords='["leak"]', urls_scanned='[]',
+                                   matches='[]', errors='[]', status=status, started_at=datetime.utcnow()))
+        db.session.commit()
+
+
+def _events(response):
+    events = []
+    for chunk in response.response:
+        for block in chunk.decode().split('\n\n'):
+            fields = dict(line.split(': ', 1) for line in block.splitlines() if ': ' in line)
+            if 'event' in fields:
+                events.append((fields['event'], json.loads(fields['data'])))
+    return events
+
+
+def test_polled_stream_reports_finished_scan(client, app, user):
+    user_id, headers = user
+    _add_scan(app, user_id, 'complete')
+    response = client.get('/api/scans/scan-1/events', headers=headers, buffered=False)
+    assert _events(response) == [('complete', {'status': 'complete', 'urls_scanned': 0, 'matches': 0, 'errors': 0})]
+
+
+def test_polled_stream_ends_when_scan_is_deleted(client, app, user):
+    user_id, headers = user
+    _add_scan(app, user_id, 'scanning')
+
+    def delete_scan():
+        time.sleep(0.5)
+        with app.app_context():
+            db.session.delete(db.session.get(ScanHistory, 'scan-1'))
+            db.session.commit()
+
+    deleter = threading.Thread(target=delete_scan)
+    deleter.start()
+    response = client.get('/api/scans/scan-1/events', headers=headers, buffered=False)
+    events = _events(response)
+    deleter.join()
+    assert events == [('complete', {'status': 'deleted'})]
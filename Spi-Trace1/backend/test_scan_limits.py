@@ -0,0 +1,39 @@
+import json
+import uuid
+from datetime import datetime
+
+import pytest
+
+from app import run_scan
+from models import db, ScanHistory
+
+
+@pytest.mark.parametrize('field', ['deadline_seconds', 'url_budget_seconds'])
+@pytest.mark.parametrize('value', ['soon', -1, 0, True, [5], 'inf'])
+def test_bad_time_limits_are_rejected(client, user, field, value):
+    _, headers = user
+    response = client.post('/api/scan', json={'keywords': ['leak'], field: value}, headers=headers)
+    assert response.status_code == 400
+    assert field in response.get_json()['error']
+    with client.application.app_context():
+        assert ScanHistory.query.count() == 0
+
+
+def test_numeric_string_limit_is_accepted(client, user):
+    _, headers = user
+    response = client.post('/api/scan', json={'keywords': ['leak'], 'deadline_seconds': '5'}, headers=headers)
+    assert response.status_code == 201
+    assert response.get_json()['status'] == 'complete'
+
+
+def test_scan_setup_failure_marks_scan_failed(app, user):
+    user_id, _ = user
+    with app.app_context():
+        scan = ScanHistory(id=str(uuid.uuid4()), user_id=user_id, keywords='["leak"]', urls_scanned='[]',
+                           matches='[]', errors='[]', status='scanning', started_at=datetime.utcnow())
+        db.session.add(scan)
+        db.session.commit()
+        run_scan(scan, ['leak'], ['http://127.0.0.1:9/page'], deadline_seconds='5')
+        assert scan.status == 'failed'
+        assert scan.completed_at is not None
+        assert 'Scan failed' in json.loads(scan.errors)[-1]
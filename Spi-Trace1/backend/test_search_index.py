@@ -0,0 +1,42 @@
+import sqlite3
+
+import pytest
+
+from search_index import SearchIndex, SearchQueryError
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = SearchIndex(str(tmp_path / 'search_index.db'))
+    index.index_page('http://a.test/1', 'acme corp password dump for sale', scanned_at=100)
+    index.index_page('http://a.test/2', 'password reset instructions', scanned_at=200)
+    index.index_page('http://b.test/1', 'acme corp password dump mirror', scanned_at=300)
+    return index
+
+
+def test_search_ranks_and_filters(index):
+    assert {r['url'] for r in index.search('"acme corp" dump')} == {'http://a.test/1', 'http://b.test/1'}
+    assert [r['url'] for r in index.search('password', since=250)] == ['http://b.test/1']
+    assert index.search('password', urls=[]) == []
+
+
+def test_url_filter_beyond_the_bound_variable_limit(index):
+    # As on SQLite builds before 3.32
+    index._conn().setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 999)
+    urls = [f'http://other.test/{i}' for i in range(5000)] + ['http://a.test/2']
+    assert [r['url'] for r in index.search('password', urls=urls)] == ['http://a.test/2']
+    # The filter of one search doesn't leak into the next
+    assert len(index.search('password')) == 3
+    assert [r['url'] for r in index.search('dump', urls=['http://b.test/1'])] == ['http://b.test/1']
+
+
+def test_url_filter_does_not_block_writers(index, tmp_path):
+    index.search('password', urls=['http://a.test/1'])
+    other = SearchIndex(str(tmp_path / 'search_index.db'))
+    assert other.index_page('http://c.test/1', 'fresh password dump')
+    assert len(index.search('password')) == 4
+
+
+def test_bad_query_syntax(index):
+    with pytest.raises(SearchQueryError):
+        index.search('"unterminated', urls=['http://a.test/1'])
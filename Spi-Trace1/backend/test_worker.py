@@ -0,0 +1,97 @@
+import json
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm.attributes import set_committed_value
+
+import job_queue
+import worker
+from job_queue import STRIDE, claim_job, enqueue_scan, tenant_schedule
+from models import db, ScanHistory, ScanJob, TenantQuota
+from worker import ScanWorker
+
+
+def _queue_scan(user_id):
+    scan = ScanHistory(id=str(uuid.uuid4()), user_id=user_id, keywords='["leak"]', urls_scanned='[]',
+                       matches='[]', errors='[]', status='scanning', started_at=datetime.utcnow())
+    db.session.add(scan)
+    enqueue_scan(scan, ['leak'], ['http://127.0.0.1:9/page'])
+    db.session.commit()
+    return scan.id
+
+
+@pytest.fixture
+def fast_poll(monkeypatch):
+    monkeypatch.setattr(worker, 'POLL_SECONDS', 0.01)
+
+
+def test_worker_survives_a_failed_claim(app, user, monkeypatch, fast_poll):
+    user_id, _ = user
+    with app.app_context():
+        scan_id = _queue_scan(user_id)
+    calls = []
+
+    def flaky_claim(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 1:
+            raise OperationalError('UPDATE scan_jobs', {}, Exception('database is locked'))
+        return claim_job(*args, **kwargs)
+
+    monkeypatch.setattr(worker, 'claim_job', flaky_claim)
+    ScanWorker(app, 'test-worker').run(once=True)
+
+    assert len(calls) == 3
+    with app.app_context():
+        assert ScanJob.query.filter_by(scan_id=scan_id).one().status == 'done'
+        assert db.session.get(ScanHistory, scan_id).status == 'complete'
+
+
+def test_scan_cancelled_after_claim_does_not_run(app, user, monkeypatch):
+    user_id, _ = user
+    monkeypatch.setattr(worker, 'run_scan', lambda *args: pytest.fail('cancelled scan was run'))
+    with app.app_context():
+        scan_id = _queue_scan(user_id)
+        job = claim_job('test-worker')
+        # The cancel endpoint withdraws the scan after the worker's session has seen it queued
+        seen = db.session.get(ScanHistory, scan_id)
+        ScanHistory.query.filter_by(id=scan_id, status='queued').update({'status': 'cancelled'},
+                                                                        synchronize_session=False)
+        db.session.commit()
+        set_committed_value(seen, 'status', 'queued')
+
+        ScanWorker(app, 'test-worker').process(job)
+        assert db.session.get(ScanHistory, scan_id).status == 'cancelled'
+        assert db.session.get(ScanJob, job.id).status == 'done'
+
+
+def test_concurrent_claims_each_advance_the_tenant(app, user):
+    user_id, _ = user
+    with app.app_context():
+        for _ in range(2):
+            _queue_scan(user_id)
+        # Both workers computed their schedule before either claimed
+        [first] = tenant_schedule()
+        [second] = tenant_schedule()
+        job_queue._advance_pass(first)
+        job_queue._advance_pass(second)
+        db.session.commit()
+        assert db.session.get(TenantQuota, user_id).pass_value == 2 * STRIDE
+
+        db.session.get(TenantQuota, user_id).weight = 4
+        db.session.commit()
+        job_queue._advance_pass(tenant_schedule()[0])
+        db.session.commit()
+        assert db.session.get(TenantQuota, user_id).pass_value == 2 * STRIDE + STRIDE / 4
+
+
+def test_idle_tenant_starts_level_with_busy_ones(app, user):
+    user_id, _ = user
+    with app.app_context():
+        _queue_scan(user_id)
+        tenant = dict(tenant_schedule()[0], pass_value=5 * STRIDE)
+        job_queue._advance_pass(tenant)
+        db.session.commit()
+        assert db.session.get(TenantQuota, user_id).pass_value == 6 * STRIDE
+        assert json.loads(ScanJob.query.first().payload)['keywords'] == ['leak']
@@ -0,0 +1,90 @@
+"""
+Obfuscation-tolerant text normalization for keyword matching.
+
+Scans requested with `normalize` match literal and wildcard keywords against
+a normalized copy of each page's text, made once per page next to the
+extracted text (in the parser process) and shared by every keyword. The
+keywords go through the same normalization once when the keyword set is
+compiled, so tolerant matching costs one extra pass over the page rather
+than a keyword per spelling.
+
+Steps, each a single C-level pass:
+    NFKC        fullwidth, ligatures, math alphanumerics, nbsp -> plain forms
+    casefold    case-insensitive, including ß -> ss
+    translate   drop zero-width/formatting characters, map Cyrillic, Greek
+                and small-capital lookalikes to Latin (and, in 'leet' mode,
+                digits and symbols such as 0 4 3 1 5 7 @ $ ! | to letters)
+    spacing     collapse whitespace runs; join letters spaced or dotted out
+                one at a time (p a s s w o r d, p.a.s.s)
+
+Offsets and snippets of hits found this way refer to the normalized text.
+re: keywords are matched against the text as extracted, since a regex is
+written for the characters it expects.
+"""
+import re
+import unicodedata
+from typing import Optional
+
+STANDARD, LEET = 'standard', 'leet'
+MODES = (STANDARD, LEET)
+
+# Zero-width and invisible formatting characters used to split words
+ZERO_WIDTH = (
+    '\u00ad\u034f\u061c\u115f\u1160\u17b4\u17b5\u180e'
+    '\u200b\u200c\u200d\u200e\u200f\u202a\u202b\u202c\u202d\u202e'
+    '\u2060\u2061\u2062\u2063\u2064\u206a\u206b\u206c\u206d\u206e\u206f'
+    '\u3164\ufeff\uffa0'
+) + ''.join(map(chr, range(0xfe00, 0xfe10)))  # variation selectors
+
+# Lowercase lookalikes NFKC leaves alone (it folds compatibility forms, not homoglyphs)
+CONFUSABLES = {
+    # Cyrillic
+    '\u0430': 'a', '\u0432': 'b', '\u0435': 'e', '\u0451': 'e', '\u04bb': 'h', '\u0456': 'i', '\u0457': 'i',
+    '\u0458': 'j', '\u043a': 'k', '\u04cf': 'l', '\u043c': 'm', '\u043d': 'h', '\u043e': 'o', '\u0440': 'p',
+    '\u051b': 'q', '\u0433': 'r', '\u0455': 's', '\u0442': 't', '\u0443': 'y', '\u051d': 'w', '\u0445': 'x',
+    '\u0441': 'c', '\u0501': 'd', '\u044c': 'b', '\u0578': 'n', '\u057d': 'u',
+    # Greek
+    '\u03b1': 'a', '\u03b2': 'b', '\u03b5': 'e', '\u03b7': 'n', '\u03b9': 'i', '\u03ba': 'k', '\u03bd': 'v',
+    '\u03bf': 'o', '\u03c1': 'p', '\u03c4': 't', '\u03c5': 'u', '\u03c7': 'x', '\u03c9': 'w', '\u03f2': 'c',
+    '\u03f3': 'j',
+    # Latin variants and small capitals
+    '\u0131': 'i', '\u0237': 'j', '\u0251': 'a', '\u0261': 'g', '\u0269': 'i', '\u0280': 'r', '\u028f': 'y',
+    '\u1d00': 'a', '\u0299': 'b', '\u1d04': 'c', '\u1d05': 'd', '\u1d07': 'e', '\ua730': 'f', '\u0262': 'g',
+    '\u029c': 'h', '\u026a': 'i', '\u1d0a': 'j', '\u1d0b': 'k', '\u029f': 'l', '\u1d0d': 'm', '\u0274': 'n',
+    '\u1d0f': 'o', '\u1d18': 'p', '\ua731': 's', '\u1d1b': 't', '\u1d1c': 'u', '\u1d20': 'v', '\u1d21': 'w',
+    '\u1d22': 'z',
+}
+
+LEET_MAP = {'0': 'o', '1': 'i', '3': 'e', '4': 'a', '5': 's', '7': 't', '@': 'a', '$': 's', '!': 'i', '|': 'l'}
+
+_STANDARD_TABLE = str.maketrans({**dict.fromkeys(ZERO_WIDTH), **CONFUSABLES})
+_LEET_TABLE = str.maketrans({**dict.fromkeys(ZERO_WIDTH), **CONFUSABLES, **LEET_MAP})
+
+# Three or more single letters joined by single separators ("p a s s", "p.a.s.s", "p-a-s-s"),
+# after a separator; starting on the separator lets sre skip ahead to candidates quickly
+_SPACED_LETTERS = re.compile(r'[ ._\-\u00b7][^\W\d_][ ._\-\u00b7](?:[^\W\d_][ ._\-\u00b7])+[^\W\d_](?![^\W\d_])')
+_SEPARATOR = re.compile(r'[ ._\-\u00b7]')
+
+
+def _join_letters(match) -> str:
+    spaced = match.group()
+    return spaced[0] + _SEPARATOR.sub('', spaced[1:])
+
+
+def normalize_mode(value) -> Optional[str]:
+    """Mode for a request's `normalize` field: true means standard, false/None means off"""
+    if value in (None, False, '', 0):
+        return None
+    if value is True or value == 1:
+        return STANDARD
+    if value in MODES:
+        return value
+    raise ValueError(f"normalize must be true or one of {', '.join(MODES)}")
+
+
+def normalize_text(text: str, mode: str = STANDARD) -> str:
+    """Normalized form of page text or a keyword"""
+    text = unicodedata.normalize('NFKC', text).casefold()
+    text = text.translate(_LEET_TABLE if mode == LEET else _STANDARD_TABLE)
+    text = ' ' + ' '.join(text.split())
+    return _SPACED_LETTERS.sub(_join_letters, text)[1:]
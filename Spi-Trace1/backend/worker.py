@@ -0,0 +1,170 @@
+"""
+Scan worker: drains the scan_jobs queue (see job_queue.py).
+
+Start as many as you like, on this host or others sharing the database:
+
+    python worker.py [--concurrency N] [--once]
+
+(after `flask --app app init-db` has created the scan_jobs table). The web
+app queues async scans here when SCAN_QUEUE=1.
+
+Each worker thread claims one job at a time and renews its lease while the
+scan runs. SIGTERM/SIGINT stop claiming new jobs and let running scans finish.
+
+While the queue is empty, the first thread of each worker process runs a
+scan history retention pass every RETENTION_INTERVAL_SECONDS (see
+retention.py), a few batches at a time so a new job is never kept waiting long.
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import threading
+import time
+import traceback
+
+from app import create_app, run_retention_pass, run_scan
+from job_queue import (DEFAULT_LEASE_SECONDS, claim_job, complete_job, fail_job, heartbeat,
+                       reap_expired_leases)
+from models import db, ScanHistory
+from simple_scanner import enable_dns_cache
+
+POLL_SECONDS = 2.0
+RETENTION_INTERVAL_SECONDS = float(os.environ.get('SCAN_RETENTION_INTERVAL_SECONDS', 3600))
+# Batches per idle slot before checking the queue again
+RETENTION_BATCHES_PER_SLOT = 10
+
+
+class ScanWorker:
+    def __init__(self, app, worker_id: str, lease_seconds: int = DEFAULT_LEASE_SECONDS, runs_retention: bool = False):
+        self.app = app
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.runs_retention = runs_retention
+        self.next_retention_at = time.monotonic()
+        self.stopping = threading.Event()
+
+    def run(self, once: bool = False) -> None:
+        print(f"Worker {self.worker_id} started")
+        while not self.stopping.is_set():
+            with self.app.app_context():
+                try:
+                    reap_expired_leases()
+                    job = claim_job(self.worker_id, self.lease_seconds,
+                                    self.app.config['SCAN_TENANT_MAX_CONCURRENT'])
+                except Exception as e:
+                    # e.g. "database is locked" while other workers write; try again on the next poll
+                    db.session.rollback()
+                    print(f"Worker {self.worker_id} could not claim a job: {str(e)}")
+                    traceback.print_exc()
+                    self.stopping.wait(POLL_SECONDS)
+                    continue
+                if job is not None:
+                    self.process(job)
+                    continue
+                if self.runs_retention and time.monotonic() >= self.next_retention_at:
+                    self.retention_slot()
+                    continue
+            if once:
+                break
+            self.stopping.wait(POLL_SECONDS)
+        print(f"Worker {self.worker_id} stopped")
+
+    def retention_slot(self) -> None:
+        try:
+            stats = run_retention_pass(RETENTION_BATCHES_PER_SLOT, self.stopping.is_set)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Retention pass failed: {str(e)}")
+            self.next_retention_at = time.monotonic() + RETENTION_INTERVAL_SECONDS
+            return
+        if stats['compacted']:
+            print(f"Worker {self.worker_id} compacted {stats['compacted']} scan(s)")
+        if stats['batches'] < RETENTION_BATCHES_PER_SLOT:
+            # Caught up; otherwise carry on after checking the queue
+            self.next_retention_at = time.monotonic() + RETENTION_INTERVAL_SECONDS
+
+    def _heartbeat_loop(self, job_id: str, done: threading.Event) -> None:
+        with self.app.app_context():
+            while not done.wait(self.lease_seconds / 3):
+                try:
+                    if not heartbeat(job_id, self.worker_id, self.lease_seconds):
+                        print(f"Worker {self.worker_id} lost its lease on job {job_id}")
+                        return
+                except Exception as e:
+                    # Keep trying; the lease only lapses after lease_seconds
+                    print(f"Heartbeat for job {job_id} failed: {str(e)}")
+
+    def process(self, job) -> None:
+        payload = json.loads(job.payload)
+        print(f"Worker {self.worker_id} running job {job.id} (scan {job.scan_id}, attempt {job.attempts})")
+
+        done = threading.Event()
+        beat = threading.Thread(target=self._heartbeat_loop, args=(job.id, done), daemon=True)
+        beat.start()
+        try:
+            # Conditional, like the cancel endpoint's withdrawal of a queued scan, so exactly one of
+            # them wins; 'scanning' is a scan whose previous worker's lease ran out
+            started = ScanHistory.query.filter(
+                ScanHistory.id == job.scan_id, ScanHistory.status.in_(('queued', 'scanning'))
+            ).update({'status': 'scanning'}, synchronize_session=False)
+            db.session.commit()
+            if not started:
+                # Cancelled (or deleted) between being queued and claimed
+                complete_job(job.id, self.worker_id)
+                return
+            scan_history = ScanHistory.query.get(job.scan_id)
+            run_scan(
+                scan_history,
+                payload['keywords'],
+                payload['target_urls'],
+                payload.get('deadline_seconds'),
+                payload.get('url_budget_seconds'),
+                payload.get('profile'),
+                payload.get('normalize')
+            )
+            if scan_history.status == 'failed':
+                errors = json.loads(scan_history.errors or '[]')
+                raise RuntimeError(errors[-1] if errors else 'Scan failed')
+        except Exception as e:
+            traceback.print_exc()
+            status = fail_job(job.id, self.worker_id, str(e))
+            print(f"Job {job.id} failed ({status}): {str(e)}")
+        else:
+            if not complete_job(job.id, self.worker_id):
+                print(f"Job {job.id} finished after its lease was taken over")
+        finally:
+            done.set()
+            beat.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run scan jobs from the queue")
+    parser.add_argument('--concurrency', type=int, default=int(os.environ.get('SCAN_WORKER_CONCURRENCY', 1)),
+                        help="Scans run at once by this process")
+    parser.add_argument('--once', action='store_true', help="Exit when the queue is empty")
+    args = parser.parse_args()
+
+    app = create_app()
+    enable_dns_cache()
+    base_id = f"{socket.gethostname()}:{os.getpid()}"
+    workers = [ScanWorker(app, f"{base_id}:{n}", runs_retention=(n == 0)) for n in range(args.concurrency)]
+
+    def stop(signum, frame):
+        print("Stopping after running scans finish...")
+        for worker in workers:
+            worker.stopping.set()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    threads = [threading.Thread(target=worker.run, args=(args.once,)) for worker in workers]
+    for thread in threads:
+        thread.start()
+    while any(thread.is_alive() for thread in threads):
+        time.sleep(0.5)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Memory benchmark for the crawl frontier and seen-url set.
+Compares the old set[str] + duplicate-laden heap with the fingerprint
+frontier and the Bloom filter, reported per 100k urls.
+
+Usage: python bench_frontier.py [num_urls]
+"""
+import random
+import sys
+import tracemalloc
+from heapq import heappush
+
+from crawl_frontier import BloomFilter, FingerprintSet, Frontier
+
+DUPLICATES_PER_URL = 3
+
+
+def make_links(n):
+    # Fresh string objects per discovery, as link extraction produces them
+    rng = random.Random(42)
+    for _ in range(DUPLICATES_PER_URL):
+        for i in range(n):
+            url = f"http://forum.example.onion/thread/{i}/post-{i * 7919 % 10**6}?sid=abcdef"
+            yield rng.randrange(1, 20), rng.randrange(1, 4), url, f"vendor listing thread {i} reply {rng.randrange(100)}"
+
+
+def legacy(links):
+    visited = set()
+    queue = []
+    for score, depth, url, anchor in links:
+        heappush(queue, (-score, depth, url, anchor))
+        visited.add(url)
+    return visited, queue
+
+
+def compact(links, seen):
+    queue = Frontier()
+    for score, depth, url, _anchor in links:
+        queue.push(score, depth, url)
+        seen.add(url)
+    return seen, queue
+
+
+def measure(label, fn, n):
+    tracemalloc.start()
+    result = fn(make_links(n))
+    current, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    per_100k = current * 100_000 / n
+    print(f"{label:<28} {current / 2**20:8.1f} MiB total  {per_100k / 2**20:8.1f} MiB per 100k urls")
+    return result
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    print(f"{n} unique urls, {DUPLICATES_PER_URL} discoveries each")
+    measure("set[str] + heap (legacy)", legacy, n)
+    measure("fingerprints + frontier", lambda links: compact(links, FingerprintSet()), n)
+    measure("bloom(0.1%) + frontier", lambda links: compact(links, BloomFilter(n, 0.001)), n)
+    # Seen-set alone, which is what persists after the frontier drains
+    measure("set[str] only", lambda links: {url for _, _, url, _ in links}, n)
+    measure("fingerprints only", lambda links: FingerprintSet(url for _, _, url, _ in links), n)
+    measure("bloom(0.1%) only", lambda links: BloomFilter(n, 0.001, (url for _, _, url, _ in links)), n)
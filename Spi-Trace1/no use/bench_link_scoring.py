@@ -0,0 +1,107 @@
+"""
+Parity check and benchmark for batch link scoring.
+Scores generated pages of links with both PoliteScraper._score_link /
+_classify_url (one link at a time) and the compiled LinkScoringEngine
+(a page at a time), fails on any difference, then times both on
+token-dense stress pages and on pages shaped like a forum index
+(repeated navigation links, mostly ordinary paths). The batch path wins
+only on the forum-shaped pages; on the token-dense ones it is slower.
+test_link_scoring.py runs the same parity check under pytest.
+
+Usage: python bench_link_scoring.py [pages] [links_per_page]
+"""
+import random
+import sys
+import time
+
+from link_scoring import LinkScoringEngine
+from polite_scraper import PoliteScraper
+
+# Tokens plus near misses, overlaps ("seller"/"sell", "p="/"page=") and case variants
+FRAGMENTS = (
+    PoliteScraper.HIGH_RISK_PATTERNS
+    + PoliteScraper.LOW_VALUE_PATTERNS
+    + ["item", "post", "Vendor", "SHOP", "sel", "pag", "thr", "ead", "/", "-", "?", "&", "=", "é", "İ", "42", "x"]
+)
+
+
+def make_pages(pages, links_per_page, seed=7):
+    rng = random.Random(seed)
+    for _ in range(pages):
+        links = []
+        for _ in range(links_per_page):
+            path = "".join(rng.choice(FRAGMENTS) for _ in range(rng.randrange(1, 7)))
+            anchor = " ".join(rng.choice(FRAGMENTS) for _ in range(rng.randrange(0, 4)))
+            links.append((f"http://forum.example.onion/{path}", anchor))
+        yield links
+
+# Ordinary path words, a few of them tokens, for the forum-shaped pages
+WORDS = ("about news article index blog contact archive 2024 2025 view topic user help "
+         "rules faq login register search latest popular page thread forum market vendor").split()
+
+
+def make_forum_pages(pages, links_per_page, seed=7):
+    rng = random.Random(seed)
+    for _ in range(pages):
+        links = [(f"http://forum.example.onion/{w}", w.title()) for w in rng.sample(WORDS, 20)]
+        for _ in range(links_per_page - len(links)):
+            path = "/".join(rng.choice(WORDS) for _ in range(rng.randrange(1, 4)))
+            anchor = " ".join(rng.choice(WORDS) for _ in range(rng.randrange(1, 5)))
+            links.append((f"http://forum.example.onion/{path}/{rng.randrange(10 ** 6)}", anchor))
+        yield links
+
+
+def time_both(scraper, batches):
+    started = time.perf_counter()
+    for links in batches:
+        [(scraper._score_link(url, anchor), scraper._classify_url(url, anchor)) for url, anchor in links]
+    per_link = time.perf_counter() - started
+
+    scorer = scraper.link_scoring.for_site()
+    started = time.perf_counter()
+    for links in batches:
+        scorer.score_and_classify(links)
+    return per_link, time.perf_counter() - started
+
+
+def check_parity(scraper, pages):
+    scorer = scraper.link_scoring.for_site()
+    checked = 0
+    for links in pages:
+        expected = [(scraper._score_link(url, anchor), scraper._classify_url(url, anchor)) for url, anchor in links]
+        actual = scorer.score_and_classify(links)
+        for link, want, got in zip(links, expected, actual):
+            if want != got:
+                raise AssertionError(f"Mismatch for {link}: per-link {want}, batch {got}")
+        checked += len(links)
+    return checked
+
+
+def check_overrides():
+    engine = LinkScoringEngine(
+        PoliteScraper.HIGH_RISK_PATTERNS,
+        PoliteScraper.LOW_VALUE_PATTERNS,
+        {"special.onion": {"token_weights": {"forum": [10, 0], "escrow": [4, 1]}, "low_value_penalty": -1}},
+    )
+    links = [("http://x/forum/escrow?page=2", "escrow forum")]
+    assert engine.for_site("other.onion").score(links) == [3 + 2 - 5]
+    assert engine.for_site("special.onion").score(links) == [10 + 0 + 4 + 1 - 1]
+    assert engine.for_site("special.onion") is engine.for_site("SPECIAL.onion")
+
+
+if __name__ == "__main__":
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    per_page = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    scraper = PoliteScraper()
+    batches = list(make_pages(pages, per_page))
+
+    forum = list(make_forum_pages(pages, per_page))
+
+    checked = check_parity(scraper, batches) + check_parity(scraper, forum)
+    check_overrides()
+    print(f"parity ok: {checked} links, per-site overrides ok")
+
+    for label, pages_ in (("token-dense", batches), ("forum-shaped", forum)):
+        per_link, batch = time_both(scraper, pages_)
+        print(f"{label:13} per-link loops {per_link * 1000:8.1f} ms  ({per_link / pages * 1000:.2f} ms per page)")
+        print(f"{label:13} compiled batch {batch * 1000:8.1f} ms  ({batch / pages * 1000:.2f} ms per page)")
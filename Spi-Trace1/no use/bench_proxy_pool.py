@@ -0,0 +1,130 @@
+"""
+Local check of the proxy pool against stand-in proxies.
+Starts a few origin sites and four forwarding proxies on 127.0.0.1 (fast,
+slow, flaky and one that is not listening), then fetches pages through
+PoliteScraper with the health-scored pool and with the old random choice,
+reporting failures, time spent and TCP connections opened per proxy.
+
+Usage: python bench_proxy_pool.py [requests]
+"""
+import http.client
+import random
+import socket
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from polite_scraper import PoliteScraper
+
+SITES = 4
+
+
+class Origin(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        if self.path == "/robots.txt":
+            self.send_error(404)
+            return
+        body = f"<html><body>page {self.path}</body></html>".encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def make_proxy(delay=0.0, fail_every=0):
+    connections = Counter()
+    served = Counter()
+
+    class Proxy(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def setup(self):
+            super().setup()
+            connections["opened"] += 1
+
+        def do_GET(self):
+            served["n"] += 1
+            if fail_every and served["n"] % fail_every:
+                # Drop the connection without an answer
+                self.close_connection = True
+                self.connection.shutdown(socket.SHUT_RDWR)
+                return
+            time.sleep(delay)
+            target = urlsplit(self.path)
+            upstream = http.client.HTTPConnection(target.hostname, target.port, timeout=5)
+            upstream.request("GET", target.path or "/")
+            resp = upstream.getresponse()
+            body = resp.read()
+            upstream.close()
+            self.send_response(resp.status)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Proxy, connections
+
+
+def serve(handler):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def unused_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class RandomProxyScraper(PoliteScraper):
+    """The previous behaviour: a random proxy for every request"""
+
+    def _get_proxy(self, url):
+        return random.choice(self.proxies)
+
+
+def run(scraper_cls, urls, proxies):
+    scraper = scraper_cls(requests_per_minute=1e6, timeout=2, proxies=proxies)
+    scraper._respect_rate_limit = lambda url: None
+    started = time.perf_counter()
+    failed = sum(scraper.get(url, use_cache=False) is None for url in urls)
+    return failed, time.perf_counter() - started, scraper
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    origins = [serve(Origin) for _ in range(SITES)]
+    rng = random.Random(3)
+    urls = [f"http://127.0.0.1:{rng.choice(origins).server_port}/thread/{i}" for i in range(count)]
+
+    for label, scraper_cls in (("random choice", RandomProxyScraper), ("health pool", PoliteScraper)):
+        kinds = {"fast": make_proxy(), "slow": make_proxy(delay=0.05), "flaky": make_proxy(fail_every=2)}
+        servers = {name: serve(handler) for name, (handler, _conns) in kinds.items()}
+        proxies = {name: f"http://127.0.0.1:{server.server_port}" for name, server in servers.items()}
+        proxies["dead"] = f"http://127.0.0.1:{unused_port()}"
+
+        failed, elapsed, scraper = run(scraper_cls, urls, list(proxies.values()))
+        opened = ", ".join(f"{name} {conns['opened']}" for name, (_h, conns) in kinds.items())
+        print(f"{label:14} {failed:4d}/{count} failed  {elapsed * 1000:7.0f} ms  connections opened: {opened}")
+        if scraper.proxy_pool is not None and scraper_cls is PoliteScraper:
+            for row in scraper.proxy_pool.snapshot():
+                name = next(n for n, url in proxies.items() if url == row["proxy"])
+                print(f"    {name:6} success {row['success_rate']:.2f}  latency {row['latency_ms'] or '-':>6} ms  "
+                      f"requests {row['requests']:4d}  hosts {len(row['hosts'])}  ejected {row['ejected_for']}")
+        for server in servers.values():
+            server.shutdown()
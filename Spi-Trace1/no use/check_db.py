@@ -1,6 +1,8 @@
-from app import app, db
+from app import create_app, db
 from models import URL, User, ScanHistory
 
+app = create_app()
+
 with app.app_context():
     print("=" * 50)
     print("DATABASE CONTENTS")
@@ -0,0 +1,186 @@
+import hashlib
+import json
+import re
+import sqlite3
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+SIMHASH_BITS = 64
+SHINGLE_SIZE = 3
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def _feature_hash(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash over word shingles of the extracted page text."""
+    tokens = TOKEN_PATTERN.findall(text.lower())
+    if len(tokens) >= SHINGLE_SIZE:
+        features = Counter(
+            " ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)
+        )
+    else:
+        features = Counter(tokens)
+
+    weights = [0] * SIMHASH_BITS
+    for feature, count in features.items():
+        h = _feature_hash(feature)
+        for bit in range(SIMHASH_BITS):
+            if h >> bit & 1:
+                weights[bit] += count
+            else:
+                weights[bit] -= count
+
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def keyword_signature(keywords: Iterable[str]) -> str:
+    """Stable id for a keyword set; cross-scan dedup is only valid for the same set."""
+    normalized = sorted({kw.lower() for kw in keywords if kw})
+    return hashlib.sha1("\n".join(normalized).encode("utf-8")).hexdigest()[:16]
+
+
+class SimHashIndex:
+    """
+    In-memory near-duplicate lookup. Fingerprints are split into
+    `max_distance + 1` bands; by pigeonhole any fingerprint within
+    `max_distance` bits shares at least one band exactly, so only those
+    candidates are compared.
+    """
+
+    def __init__(self, max_distance: int = 3):
+        self.max_distance = max_distance
+        self.num_bands = max_distance + 1
+        self.band_bits = SIMHASH_BITS // self.num_bands
+        self._bands: List[Dict[int, List[Tuple[int, str]]]] = [{} for _ in range(self.num_bands)]
+        self._size = 0
+
+    def _band_keys(self, fingerprint: int) -> List[int]:
+        mask = (1 << self.band_bits) - 1
+        return [(fingerprint >> (i * self.band_bits)) & mask for i in range(self.num_bands)]
+
+    def find(self, fingerprint: int, exclude: Optional[str] = None) -> Optional[str]:
+        """Url of an indexed near-duplicate other than `exclude`, or None."""
+        for band, key in zip(self._bands, self._band_keys(fingerprint)):
+            for candidate, url in band.get(key, ()):
+                if url != exclude and hamming_distance(candidate, fingerprint) <= self.max_distance:
+                    return url
+        return None
+
+    def add(self, fingerprint: int, url: str) -> None:
+        for band, key in zip(self._bands, self._band_keys(fingerprint)):
+            band.setdefault(key, []).append((fingerprint, url))
+        self._size += 1
+
+    def __len__(self) -> int:
+        return self._size
+
+
+class PageFingerprintStore:
+    """
+    SQLite store of analyzed-page fingerprints per (site, keyword set), with
+    the finding each page produced, so near-duplicates are also recognised
+    across separate crawls of a site.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS page_fingerprints (
+        site TEXT NOT NULL,
+        keyword_sig TEXT NOT NULL,
+        url TEXT NOT NULL,
+        simhash INTEGER NOT NULL,
+        seen_at REAL NOT NULL,
+        finding TEXT,
+        PRIMARY KEY (site, keyword_sig, url)
+    );
+    """
+
+    def __init__(self, path: str = "page_fingerprints.db"):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(self.SCHEMA)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(page_fingerprints)")}
+        if "finding" not in columns:
+            # Stores written before findings were kept; their pages are analyzed again once
+            self.conn.execute("DELETE FROM page_fingerprints")
+            self.conn.execute("ALTER TABLE page_fingerprints ADD COLUMN finding TEXT")
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def load(self, site: str, keyword_sig: str) -> List[Tuple[int, str, Optional[dict]]]:
+        # SQLite integers are signed 64-bit, so fingerprints are stored two's-complement.
+        return [
+            (simhash_value & (2**SIMHASH_BITS - 1), url, json.loads(finding) if finding else None)
+            for simhash_value, url, finding in self.conn.execute(
+                "SELECT simhash, url, finding FROM page_fingerprints WHERE site = ? AND keyword_sig = ?",
+                (site, keyword_sig),
+            )
+        ]
+
+    def add(self, site: str, keyword_sig: str, url: str, fingerprint: int, finding: Optional[dict] = None) -> None:
+        signed = fingerprint - 2**SIMHASH_BITS if fingerprint >= 2**(SIMHASH_BITS - 1) else fingerprint
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO page_fingerprints (site, keyword_sig, url, simhash, seen_at, finding) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (site, keyword_sig, url, signed, time.time(), json.dumps(finding) if finding else None),
+            )
+
+
+class NearDuplicateFilter:
+    """
+    Per-crawl near-duplicate detector. Seeds itself from the store with the
+    pages analyzed by earlier crawls of the same site and keyword set, and
+    records every page analyzed during this crawl along with its finding,
+    which is what a near-duplicate of that page reports instead of being
+    analyzed. A page is never a duplicate of its own url, so re-crawled
+    pages are always analyzed again.
+    """
+
+    def __init__(
+        self,
+        site: str,
+        keywords: Iterable[str],
+        max_distance: int = 3,
+        store: Optional[PageFingerprintStore] = None,
+    ):
+        self.site = site
+        self.keyword_sig = keyword_signature(keywords)
+        self.index = SimHashIndex(max_distance)
+        self.store = store
+        self.skipped = 0
+        self.findings: Dict[str, Optional[dict]] = {}
+        if store is not None:
+            for fingerprint, url, finding in store.load(site, self.keyword_sig):
+                self.index.add(fingerprint, url)
+                self.findings[url] = finding
+
+    def match(self, url: str, text: str) -> Tuple[int, Optional[str]]:
+        """(fingerprint, another already analyzed url that is a near-duplicate, or None)."""
+        fingerprint = simhash(text)
+        return fingerprint, self.index.find(fingerprint, exclude=url)
+
+    def finding_of(self, url: str) -> Optional[dict]:
+        """The finding recorded for an analyzed url (None if it had none)."""
+        return self.findings.get(url)
+
+    def add(self, url: str, fingerprint: int, finding: Optional[dict] = None) -> None:
+        self.index.add(fingerprint, url)
+        self.findings[url] = finding
+        if self.store is not None:
+            self.store.add(self.site, self.keyword_sig, url, fingerprint, finding)
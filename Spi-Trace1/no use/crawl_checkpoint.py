@@ -0,0 +1,233 @@
+import json
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+FrontierEntry = Tuple[int, int, str]
+
+
+@dataclass
+class CrawlState:
+    crawl_id: str
+    site: str
+    keywords: List[str]
+    max_pages: int
+    min_priority_to_expand: int
+    status: str
+    seeded: bool
+    pages_scanned: int
+    near_duplicates_skipped: int
+    host_timers: Dict[str, float]
+    visited: Set[str]
+    frontier: List[FrontierEntry]
+    findings: List[dict]
+
+
+class CrawlCheckpointStore:
+    """
+    SQLite-backed checkpoint journal for PoliteScraper crawls.
+    Every processed page is committed in a single transaction together with
+    the links it pushed, so a crawl killed mid-run resumes from the last
+    finished page instead of the home page.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS crawls (
+        id TEXT PRIMARY KEY,
+        site TEXT NOT NULL,
+        keywords TEXT NOT NULL,
+        max_pages INTEGER NOT NULL,
+        min_priority_to_expand INTEGER NOT NULL,
+        status TEXT NOT NULL DEFAULT 'running',
+        seeded INTEGER NOT NULL DEFAULT 0,
+        pages_scanned INTEGER NOT NULL DEFAULT 0,
+        near_duplicates_skipped INTEGER NOT NULL DEFAULT 0,
+        host_timers TEXT NOT NULL DEFAULT '{}',
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS crawl_frontier (
+        crawl_id TEXT NOT NULL,
+        neg_score INTEGER NOT NULL,
+        depth INTEGER NOT NULL,
+        url TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS ix_crawl_frontier_url ON crawl_frontier (crawl_id, url);
+    CREATE TABLE IF NOT EXISTS crawl_visited (
+        crawl_id TEXT NOT NULL,
+        url TEXT NOT NULL,
+        PRIMARY KEY (crawl_id, url)
+    );
+    CREATE TABLE IF NOT EXISTS crawl_findings (
+        crawl_id TEXT NOT NULL,
+        seq INTEGER NOT NULL,
+        finding TEXT NOT NULL,
+        PRIMARY KEY (crawl_id, seq)
+    );
+    """
+
+    def __init__(self, path: str = "crawl_checkpoints.db"):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def start(
+        self,
+        crawl_id: str,
+        site: str,
+        keywords: List[str],
+        max_pages: int,
+        min_priority_to_expand: int,
+    ) -> None:
+        now = time.time()
+        with self.conn:
+            self._clear(crawl_id)
+            self.conn.execute(
+                "INSERT INTO crawls (id, site, keywords, max_pages, min_priority_to_expand, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (crawl_id, site, json.dumps(keywords), max_pages, min_priority_to_expand, now, now),
+            )
+
+    def record_seed(
+        self,
+        crawl_id: str,
+        finding: Optional[dict],
+        entries: Iterable[FrontierEntry],
+        host_timers: Dict[str, float],
+    ) -> None:
+        with self.conn:
+            if finding is not None:
+                self._add_finding(crawl_id, finding)
+            self._push(crawl_id, entries)
+            self.conn.execute(
+                "UPDATE crawls SET seeded = 1, host_timers = ?, updated_at = ? WHERE id = ?",
+                (json.dumps(host_timers), time.time(), crawl_id),
+            )
+
+    def record_page(
+        self,
+        crawl_id: str,
+        url: str,
+        finding: Optional[dict],
+        entries: Iterable[FrontierEntry],
+        pages_scanned: int,
+        host_timers: Dict[str, float],
+        near_duplicates_skipped: int = 0,
+    ) -> None:
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO crawl_visited (crawl_id, url) VALUES (?, ?)",
+                (crawl_id, url),
+            )
+            self.conn.execute(
+                "DELETE FROM crawl_frontier WHERE crawl_id = ? AND url = ?",
+                (crawl_id, url),
+            )
+            if finding is not None:
+                self._add_finding(crawl_id, finding)
+            self._push(crawl_id, entries)
+            self.conn.execute(
+                "UPDATE crawls SET pages_scanned = ?, near_duplicates_skipped = ?, host_timers = ?, updated_at = ? "
+                "WHERE id = ?",
+                (pages_scanned, near_duplicates_skipped, json.dumps(host_timers), time.time(), crawl_id),
+            )
+
+    def finish(self, crawl_id: str, status: str = "complete") -> None:
+        with self.conn:
+            self.conn.execute(
+                "UPDATE crawls SET status = ?, updated_at = ? WHERE id = ?",
+                (status, time.time(), crawl_id),
+            )
+            self.conn.execute("DELETE FROM crawl_frontier WHERE crawl_id = ?", (crawl_id,))
+
+    def load(self, crawl_id: str) -> Optional[CrawlState]:
+        row = self.conn.execute(
+            "SELECT site, keywords, max_pages, min_priority_to_expand, status, seeded, pages_scanned, "
+            "near_duplicates_skipped, host_timers FROM crawls WHERE id = ?",
+            (crawl_id,),
+        ).fetchone()
+        if row is None:
+            return None
+
+        visited = {
+            url for (url,) in self.conn.execute(
+                "SELECT url FROM crawl_visited WHERE crawl_id = ?", (crawl_id,)
+            )
+        }
+        # Rows are only pruned when their url is visited, so entries that were
+        # popped but never finished (the page in flight at crash time) come back.
+        frontier = [
+            (neg_score, depth, url)
+            for neg_score, depth, url in self.conn.execute(
+                "SELECT neg_score, depth, url FROM crawl_frontier WHERE crawl_id = ?",
+                (crawl_id,),
+            )
+            if url not in visited
+        ]
+        findings = [
+            json.loads(finding) for (finding,) in self.conn.execute(
+                "SELECT finding FROM crawl_findings WHERE crawl_id = ? ORDER BY seq", (crawl_id,)
+            )
+        ]
+
+        return CrawlState(
+            crawl_id=crawl_id,
+            site=row[0],
+            keywords=json.loads(row[1]),
+            max_pages=row[2],
+            min_priority_to_expand=row[3],
+            status=row[4],
+            seeded=bool(row[5]),
+            pages_scanned=row[6],
+            near_duplicates_skipped=row[7],
+            host_timers=json.loads(row[8]),
+            visited=visited,
+            frontier=frontier,
+            findings=findings,
+        )
+
+    def list_crawls(self, status: Optional[str] = None) -> List[Dict[str, object]]:
+        query = "SELECT id, site, status, pages_scanned, updated_at FROM crawls"
+        params: Tuple = ()
+        if status:
+            query += " WHERE status = ?"
+            params = (status,)
+        query += " ORDER BY updated_at DESC"
+        return [
+            {"id": r[0], "site": r[1], "status": r[2], "pages_scanned": r[3], "updated_at": r[4]}
+            for r in self.conn.execute(query, params)
+        ]
+
+    def delete(self, crawl_id: str) -> None:
+        with self.conn:
+            self._clear(crawl_id)
+
+    def _clear(self, crawl_id: str) -> None:
+        for table, column in (
+            ("crawls", "id"),
+            ("crawl_frontier", "crawl_id"),
+            ("crawl_visited", "crawl_id"),
+            ("crawl_findings", "crawl_id"),
+        ):
+            self.conn.execute(f"DELETE FROM {table} WHERE {column} = ?", (crawl_id,))
+
+    def _push(self, crawl_id: str, entries: Iterable[FrontierEntry]) -> None:
+        self.conn.executemany(
+            "INSERT INTO crawl_frontier (crawl_id, neg_score, depth, url) VALUES (?, ?, ?, ?)",
+            [(crawl_id, neg_score, depth, url) for neg_score, depth, url in entries],
+        )
+
+    def _add_finding(self, crawl_id: str, finding: dict) -> None:
+        self.conn.execute(
+            "INSERT INTO crawl_findings (crawl_id, seq, finding) "
+            "VALUES (?, (SELECT COUNT(*) FROM crawl_findings WHERE crawl_id = ?), ?)",
+            (crawl_id, crawl_id, json.dumps(finding)),
+        )
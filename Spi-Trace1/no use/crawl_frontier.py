@@ -0,0 +1,134 @@
+import hashlib
+import math
+from heapq import heappop, heappush
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+FrontierEntry = Tuple[int, int, str]
+
+
+def _pack(neg_score: int, depth: int) -> int:
+    # Orders exactly like the (neg_score, depth) tuple for depths below 2**16
+    return (neg_score << 16) | depth
+
+
+def url_fingerprint(url: str) -> int:
+    """64-bit fingerprint of a normalized url."""
+    return int.from_bytes(hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class FingerprintSet:
+    """
+    Exact seen-url set that keeps 64-bit fingerprints instead of url strings.
+    Collisions are possible in theory but negligible below billions of urls.
+    """
+
+    def __init__(self, urls: Iterable[str] = ()):
+        self._seen = set()
+        for url in urls:
+            self.add(url)
+
+    def add(self, url: str) -> None:
+        self._seen.add(url_fingerprint(url))
+
+    def __contains__(self, url: str) -> bool:
+        return url_fingerprint(url) in self._seen
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+
+class BloomFilter:
+    """
+    Fixed-size seen-url filter for very large crawls.
+    False positives (an unseen url reported as seen) happen at roughly
+    `error_rate`; such urls are simply never crawled. There are no false
+    negatives, so no page is fetched twice.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001, urls: Iterable[str] = ()):
+        capacity = max(1, capacity)
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self._count = 0
+        for url in urls:
+            self.add(url)
+
+    def _positions(self, url: str) -> Iterator[int]:
+        digest = hashlib.blake2b(url.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:], "big") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, url: str) -> None:
+        new = False
+        for pos in self._positions(url):
+            byte, bit = divmod(pos, 8)
+            if not self._bits[byte] & (1 << bit):
+                self._bits[byte] |= 1 << bit
+                new = True
+        if new:
+            self._count += 1
+
+    def __contains__(self, url: str) -> bool:
+        for pos in self._positions(url):
+            byte, bit = divmod(pos, 8)
+            if not self._bits[byte] & (1 << bit):
+                return False
+        return True
+
+    def __len__(self) -> int:
+        return self._count
+
+
+class Frontier:
+    """
+    Priority frontier with push-time dedup and decrease-key.
+    Each url is queued at most once with its best (score, depth); pushing a
+    better key for a queued url supersedes the old heap entry, which is
+    dropped lazily when it surfaces. Anchor text is not kept - it is only
+    needed to score the link. Pop order matches a heap of every pushed
+    (-score, depth, url) tuple with later duplicates skipped.
+    """
+
+    def __init__(self):
+        self._heap: List[FrontierEntry] = []
+        # fingerprint -> packed (neg_score, depth); one int instead of a tuple
+        self._best: Dict[int, int] = {}
+
+    def push(self, score: int, depth: int, url: str, seen=None) -> bool:
+        """Queue url; returns True if the frontier changed."""
+        if seen is not None and url in seen:
+            return False
+        key = _pack(-score, depth)
+        fingerprint = url_fingerprint(url)
+        current = self._best.get(fingerprint)
+        if current is not None and current <= key:
+            return False
+        self._best[fingerprint] = key
+        heappush(self._heap, (-score, depth, url))
+        return True
+
+    def pop(self) -> Optional[FrontierEntry]:
+        while self._heap:
+            neg_score, depth, url = heappop(self._heap)
+            fingerprint = url_fingerprint(url)
+            if self._best.get(fingerprint) != _pack(neg_score, depth):
+                continue
+            del self._best[fingerprint]
+            return neg_score, depth, url
+        return None
+
+    def entries(self) -> List[FrontierEntry]:
+        return [
+            entry for entry in self._heap
+            if self._best.get(url_fingerprint(entry[2])) == _pack(entry[0], entry[1])
+        ]
+
+    def __len__(self) -> int:
+        return len(self._best)
+
+    def __bool__(self) -> bool:
+        return bool(self._best)
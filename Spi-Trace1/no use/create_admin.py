@@ -1,7 +1,9 @@
-from app import app
+from app import create_app
 from models import db, User
 import bcrypt
 
+app = create_app()
+
 def create_admin():
     with app.app_context():
         email = "admin@darkwatch.com"
@@ -2,16 +2,24 @@ import csv
 import json
 import random
 import re
+import sys
 import time
+import uuid
 from dataclasses import dataclass, asdict
-from heapq import heappop, heappush
-from typing import Dict, Iterable, List, Optional, Set, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
 from urllib.parse import urljoin, urlparse, urlunparse
 from urllib.robotparser import RobotFileParser
 
 import requests
 from bs4 import BeautifulSoup
 
+from crawl_checkpoint import CrawlCheckpointStore
+from content_fingerprint import NearDuplicateFilter, PageFingerprintStore
+from crawl_frontier import BloomFilter, FingerprintSet, Frontier
+from link_scoring import LinkScoringEngine
+from proxy_pool import ProxyPool
+from result_export import FindingWriter, NDJSONFindingWriter
+
 
 @dataclass
 class PageFinding:
@@ -26,6 +34,8 @@ class CrawlReport:
     site: str
     found: bool
     findings: List[PageFinding]
+    crawl_id: Optional[str] = None
+    near_duplicates_skipped: int = 0
 
 
 class PoliteScraper:
@@ -35,6 +45,7 @@ class PoliteScraper:
     - Discovery layer from home page links
     - Respects robots.txt and rate limits
     - Avoids bypassing login/captcha/restricted content
+    - Optionally checkpoints crawl state so a crawl can be resumed by id
     """
 
     HIGH_RISK_PATTERNS = [
@@ -98,32 +109,80 @@ class PoliteScraper:
         requests_per_minute: float = 3.0,
         timeout: int = 12,
         proxies: Optional[List[str]] = None,
+        checkpoints: Optional[CrawlCheckpointStore] = None,
+        bloom_capacity: Optional[int] = None,
+        bloom_error_rate: float = 0.001,
+        near_duplicate_distance: Optional[int] = None,
+        fingerprints: Optional[PageFingerprintStore] = None,
+        skip_near_duplicate_links: bool = False,
+        link_weights_path: Optional[str] = None,
+        proxy_probe_url: Optional[str] = None,
     ):
         self.session = requests.Session()
         self.session.headers.update({"User-Agent": user_agent})
         self.timeout = timeout
 
+        # The rate limit applies per host: netloc -> time of its last request
         self.request_interval = 60.0 / max(0.1, requests_per_minute)
-        self.last_request_time = 0.0
+        self.last_request_times: Dict[str, float] = {}
 
         self.cache: Dict[str, Tuple[float, str]] = {}
         self.proxies = proxies or []
+        # Proxies are picked by health and kept per host (see proxy_pool); an
+        # ejected proxy is re-admitted once a fetch of proxy_probe_url through
+        # it succeeds, or simply after its backoff when no probe url is set.
+        self.proxy_probe_url = proxy_probe_url
+        self.proxy_pool = (
+            ProxyPool(self.proxies, probe=self._probe_proxy if proxy_probe_url else None) if self.proxies else None
+        )
         self.robots: Dict[str, RobotFileParser] = {}
+        self.checkpoints = checkpoints
+        # Seen urls are kept as 64-bit fingerprints; a Bloom filter trades a
+        # small miss rate for a fixed memory ceiling on very large crawls.
+        self.bloom_capacity = bloom_capacity
+        self.bloom_error_rate = bloom_error_rate
+        # Opt-in: pages whose SimHash is within `near_duplicate_distance` bits
+        # of an already analyzed page skip keyword/leak analysis and report
+        # that page's finding under their own url (None, the default, disables).
+        self.near_duplicate_distance = near_duplicate_distance
+        self.fingerprints = fingerprints
+        self.skip_near_duplicate_links = skip_near_duplicate_links
+        # Links are scored a page at a time by a compiled matcher; per-site
+        # weight overrides come from an optional JSON file (see link_scoring).
+        if link_weights_path:
+            self.link_scoring = LinkScoringEngine.from_config_file(
+                link_weights_path, self.HIGH_RISK_PATTERNS, self.LOW_VALUE_PATTERNS
+            )
+        else:
+            self.link_scoring = LinkScoringEngine(self.HIGH_RISK_PATTERNS, self.LOW_VALUE_PATTERNS)
 
-    def _respect_rate_limit(self) -> None:
+    def _respect_rate_limit(self, url: str) -> None:
+        host = urlparse(url).netloc.lower()
         now = time.time()
-        elapsed = now - self.last_request_time
+        elapsed = now - self.last_request_times.get(host, 0.0)
         if elapsed < self.request_interval:
             sleep_time = self.request_interval - elapsed + random.uniform(0.3, 1.2)
-            print(f"Rate limiting - sleeping {sleep_time:.2f} seconds")
+            print(f"Rate limiting {host} - sleeping {sleep_time:.2f} seconds")
             time.sleep(sleep_time)
-        self.last_request_time = time.time()
+        self.last_request_times[host] = time.time()
 
-    def _get_proxy(self) -> Optional[Dict[str, str]]:
-        if not self.proxies:
+    def _get_proxy(self, url: str) -> Optional[str]:
+        if self.proxy_pool is None:
             return None
-        proxy = random.choice(self.proxies)
-        return {"http": proxy, "https": proxy}
+        return self.proxy_pool.choose(urlparse(url).netloc.lower())
+
+    def _probe_proxy(self, proxy: str) -> bool:
+        try:
+            resp = requests.get(
+                self.proxy_probe_url,
+                timeout=self.timeout,
+                proxies={"http": proxy, "https": proxy},
+                headers={"User-Agent": self.session.headers.get("User-Agent", "")},
+            )
+            return resp.status_code < 500
+        except requests.RequestException as exc:
+            print(f"Proxy probe failed: {proxy} -> {exc}")
+            return False
 
     def _get_robot_parser(self, url: str) -> RobotFileParser:
         parsed = urlparse(url)
@@ -194,6 +253,13 @@ class PoliteScraper:
 
         return score
 
+    def _score_links(self, links: List[Tuple[str, str]], page_url: str) -> List[Tuple[int, str]]:
+        """(score, normalized url) for each of a page's (url, anchor) links, in one batch"""
+        normalized = [self._normalize_url(link) for link, _anchor in links]
+        scorer = self.link_scoring.for_site(urlparse(page_url).netloc)
+        scores = scorer.score([(url, anchor) for url, (_link, anchor) in zip(normalized, links)])
+        return list(zip(scores, normalized))
+
     def _detect_leak_signals(self, text: str) -> Dict[str, int]:
         leak_signals: Dict[str, int] = {}
 
@@ -241,20 +307,30 @@ class PoliteScraper:
             print(f"Skipping low-value url: {url}")
             return None
 
-        self._respect_rate_limit()
+        self._respect_rate_limit(url)
 
+        proxy = self._get_proxy(url)
+        started = time.monotonic()
         try:
             resp = self.session.get(
                 url,
                 allow_redirects=True,
                 timeout=self.timeout,
-                proxies=self._get_proxy(),
+                proxies={"http": proxy, "https": proxy} if proxy else None,
             )
+            if proxy:
+                # An error status still came back through the proxy
+                self.proxy_pool.record_success(proxy, time.monotonic() - started)
             resp.raise_for_status()
             html = resp.text
             self.cache[url] = (time.time(), html)
             return html
+        except requests.HTTPError as exc:
+            print(f"Request failed: {url} -> {exc}")
+            return None
         except requests.RequestException as exc:
+            if proxy:
+                self.proxy_pool.record_failure(proxy, str(exc))
             print(f"Request failed: {url} -> {exc}")
             return None
 
@@ -272,9 +348,15 @@ class PoliteScraper:
 
         return links
 
-    def _analyze_page(self, url: str, html: str, keywords: List[str]) -> PageFinding:
+    def _parse_page(self, html: str) -> Tuple[BeautifulSoup, str]:
         soup = BeautifulSoup(html, "html.parser")
-        text = soup.get_text(separator=" ", strip=True)
+        return soup, soup.get_text(separator=" ", strip=True)
+
+    def _analyze_page(self, url: str, html: str, keywords: List[str]) -> PageFinding:
+        soup, text = self._parse_page(html)
+        return self._analyze_parsed(url, soup, text, keywords)
+
+    def _analyze_parsed(self, url: str, soup: BeautifulSoup, text: str, keywords: List[str]) -> PageFinding:
         lowered = text.lower()
 
         found_keywords = []
@@ -303,69 +385,227 @@ class PoliteScraper:
         keywords: List[str],
         max_pages: int = 80,
         min_priority_to_expand: int = 3,
+        crawl_id: Optional[str] = None,
+        sink: Optional[FindingWriter] = None,
     ) -> CrawlReport:
+        """Crawl from the home page; each finding is also written to sink (see result_export) as it is found."""
         parsed = urlparse(start_url)
         home_url = f"{parsed.scheme}://{parsed.netloc}"
 
-        visited: Set[str] = set()
+        if self.checkpoints is not None:
+            crawl_id = crawl_id or uuid.uuid4().hex
+            self.checkpoints.start(crawl_id, home_url, keywords, max_pages, min_priority_to_expand)
+            print(f"Checkpointing crawl {crawl_id}")
+
+        visited = self._new_seen_set()
         findings: List[PageFinding] = []
+        dedup = self._new_dedup(home_url, keywords)
 
         # Home page discovery layer
         home_html = self.get(home_url)
         if not home_html:
-            return CrawlReport(site=home_url, found=False, findings=[])
+            if self.checkpoints is not None:
+                self.checkpoints.finish(crawl_id, status="failed")
+            return CrawlReport(site=home_url, found=False, findings=[], crawl_id=crawl_id)
 
-        home_finding = self._analyze_page(home_url, home_html, keywords)
-        if home_finding.leak_signals:
+        # The home page is always expanded, even when its content is unchanged
+        home_finding, _ = self._analyze_unique(home_url, home_html, keywords, dedup)
+        if home_finding and home_finding.leak_signals:
             findings.append(home_finding)
+            if sink is not None:
+                sink.write(home_url, home_finding)
 
         links = self._extract_links(home_html, home_url)
-        queue: List[Tuple[int, int, str, str]] = []
+        queue = Frontier()
 
-        for link, anchor in links:
-            normalized = self._normalize_url(link)
-            score = self._score_link(normalized, anchor)
+        for score, normalized in self._score_links(links, home_url):
             if score <= 0:
                 continue
-            heappush(queue, (-score, 1, normalized, anchor))
+            queue.push(score, 1, normalized)
+
+        if self.checkpoints is not None:
+            self.checkpoints.record_seed(
+                crawl_id,
+                asdict(home_finding) if home_finding and home_finding.leak_signals else None,
+                queue.entries(),
+                self._host_timers(),
+            )
 
-        pages_scanned = 0
-        while queue and pages_scanned < max_pages:
-            neg_score, depth, url, anchor = heappop(queue)
-            score = -neg_score
-            if url in visited:
-                continue
-            visited.add(url)
+        return self._drain_frontier(
+            home_url, keywords, queue, visited, findings, 0, max_pages, min_priority_to_expand, crawl_id, dedup, sink
+        )
 
-            html = self.get(url)
-            if not html:
-                continue
+    def resume_crawl(self, crawl_id: str, sink: Optional[FindingWriter] = None) -> CrawlReport:
+        """Continue a checkpointed crawl; findings from before the interruption are written to sink first."""
+
+        if self.checkpoints is None:
+            raise ValueError("resume_crawl requires a checkpoint store")
+
+        state = self.checkpoints.load(crawl_id)
+        if state is None:
+            raise KeyError(f"Unknown crawl id: {crawl_id}")
+
+        findings = [PageFinding(**finding) for finding in state.findings]
+        if sink is not None:
+            for finding in findings:
+                sink.write(state.site, finding)
+        if state.status != "running":
+            found = any(finding.leak_signals for finding in findings)
+            return CrawlReport(
+                site=state.site,
+                found=found,
+                findings=findings,
+                crawl_id=crawl_id,
+                near_duplicates_skipped=state.near_duplicates_skipped,
+            )
 
-            page_finding = self._analyze_page(url, html, keywords)
-            if page_finding.leak_signals:
-                findings.append(page_finding)
+        if not state.seeded:
+            # Died before the home page was processed; nothing worth keeping.
+            return self.crawl(
+                state.site, state.keywords, state.max_pages, state.min_priority_to_expand, crawl_id=crawl_id, sink=sink
+            )
 
-            pages_scanned += 1
+        # Carry the previous process's request timestamps forward so the
+        # restarted crawl still honours the rate limit.
+        for host, last_request in state.host_timers.items():
+            self.last_request_times[host] = max(self.last_request_times.get(host, 0.0), last_request)
+
+        visited = self._new_seen_set(state.visited)
+        dedup = self._new_dedup(state.site, state.keywords)
+        if dedup is not None:
+            dedup.skipped = state.near_duplicates_skipped
+        queue = Frontier()
+        for neg_score, depth, url in state.frontier:
+            queue.push(-neg_score, depth, url, seen=visited)
+        print(
+            f"Resuming crawl {crawl_id}: {state.pages_scanned} page(s) done, "
+            f"{len(state.visited)} visited, {len(queue)} queued"
+        )
+        return self._drain_frontier(
+            state.site,
+            state.keywords,
+            queue,
+            visited,
+            findings,
+            state.pages_scanned,
+            state.max_pages,
+            state.min_priority_to_expand,
+            crawl_id,
+            dedup,
+            sink,
+        )
 
-            # Only expand if this is a high-priority path or leak signals exist
-            should_expand = score >= min_priority_to_expand or bool(page_finding.leak_signals)
-            if not should_expand:
-                continue
+    def _new_seen_set(self, urls: Iterable[str] = ()):
+        if self.bloom_capacity:
+            return BloomFilter(self.bloom_capacity, self.bloom_error_rate, urls)
+        return FingerprintSet(urls)
 
-            # Dynamic depth: deeper for higher scores
-            max_depth = 2 if score < 5 else 3
-            if depth >= max_depth:
+    def _new_dedup(self, site: str, keywords: List[str]) -> Optional[NearDuplicateFilter]:
+        if self.near_duplicate_distance is None:
+            return None
+        return NearDuplicateFilter(site, keywords, self.near_duplicate_distance, self.fingerprints)
+
+    def _analyze_unique(
+        self, url: str, html: str, keywords: List[str], dedup: Optional[NearDuplicateFilter]
+    ) -> Tuple[Optional[PageFinding], bool]:
+        """
+        Analyze a page unless it is a near-duplicate, in which case the
+        duplicated page's finding is reported for this url; returns
+        (finding, is_duplicate).
+        """
+        soup, text = self._parse_page(html)
+        if dedup is None:
+            return self._analyze_parsed(url, soup, text, keywords), False
+
+        fingerprint, duplicate_of = dedup.match(url, text)
+        if duplicate_of is not None:
+            dedup.skipped += 1
+            print(f"Near-duplicate of {duplicate_of}, skipping analysis: {url}")
+            original = dedup.finding_of(duplicate_of)
+            return (PageFinding(**{**original, "url": url}) if original else None), True
+
+        finding = self._analyze_parsed(url, soup, text, keywords)
+        dedup.add(url, fingerprint, asdict(finding))
+        return finding, False
+
+    def _host_timers(self) -> Dict[str, float]:
+        return dict(self.last_request_times)
+
+    def _drain_frontier(
+        self,
+        home_url: str,
+        keywords: List[str],
+        queue: Frontier,
+        visited,
+        findings: List[PageFinding],
+        pages_scanned: int,
+        max_pages: int,
+        min_priority_to_expand: int,
+        crawl_id: Optional[str],
+        dedup: Optional[NearDuplicateFilter] = None,
+        sink: Optional[FindingWriter] = None,
+    ) -> CrawlReport:
+        while queue and pages_scanned < max_pages:
+            neg_score, depth, url = queue.pop()
+            score = -neg_score
+            if url in visited:
                 continue
+            visited.add(url)
 
-            for child_url, child_anchor in self._extract_links(html, url):
-                normalized = self._normalize_url(child_url)
-                child_score = self._score_link(normalized, child_anchor)
-                if child_score <= 0:
-                    continue
-                heappush(queue, (-child_score, depth + 1, normalized, child_anchor))
+            page_finding: Optional[PageFinding] = None
+            pushed: List[Tuple[int, int, str]] = []
+
+            html = self.get(url)
+            if html:
+                page_finding, duplicate = self._analyze_unique(url, html, keywords, dedup)
+                if page_finding and page_finding.leak_signals:
+                    findings.append(page_finding)
+                    if sink is not None:
+                        sink.write(home_url, page_finding)
+
+                pages_scanned += 1
+
+                # Only expand if this is a high-priority path or leak signals exist
+                should_expand = score >= min_priority_to_expand or bool(page_finding and page_finding.leak_signals)
+                if duplicate and self.skip_near_duplicate_links:
+                    should_expand = False
+
+                # Dynamic depth: deeper for higher scores
+                max_depth = 2 if score < 5 else 3
+
+                if should_expand and depth < max_depth:
+                    for child_score, normalized in self._score_links(self._extract_links(html, url), url):
+                        if child_score <= 0:
+                            continue
+                        if queue.push(child_score, depth + 1, normalized, seen=visited):
+                            pushed.append((-child_score, depth + 1, normalized))
+
+            if self.checkpoints is not None:
+                self.checkpoints.record_page(
+                    crawl_id,
+                    url,
+                    asdict(page_finding) if page_finding and page_finding.leak_signals else None,
+                    pushed,
+                    pages_scanned,
+                    self._host_timers(),
+                    dedup.skipped if dedup else 0,
+                )
+
+        if self.checkpoints is not None:
+            self.checkpoints.finish(crawl_id)
+
+        skipped = dedup.skipped if dedup else 0
+        if skipped:
+            print(f"Skipped analysis of {skipped} near-duplicate page(s)")
 
         found = any(finding.leak_signals for finding in findings)
-        return CrawlReport(site=home_url, found=found, findings=findings)
+        return CrawlReport(
+            site=home_url,
+            found=found,
+            findings=findings,
+            crawl_id=crawl_id,
+            near_duplicates_skipped=skipped,
+        )
 
     def save_results_to_csv(self, report: CrawlReport, csv_path: str) -> None:
         with open(csv_path, "w", newline="", encoding="utf-8") as f:
@@ -382,13 +622,13 @@ class PoliteScraper:
                 ])
 
     def save_results_to_json(self, report: CrawlReport, json_path: str) -> None:
-        payload = {
-            "site": report.site,
-            "found": report.found,
-            "findings": [asdict(finding) for finding in report.findings],
-        }
+        # Same document as json.dump(..., indent=2), written a finding at a time
         with open(json_path, "w", encoding="utf-8") as f:
-            json.dump(payload, f, indent=2)
+            f.write(f'{{\n  "site": {json.dumps(report.site)},\n  "found": {json.dumps(report.found)},\n  "findings": [')
+            for i, finding in enumerate(report.findings):
+                item = json.dumps(asdict(finding), indent=2).replace("\n", "\n    ")
+                f.write(f'{"," if i else ""}\n    {item}')
+            f.write("\n  ]\n}" if report.findings else "]\n}")
 
 
 if __name__ == "__main__":
@@ -399,9 +639,19 @@ if __name__ == "__main__":
         user_agent="MyResearchProject/0.1 (your.email@example.com)",
         requests_per_minute=2.0,
         proxies=[],
+        checkpoints=CrawlCheckpointStore("crawl_checkpoints.db"),
     )
 
-    report = scraper.crawl(start_url=START_URL, keywords=KEYWORDS)
+    # Pass a crawl id to pick up an interrupted crawl where it left off
+    resume_id = sys.argv[1] if len(sys.argv) > 1 else None
+    # Findings land in scan_results.ndjson as they are found, even if the crawl is interrupted
+    with NDJSONFindingWriter("scan_results.ndjson") as sink:
+        if resume_id:
+            report = scraper.resume_crawl(resume_id, sink=sink)
+        else:
+            report = scraper.crawl(start_url=START_URL, keywords=KEYWORDS, sink=sink)
+    print(f"Crawl id: {report.crawl_id}")
+    print(f"Near-duplicate pages skipped: {report.near_duplicates_skipped}")
     if report.found:
         print("FOUND")
     else:
@@ -414,4 +664,4 @@ if __name__ == "__main__":
 
     scraper.save_results_to_csv(report, "scan_results.csv")
     scraper.save_results_to_json(report, "scan_results.json")
-    print("Saved results to scan_results.csv and scan_results.json")
+    print("Saved results to scan_results.ndjson, scan_results.csv and scan_results.json")
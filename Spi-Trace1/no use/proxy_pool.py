@@ -0,0 +1,184 @@
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Smoothing for the success-rate and latency moving averages
+EWMA_ALPHA = 0.2
+# Consecutive failures, or a success rate below MIN_SUCCESS_RATE after
+# MIN_SAMPLES requests, eject a proxy until it passes a probe
+EJECT_AFTER_FAILURES = 3
+MIN_SUCCESS_RATE = 0.5
+MIN_SAMPLES = 10
+# Wait before re-probing an ejected proxy, doubled per failed probe
+BASE_EJECT_SECONDS = 30.0
+MAX_EJECT_SECONDS = 600.0
+# Successes in a row after which a re-admitted proxy's backoff starts over
+FORGIVE_AFTER_SUCCESSES = 20
+
+
+@dataclass
+class ProxyStats:
+    url: str
+    success_rate: float = 1.0
+    latency: Optional[float] = None
+    requests: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    consecutive_successes: int = 0
+    ejections: int = 0
+    ejected_until: Optional[float] = None
+    probing: bool = False
+    last_error: Optional[str] = None
+    hosts: List[str] = field(default_factory=list)
+
+    @property
+    def ejected(self) -> bool:
+        return self.ejected_until is not None
+
+    def rank(self) -> Tuple[bool, float]:
+        # Untried proxies first, then fast and reliable ones; the host count
+        # spreads new hosts out
+        if self.latency is None:
+            return True, -len(self.hosts)
+        return False, self.success_rate / (max(self.latency, 0.01) * (1 + len(self.hosts)))
+
+
+class ProxyPool:
+    """
+    Proxy selection for PoliteScraper by measured health, with sticky
+    per-host assignment.
+
+    Each host keeps the proxy it was given for as long as that proxy stays
+    healthy, so the session's pooled keep-alive connections (one pool per
+    proxy) are reused instead of every request hopping to a new proxy.
+    New hosts go to a proxy not tried yet, else to the one with the best
+    success rate / latency, weighed down by the hosts it already carries.
+    A proxy that keeps failing is ejected and its hosts reassigned; once
+    its eject time has passed it is probed (`probe` is called with its url,
+    outside the pool's lock, so a slow probe holds up only the thread that
+    runs it) and re-admitted only if the probe succeeds. Each ejection
+    doubles the next one's length until the proxy has served
+    FORGIVE_AFTER_SUCCESSES requests in a row.
+
+    If every proxy is ejected the one due back soonest is still used: the
+    pool never falls back to a direct connection.
+    """
+
+    def __init__(
+        self,
+        proxies: List[str],
+        probe: Optional[Callable[[str], bool]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if not proxies:
+            raise ValueError("ProxyPool needs at least one proxy")
+        self.stats: Dict[str, ProxyStats] = {url: ProxyStats(url) for url in dict.fromkeys(proxies)}
+        self.assignments: Dict[str, str] = {}
+        self.probe = probe
+        self.clock = clock
+        self._lock = threading.Lock()
+
+    def _claim_due(self) -> List[ProxyStats]:
+        """Ejected proxies due a probe, marked as probing so only this caller runs it; call with the lock held"""
+        now = self.clock()
+        due = [s for s in self.stats.values() if s.ejected and not s.probing and s.ejected_until <= now]
+        for stats in due:
+            stats.probing = True
+        return due
+
+    def _probe_due(self) -> None:
+        with self._lock:
+            due = self._claim_due()
+        for stats in due:
+            passed = False
+            try:
+                passed = self.probe(stats.url) if self.probe else True
+            except Exception as e:
+                print(f"Probe of proxy {stats.url} raised: {e}")
+            finally:
+                with self._lock:
+                    stats.probing = False
+                    if passed:
+                        print(f"Proxy {stats.url} passed its probe; back in rotation")
+                        stats.ejected_until = None
+                        stats.consecutive_failures = 0
+                        stats.consecutive_successes = 0
+                        stats.success_rate = MIN_SUCCESS_RATE
+                    else:
+                        self._eject(stats, "probe failed")
+
+    def _eject(self, stats: ProxyStats, reason: str) -> None:
+        delay = min(BASE_EJECT_SECONDS * 2 ** stats.ejections, MAX_EJECT_SECONDS)
+        stats.ejections += 1
+        stats.ejected_until = self.clock() + delay
+        print(f"Proxy {stats.url} ejected for {delay:.0f}s: {reason}")
+        for host in stats.hosts:
+            self.assignments.pop(host, None)
+        stats.hosts = []
+
+    def _assign(self, host: str, stats: ProxyStats) -> None:
+        self.assignments[host] = stats.url
+        stats.hosts.append(host)
+
+    def choose(self, host: str) -> str:
+        """Proxy url to use for a request to host"""
+        self._probe_due()
+        with self._lock:
+            current = self.assignments.get(host)
+            if current is not None:
+                return current
+
+            healthy = [s for s in self.stats.values() if not s.ejected]
+            if not healthy:
+                return min(self.stats.values(), key=lambda s: s.ejected_until).url
+            best = max(healthy, key=ProxyStats.rank)
+            self._assign(host, best)
+            return best.url
+
+    def record_success(self, proxy: str, latency: float) -> None:
+        with self._lock:
+            stats = self.stats[proxy]
+            stats.requests += 1
+            stats.consecutive_failures = 0
+            stats.consecutive_successes += 1
+            if stats.ejections and not stats.ejected and stats.consecutive_successes >= FORGIVE_AFTER_SUCCESSES:
+                stats.ejections = 0
+            stats.success_rate += EWMA_ALPHA * (1.0 - stats.success_rate)
+            if stats.latency is None:
+                stats.latency = latency
+            else:
+                stats.latency += EWMA_ALPHA * (latency - stats.latency)
+
+    def record_failure(self, proxy: str, error: str) -> None:
+        with self._lock:
+            stats = self.stats[proxy]
+            stats.requests += 1
+            stats.failures += 1
+            stats.consecutive_failures += 1
+            stats.consecutive_successes = 0
+            stats.success_rate -= EWMA_ALPHA * stats.success_rate
+            stats.last_error = error[:500]
+            if stats.ejected:
+                return
+            if stats.consecutive_failures >= EJECT_AFTER_FAILURES:
+                self._eject(stats, f"{stats.consecutive_failures} failures in a row ({stats.last_error})")
+            elif stats.requests >= MIN_SAMPLES and stats.success_rate < MIN_SUCCESS_RATE:
+                self._eject(stats, f"success rate {stats.success_rate:.2f}")
+
+    def snapshot(self) -> List[dict]:
+        with self._lock:
+            now = self.clock()
+            return [
+                {
+                    "proxy": s.url,
+                    "success_rate": round(s.success_rate, 3),
+                    "latency_ms": round(s.latency * 1000, 1) if s.latency is not None else None,
+                    "requests": s.requests,
+                    "failures": s.failures,
+                    "ejected_for": round(s.ejected_until - now, 1) if s.ejected else None,
+                    "last_error": s.last_error,
+                    "hosts": list(s.hosts),
+                }
+                for s in self.stats.values()
+            ]
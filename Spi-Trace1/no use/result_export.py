@@ -0,0 +1,79 @@
+"""
+Streaming writers for crawl findings.
+
+Pass one to PoliteScraper.crawl(..., sink=writer) and every finding is
+written (and flushed) as soon as the page is analyzed, so an interrupted
+crawl still leaves everything found so far on disk and the report never
+has to be held in memory to be saved. A path ending in .gz is written
+gzip-compressed.
+
+    with NDJSONFindingWriter("findings.ndjson.gz") as sink:
+        scraper.crawl(start_url, keywords, sink=sink)
+"""
+import csv
+import gzip
+import json
+from abc import ABC, abstractmethod
+from dataclasses import asdict
+
+
+def _open_text(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "wt", encoding="utf-8", newline="")
+    return open(path, "w", encoding="utf-8", newline="")
+
+
+class FindingWriter(ABC):
+    """Writes one finding at a time; use as a context manager or call close()"""
+
+    def __init__(self, path: str, flush_every: int = 1):
+        self.path = path
+        self.flush_every = flush_every
+        self.written = 0
+        self._file = _open_text(path)
+
+    def write(self, site: str, finding) -> None:
+        self._write_row(site, finding)
+        self.written += 1
+        if self.flush_every and self.written % self.flush_every == 0:
+            self._file.flush()
+
+    @abstractmethod
+    def _write_row(self, site: str, finding) -> None:
+        """Write one finding to self._file"""
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class NDJSONFindingWriter(FindingWriter):
+    """One JSON object per finding: site plus the PageFinding fields"""
+
+    def _write_row(self, site: str, finding) -> None:
+        self._file.write(json.dumps({"site": site, **asdict(finding)}, ensure_ascii=False) + "\n")
+
+
+class CSVFindingWriter(FindingWriter):
+    """The columns save_results_to_csv always wrote, minus the crawl verdict it can't know yet"""
+
+    COLUMNS = ["site", "url", "page_type", "leak_signals", "found_keywords"]
+
+    def __init__(self, path: str, flush_every: int = 1):
+        super().__init__(path, flush_every)
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(self.COLUMNS)
+
+    def _write_row(self, site: str, finding) -> None:
+        self._writer.writerow([
+            site,
+            finding.url,
+            finding.page_type,
+            json.dumps(finding.leak_signals),
+            ",".join(finding.found_keywords),
+        ])
@@ -0,0 +1,56 @@
+import pytest
+
+from bench_link_scoring import make_forum_pages, make_pages
+from link_scoring import LinkScoringEngine, TokenMatcher
+from polite_scraper import PoliteScraper
+
+# Overlapping tokens, case, non-ASCII case folding and the low-value patterns
+EDGE_LINKS = [
+    ("http://x.onion/", ""),
+    ("http://x.onion/SELLER/profile", "Vendor SHOP"),
+    ("http://x.onion/seller?page=2", "sell"),
+    ("http://x.onion/forum/thread/42", "post"),
+    ("http://x.onion/İtem-é", "İtem"),
+    ("http://x.onion/dump/leak/paste", "listing product item"),
+    ("http://x.onion/market?p=3&sort=new", "marketplace"),
+    ("http://x.onion/login", "Sign in to the store"),
+]
+
+
+@pytest.fixture(scope="module")
+def scraper():
+    return PoliteScraper()
+
+
+@pytest.mark.parametrize("pages", [
+    [EDGE_LINKS],
+    list(make_pages(20, 200)),
+    list(make_forum_pages(20, 200)),
+], ids=["edge-cases", "token-dense", "forum-shaped"])
+def test_batch_scores_match_per_link_scoring(scraper, pages):
+    scorer = scraper.link_scoring.for_site()
+    for links in pages:
+        expected = [(scraper._score_link(url, anchor), scraper._classify_url(url, anchor)) for url, anchor in links]
+        assert scorer.score_and_classify(links) == expected
+
+
+def test_token_matcher_finds_every_contained_token():
+    matcher = TokenMatcher(["sell", "seller", "ell", "page=", "p="])
+    assert matcher.present_in("resellers?page=1") == {"sell", "seller", "ell", "page="}
+    assert matcher.present_in("shop?p=2") == {"p="}
+    assert matcher.present_in("nothing here") == frozenset()
+    with pytest.raises(ValueError):
+        TokenMatcher(["ok", ""])
+
+
+def test_site_overrides():
+    engine = LinkScoringEngine(
+        PoliteScraper.HIGH_RISK_PATTERNS,
+        PoliteScraper.LOW_VALUE_PATTERNS,
+        {"special.onion": {"token_weights": {"forum": [10, 0], "escrow": [4, 1]}, "low_value_penalty": -1}},
+    )
+    links = [("http://x/forum/escrow?page=2", "escrow forum")]
+    assert engine.for_site("other.onion").score(links) == [3 + 2 - 5]
+    assert engine.for_site("special.onion").score(links) == [10 + 0 + 4 + 1 - 1]
+    assert engine.for_site("special.onion") is engine.for_site("SPECIAL.onion")
+    assert engine.for_site("other.onion") is engine.for_site("")
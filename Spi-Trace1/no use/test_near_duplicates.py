@@ -0,0 +1,46 @@
+from content_fingerprint import PageFingerprintStore
+from polite_scraper import PoliteScraper
+
+SITE = "https://example.test"
+KEYWORDS = ["password"]
+BODY = "<html><body><p>{}</p><a href='/dump'>dump</a></body></html>"
+LEAK = "fresh dump of user password lists for acme corp, contact admin@acme.test for the full archive " * 5
+
+
+class FakeScraper(PoliteScraper):
+    def __init__(self, pages, **kwargs):
+        super().__init__(requests_per_minute=6000, **kwargs)
+        self.pages = {url.rstrip("/"): html for url, html in pages.items()}
+
+    def get(self, url):
+        return self.pages.get(url.rstrip("/"))
+
+
+def _pages():
+    return {SITE: BODY.format(LEAK), SITE + "/dump": BODY.format(LEAK + " mirror")}
+
+
+def test_skipping_is_off_by_default():
+    report = FakeScraper(_pages()).crawl(SITE, KEYWORDS)
+    assert report.near_duplicates_skipped == 0
+    assert {f.url for f in report.findings} == {SITE, SITE + "/dump"}
+
+
+def test_duplicate_reports_the_original_finding():
+    report = FakeScraper(_pages(), near_duplicate_distance=3).crawl(SITE, KEYWORDS)
+    assert report.near_duplicates_skipped == 1
+    assert report.found
+    by_url = {f.url: f for f in report.findings}
+    assert set(by_url) == {SITE, SITE + "/dump"}
+    assert by_url[SITE + "/dump"].found_keywords == ["password"]
+
+
+def test_recrawl_reanalyzes_unchanged_pages(tmp_path):
+    store = PageFingerprintStore(str(tmp_path / "fp.db"))
+    pages = {SITE: BODY.format(LEAK)}
+    FakeScraper(pages, near_duplicate_distance=3, fingerprints=store).crawl(SITE, KEYWORDS)
+    report = FakeScraper(pages, near_duplicate_distance=3, fingerprints=store).crawl(SITE, KEYWORDS)
+    store.close()
+    assert report.found
+    assert report.near_duplicates_skipped == 0
+    assert [f.url for f in report.findings] == [SITE]
@@ -0,0 +1,81 @@
+import threading
+
+import proxy_pool
+from proxy_pool import EJECT_AFTER_FAILURES, FORGIVE_AFTER_SUCCESSES, ProxyPool
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _eject(pool, proxy):
+    for _ in range(EJECT_AFTER_FAILURES):
+        pool.record_failure(proxy, "refused")
+
+
+def test_slow_probe_does_not_block_other_threads():
+    clock = Clock()
+    probe_started, release_probe = threading.Event(), threading.Event()
+
+    def probe(url):
+        probe_started.set()
+        release_probe.wait(5)
+        return True
+
+    pool = ProxyPool(["http://p1", "http://p2"], probe=probe, clock=clock)
+    assert pool.choose("a.test") == "http://p1"
+    _eject(pool, "http://p1")
+    clock.now += proxy_pool.MAX_EJECT_SECONDS
+
+    prober = threading.Thread(target=pool.choose, args=("b.test",))
+    prober.start()
+    assert probe_started.wait(5)
+    # The probe is in flight; other callers neither wait for it nor start a second one
+    assert pool.choose("c.test") == "http://p2"
+    pool.record_success("http://p2", 0.1)
+    assert pool.stats["http://p1"].probing
+    release_probe.set()
+    prober.join(5)
+    assert not pool.stats["http://p1"].ejected
+    assert not pool.stats["http://p1"].probing
+
+
+def test_raising_probe_counts_as_failed():
+    clock = Clock()
+
+    def probe(url):
+        raise OSError("unreachable")
+
+    pool = ProxyPool(["http://p1", "http://p2"], probe=probe, clock=clock)
+    _eject(pool, "http://p1")
+    clock.now += proxy_pool.MAX_EJECT_SECONDS
+    assert pool.choose("a.test") == "http://p2"
+    stats = pool.stats["http://p1"]
+    assert stats.ejected and not stats.probing
+    assert stats.ejections == 2
+
+
+def test_backoff_starts_over_after_sustained_health():
+    clock = Clock()
+    pool = ProxyPool(["http://p1"], clock=clock)
+    stats = pool.stats["http://p1"]
+
+    _eject(pool, "http://p1")
+    assert stats.ejected_until - clock.now == proxy_pool.BASE_EJECT_SECONDS
+    clock.now += proxy_pool.MAX_EJECT_SECONDS
+    pool.choose("a.test")
+    # Re-admitted but failing again straight away: the next ejection is longer
+    _eject(pool, "http://p1")
+    assert stats.ejected_until - clock.now == 2 * proxy_pool.BASE_EJECT_SECONDS
+
+    clock.now += proxy_pool.MAX_EJECT_SECONDS
+    pool.choose("a.test")
+    for _ in range(FORGIVE_AFTER_SUCCESSES):
+        pool.record_success("http://p1", 0.1)
+    assert stats.ejections == 0
+    _eject(pool, "http://p1")
+    assert stats.ejected_until - clock.now == proxy_pool.BASE_EJECT_SECONDS
@@ -0,0 +1,52 @@
+import pytest
+
+import polite_scraper
+from crawl_checkpoint import CrawlCheckpointStore
+from polite_scraper import PoliteScraper
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(polite_scraper, "time", clock)
+    return clock
+
+
+def test_each_host_has_its_own_interval(clock):
+    scraper = PoliteScraper(requests_per_minute=6)
+    scraper._respect_rate_limit("http://a.onion/")
+    scraper._respect_rate_limit("http://B.onion/page")
+    assert clock.slept == []
+
+    clock.now += 4
+    scraper._respect_rate_limit("http://a.onion/next")
+    assert len(clock.slept) == 1 and clock.slept[0] >= 6
+    assert set(scraper.last_request_times) == {"a.onion", "b.onion"}
+
+
+def test_resume_restores_every_host_timer(clock, tmp_path):
+    store = CrawlCheckpointStore(str(tmp_path / "crawl.db"))
+    store.start("c1", "http://a.onion", ["leak"], 10, 3)
+    store.record_seed("c1", None, [], {"a.onion": 990.0, "b.onion": 995.0})
+
+    scraper = PoliteScraper(requests_per_minute=6, checkpoints=store)
+    scraper.last_request_times["b.onion"] = 999.0
+    scraper.resume_crawl("c1")
+    store.close()
+    assert scraper.last_request_times == {"a.onion": 990.0, "b.onion": 999.0}
+
+    scraper._respect_rate_limit("http://b.onion/")
+    assert clock.slept and clock.slept[0] >= 9
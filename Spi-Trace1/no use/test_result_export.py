@@ -0,0 +1,36 @@
+import csv
+import gzip
+import json
+
+import pytest
+
+from polite_scraper import PageFinding
+from result_export import CSVFindingWriter, FindingWriter, NDJSONFindingWriter
+
+FINDING = PageFinding(url="https://example.test/dump", page_type="listing",
+                      leak_signals={"emails": 2}, found_keywords=["password", "leak"])
+
+
+def test_finding_writer_is_abstract(tmp_path):
+    with pytest.raises(TypeError):
+        FindingWriter(str(tmp_path / "out.txt"))
+
+
+def test_ndjson_is_readable_while_the_crawl_runs(tmp_path):
+    path = tmp_path / "findings.ndjson"
+    with NDJSONFindingWriter(str(path)) as sink:
+        sink.write("https://example.test", FINDING)
+        assert json.loads(path.read_text(encoding="utf-8")) == {"site": "https://example.test",
+                                                               "url": FINDING.url, "page_type": "listing",
+                                                               "leak_signals": {"emails": 2},
+                                                               "found_keywords": ["password", "leak"]}
+
+
+def test_gzip_csv(tmp_path):
+    path = tmp_path / "findings.csv.gz"
+    with CSVFindingWriter(str(path)) as sink:
+        sink.write("https://example.test", FINDING)
+    with gzip.open(path, "rt", encoding="utf-8", newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows == [CSVFindingWriter.COLUMNS,
+                    ["https://example.test", FINDING.url, "listing", '{"emails": 2}', "password,leak"]]